@@ -0,0 +1,209 @@
+"""
+AI 응답 JSON 처리
+
+extract_json: 모델 응답 전체(코드펜스, 앞뒤 설명 문구 포함)에서 JSON 객체를 찾아 파싱합니다.
+한 번의 선형 스캔으로 균형 잡힌 {...} 후보를 모으고 긴 후보부터 json.loads 를 시도하며,
+실패하면 흔한 LLM 실수(끝의 쉼표, 스마트 따옴표)를 고쳐 한 번 더 시도합니다.
+
+IncrementalJSONObject: 스트리밍으로 도착하는 JSON 객체 텍스트를 조각 단위로 받아,
+최상위 멤버("key": value)가 완성되는 즉시 (key, value) 로 돌려줍니다.
+전체 응답을 기다리지 않고 리포트 섹션을 하나씩 내보낼 때 사용합니다.
+"""
+
+import json
+import logging
+import re
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]')
+_SMART_QUOTES = frozenset("\u201c\u201d\u201e\u201f")   # “ ” „ ‟ (문자열 밖에서만 따옴표로 취급)
+_MAX_CANDIDATES = 8
+
+
+def _object_spans(text: str) -> List[Tuple[int, int]]:
+    """문자열/이스케이프를 구분하며 한 번 훑어 다른 객체에 포함되지 않은 {...} 구간 (start, end) 목록을 반환
+
+    괄호 밖의 설명 문구는 따옴표가 있어도 문자열로 보지 않으므로 코드펜스나 앞뒤 설명에 영향받지 않고,
+    설명 속의 닫히지 않은 { 가 있어도 그 안에서 닫힌 객체는 후보로 남음
+    """
+    closed: List[Tuple[int, int]] = []
+    stack: List[Tuple[int, str]] = []
+    in_str = False
+    skip = -1  # 이스케이프된 문자 위치
+    # 괄호/따옴표/역슬래시 사이의 일반 텍스트는 정규식 엔진이 건너뜀
+    for m in _STRUCTURAL.finditer(text):
+        i = m.start()
+        if i == skip:
+            continue
+        ch = text[i]
+        if in_str:
+            if ch == "\\":
+                skip = i + 1
+            elif ch == '"':
+                in_str = False
+        elif ch == "{" or ch == "[":
+            stack.append((i, ch))
+        elif not stack:
+            continue
+        elif ch == '"':
+            in_str = True
+        elif ch == "}" or ch == "]":
+            start, opener = stack.pop()
+            if opener == "{" and ch == "}":
+                closed.append((start, i + 1))
+
+    # 닫힌 순서대로 쌓였으므로 시작 위치로 정렬한 뒤 바깥 구간만 남김
+    spans: List[Tuple[int, int]] = []
+    end = -1
+    for start, stop in sorted(closed):
+        if start >= end:
+            spans.append((start, stop))
+            end = stop
+    return spans
+
+
+def _fenced_body(text: str) -> str:
+    """``` / ```json 코드펜스가 있으면 첫 펜스 안쪽, 없으면 앞뒤 공백만 제거한 텍스트"""
+    start = text.find("```")
+    if start == -1:
+        return text.strip()
+    start = text.find("\n", start)
+    end = text.find("```", start + 1) if start != -1 else -1
+    if end == -1:
+        return text.strip()
+    return text[start + 1:end].strip()
+
+
+def _repair(candidate: str) -> str:
+    """문자열 밖의 스마트 따옴표를 " 로, 닫는 괄호 앞의 쉼표를 제거"""
+    out: List[str] = []
+    in_str = esc = False
+    closer = '"'
+    for ch in candidate:
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"' or (closer != '"' and ch in _SMART_QUOTES):
+                in_str = False
+                ch = '"'
+        elif ch == '"' or ch in _SMART_QUOTES:
+            in_str = True
+            closer = ch
+            ch = '"'
+        elif ch == "}" or ch == "]":
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+        out.append(ch)
+    return "".join(out)
+
+
+def _loads(candidate: str, repair: bool) -> Optional[Any]:
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        if not repair:
+            return None
+    try:
+        # 문자열 안의 실제 줄바꿈도 허용
+        return json.loads(_repair(candidate), strict=False)
+    except ValueError:
+        return None
+
+
+def extract_json(text: str, repair: bool = True) -> Optional[Any]:
+    """모델 응답에서 JSON 객체를 찾아 파싱 (실패 시 None)
+
+    후보가 여럿이면 가장 긴 것부터 시도하므로 설명 문구 속 {예시} 보다 실제 리포트가 우선됩니다.
+    """
+    if not text:
+        return None
+    # 대부분의 응답은 객체만 있거나 코드펜스 하나로 감싼 형태라 먼저 그대로 시도
+    body = _fenced_body(text)
+    if body.startswith("{") and body.endswith("}"):
+        try:
+            return json.loads(body)
+        except ValueError:
+            pass
+    spans = sorted(_object_spans(text), key=lambda s: s[1] - s[0], reverse=True)
+    for start, end in spans[:_MAX_CANDIDATES]:
+        data = _loads(text[start:end], repair)
+        if isinstance(data, dict):
+            return data
+    # 객체가 아닌 응답 (배열 등)
+    data = _loads(text.strip(), repair)
+    if data is None:
+        logger.error(f"Failed to parse AI JSON response: {text[:200]}...")
+    return data
+
+
+class IncrementalJSONObject:
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0                      # 다음에 검사할 위치
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._member_start: Optional[int] = None  # 현재 최상위 멤버의 시작 위치
+        self.done = False                  # 최상위 객체가 닫혔는지
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """텍스트 조각을 추가하고, 이번에 완성된 최상위 멤버 목록을 반환"""
+        if self.done or not chunk:
+            return []
+        self._buf += chunk
+        buf = self._buf
+        out: List[Tuple[str, Any]] = []
+        i = self._pos
+        while i < len(buf) and not self.done:
+            ch = buf[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+            elif self._depth == 0:
+                # 객체 시작 전의 코드펜스/설명 문구는 건너뜀
+                if ch == "{":
+                    self._depth = 1
+                    self._member_start = i + 1
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._member_start:i], out)
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                self._emit(buf[self._member_start:i], out)
+                self._member_start = i + 1
+            i += 1
+
+        # 이미 내보낸 앞부분은 버려 버퍼가 응답 전체 크기로 커지지 않게 함
+        cut = self._member_start if self._member_start is not None else i
+        self._buf = buf[cut:]
+        self._pos = i - cut
+        if self._member_start is not None:
+            self._member_start = 0
+        return out
+
+    @staticmethod
+    def _emit(member: str, out: List[Tuple[str, Any]]):
+        member = member.strip()
+        if not member:
+            return
+        try:
+            out.extend(json.loads("{" + member + "}").items())
+        except ValueError:
+            # 깨진 멤버 하나 때문에 나머지 섹션까지 버리지 않도록 건너뜀
+            pass
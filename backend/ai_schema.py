@@ -0,0 +1,239 @@
+"""
+AI 응답 스키마 (pydantic v2)
+
+/analyze, /analyze/stream, /regenerate-copy 에서 extract_json 으로 파싱한 모델 응답을
+섹션별 타입으로 한 번에 검증·보정합니다.
+- 비어 있거나 빠진 섹션은 기본값 (현장명 등 요청별 값은 validation context 로 넘긴 inputs 사용)
+- 응답 자체가 객체가 아니면(배열 등) ValidationError - /analyze 는 로컬 엔진 리포트로 대체
+- 숫자는 변환에 실패하면 필드 기본값, 리스트 항목은 문자열로(숫자는 변환, 객체 등은 제외), 카피 샘플은 3개로 맞춤
+- 객체 항목(media_mix, competitors)에서 값이 null 인 필드는 빠진 것으로 보고 기본값 사용,
+  문자열로 볼 수 없는 값이 든 항목은 제외
+- 스키마는 TypedDict 라 검증 결과가 바로 JSON 으로 내보낼 dict (model_dump 단계 없음)
+- TypeAdapter 는 import 시 한 번만 만들고 요청마다 재사용
+
+비용 측정은 python test_ai_schema.py --bench
+"""
+
+import typing
+from typing import Annotated, Any, Dict, List, Union
+
+from pydantic import (AfterValidator, BeforeValidator, ConfigDict, Field, OnErrorOmit, TypeAdapter, ValidationInfo,
+                      with_config)
+from typing_extensions import TypedDict
+
+DEFAULT_ROI_FORECAST = {"expected_leads": 100, "expected_cpl": 50000, "conversion_rate": 2.5, "expected_ctr": 1.8}
+
+
+def default_media_mix(inputs: dict) -> list:
+    field_name, fkp, main_concern = inputs["field_name"], inputs["fkp"], inputs["main_concern"]
+    return [
+        {"media_id": "gdn", "attention": f"[{field_name}] {fkp}를 강조한 전국 확산 배너 카피!", "empathy": f"{main_concern} 돌파하는 시세차익 강조로 이성적 설득.", "action": "지금 바로 단독 팝업 배너 클릭 유도."},
+        {"media_id": "kakao", "attention": "카카오톡 사용자 최적화된 시선 집중 메시지 구성.", "empathy": "채팅방 내 실시간 정보 제공 및 신뢰도 강화.", "action": "대화형(CTA) 버튼으로 빠른 카톡 상담 유입."},
+        {"media_id": "daangn", "attention": "우리 동네 이웃들에게 보내는 친근하고 핫한 아파트 소식.", "empathy": "현장과 가장 가까운 동네 생활권 내 실거주 수요 자극.", "action": "가벼운 마음으로 채팅 문의 유도."},
+        {"media_id": "hogangnono", "attention": "빅데이터 검색 유저를 위한 확고한 타겟팅 팝업 노출.", "empathy": "실시간 관심 고객에게 투자가치 리포트 및 매력 발산.", "action": f"{main_concern} 극복형 전문 리포트 신청 CTA."},
+        {"media_id": "meta", "attention": "화려한 숏폼 릴스와 비주얼 임팩트로 초기 3초 시선 강탈.", "empathy": "3040 신혼부부의 주거 로망을 자극하는 감성 터치.", "action": "스폰서드 링크에서 즉시 양식 작성 및 콜백 유도."},
+        {"media_id": "lms", "attention": "다이렉트 도달! 스마트폰 즉각 확인 가능한 긴급 SMS 헤드라인.", "empathy": "지역 내 고관여 투자자에게 강력한 이자 지원 동기 부여.", "action": "선착순 방문 예약 링크 클릭 및 혜택 한정 공지."}
+    ]
+
+
+# --- 공통 타입 ---
+# 항목 단위 검증(문자열 변환, 잘못된 항목 버리기, 필드 순서 맞추기)은 pydantic-core 가 네이티브로 처리하고,
+# 파이썬 쪽은 섹션 기본값을 채우는 사전 처리(SECTION_DEFAULTS) 한 번과 카피 3개 맞추기만 함
+
+_NATIVE = ConfigDict(coerce_numbers_to_str=True)
+
+# 숫자는 문자열로, 그 밖에 문자열로 볼 수 없는 항목은 리스트에서 제외
+TextItems = List[OnErrorOmit[Annotated[str, Field(coerce_numbers_to_str=True)]]]
+
+
+def _field_name(info: ValidationInfo) -> str:
+    return (info.context or {}).get("field_name", "분석 현장")
+
+
+def _as_list(value: Any) -> list:
+    if isinstance(value, str):
+        return [value]
+    return value if isinstance(value, list) else []
+
+
+def _number_or(value: Any, default: float) -> float:
+    """숫자로 바꿀 수 없으면 default"""
+    if isinstance(value, float):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _items_with_defaults(value: Any, defaults: dict) -> list:
+    """dict 가 아닌 항목은 버리고, 빠지거나 null 인 필드는 기본값"""
+    if not isinstance(value, list):
+        return []
+    return [{**defaults, **{k: v for k, v in item.items() if v is not None}} for item in value if isinstance(item, dict)]
+
+
+def _text_section(default: str):
+    """비어 있으면 default ({field_name} 은 요청 현장명)"""
+    def prepare(value: Any, inputs: dict) -> str:
+        value = value or default.format(field_name=inputs.get("field_name", "분석 현장"))
+        return value if isinstance(value, str) else str(value)
+    return prepare
+
+
+def _list_section(*defaults: str):
+    def prepare(value: Any, inputs: dict) -> list:
+        return _as_list(value or [d.format(field_name=inputs.get("field_name", "분석 현장")) for d in defaults])
+    return prepare
+
+
+def _copy_items(value: Any, inputs: dict) -> list:
+    return [x for x in _as_list(value) if x]
+
+
+def copy_samples(placeholder: str) -> Any:
+    """빈 항목을 뺀 카피를 정확히 3개로 (모자라면 placeholder 로 채움)"""
+    def pad(value: List[str], info: ValidationInfo) -> List[str]:
+        while len(value) < 3:
+            value.append(placeholder.format(field_name=_field_name(info)))
+        return value[:3]
+    return Annotated[TextItems, AfterValidator(pad)]
+
+
+# --- 섹션 스키마 ---
+
+@with_config(_NATIVE)
+class MediaStrategy(TypedDict):
+    media_id: str
+    attention: str
+    empathy: str
+    action: str
+
+
+@with_config(_NATIVE)
+class Competitor(TypedDict):
+    name: str
+    price: float
+    gap_label: str
+
+
+# 모델이 추가로 준 지표는 그대로 둠
+@with_config(ConfigDict(extra="allow"))
+class RoiForecast(TypedDict):
+    expected_leads: Union[int, float]
+    expected_cpl: Union[int, float]
+    conversion_rate: Union[int, float]
+    expected_ctr: Union[int, float]
+
+
+MEDIA_STRATEGY_DEFAULTS = {
+    "media_id": "meta",
+    "attention": "3초 안에 핵심 메시지를 전달하세요.",
+    "empathy": "실거주자와 투자자의 니즈를 자극하세요.",
+    "action": "즉각적인 상담 신청(CTA)을 유도하세요.",
+}
+COMPETITOR_DEFAULTS = {"name": "경쟁 단지", "price": 0.0}
+
+
+def _media_mix_items(value: Any, inputs: dict) -> list:
+    return _items_with_defaults(value, MEDIA_STRATEGY_DEFAULTS)
+
+
+def _media_mix_or_default(value: List[dict], info: ValidationInfo) -> List[dict]:
+    """검증 후 남는 항목이 없으면 6개 매체 기본 전략 (문자열로 볼 수 없는 필드로 모두 빠진 경우 포함)"""
+    return value or default_media_mix(info.context or {})
+
+
+def _competitor_items(value: Any, inputs: dict) -> list:
+    items = _items_with_defaults(value, COMPETITOR_DEFAULTS)
+    for item in items:
+        item["price"] = _number_or(item["price"], 0.0)
+        # 예전 프롬프트 형식은 distance 로 응답
+        item["gap_label"] = item.get("gap_label") or item.get("distance") or "비교군"
+    return items
+
+
+def _roi_forecast(value: Any, inputs: dict) -> dict:
+    """빠졌거나 숫자가 아닌 지표는 기본값 (기본값은 int 그대로)"""
+    value = value if isinstance(value, dict) else {}
+    return {**value, **{k: _number_or(value[k], d) if k in value else d for k, d in DEFAULT_ROI_FORECAST.items()}}
+
+
+class AnalysisSections(TypedDict):
+    """/analyze 프롬프트가 요구하는 AI 섹션 (필드 순서 = 리포트/스트리밍 순서)"""
+    market_diagnosis: str
+    target_persona: str
+    target_audience: TextItems
+    competitors: List[OnErrorOmit[Competitor]]
+    ad_recommendation: str
+    copywriting: str
+    keyword_strategy: TextItems
+    weekly_plan: TextItems
+    roi_forecast: RoiForecast
+    lms_copy_samples: copy_samples("{field_name} 마케팅 정밀 카피 분석 중입니다.")
+    channel_talk_samples: copy_samples("{field_name} 마케팅 정밀 카피 분석 중입니다.")
+    media_mix: Annotated[List[OnErrorOmit[MediaStrategy]], AfterValidator(_media_mix_or_default)]
+
+
+class CopySamples(TypedDict):
+    """/regenerate-copy 응답"""
+    lms_copy_samples: copy_samples("{field_name} 정밀 분석 카피가 준비 중입니다.")
+    channel_talk_samples: copy_samples("{field_name} 맞춤 채널톡 카피가 준비 중입니다.")
+
+
+# 섹션별 기본값 채우기 / 형태 맞추기 (비어 있거나 빠진 섹션은 None 으로 들어옴)
+SECTION_DEFAULTS = {
+    "market_diagnosis": _text_section("데이터 분석 중입니다."),
+    "target_persona": _text_section("안정적 자산 증식을 노리는 수요자"),
+    "target_audience": _list_section("실거주자", "투자자"),
+    "competitors": _competitor_items,
+    "ad_recommendation": _text_section("메타 및 네이버 광고 집행 권장"),
+    "copywriting": _text_section("[{field_name}] 지금 바로 만나보세요."),
+    "keyword_strategy": _list_section("{field_name}", "분양정보"),
+    "weekly_plan": _list_section("1주차: 마케팅 기획"),
+    "roi_forecast": _roi_forecast,
+    "lms_copy_samples": _copy_items,
+    "channel_talk_samples": _copy_items,
+    "media_mix": _media_mix_items,
+}
+
+
+def _with_defaults(schema) -> Any:
+    """응답 dict 를 스키마 키 순서로 바꾸며 섹션 기본값을 채움 (모르는 키는 버림)
+
+    파이썬 쪽 작업은 이 한 번뿐이고, 나머지 항목 검증은 pydantic-core 에서 한 번에 처리
+    """
+    keys = list(schema.__annotations__)
+
+    def fill(data: Any, info: ValidationInfo) -> dict:
+        if not isinstance(data, dict):
+            # 배열 등 객체가 아닌 응답은 보정하지 않고 실패로 (호출한 쪽이 로컬 엔진으로 대체)
+            raise ValueError(f"AI response is not a JSON object: {type(data).__name__}")
+        inputs = info.context or {}
+        return {key: SECTION_DEFAULTS[key](data.get(key), inputs) for key in keys}
+    return Annotated[schema, BeforeValidator(fill)]
+
+
+AI_SECTION_KEYS = list(AnalysisSections.__annotations__)
+
+ANALYSIS_ADAPTER = TypeAdapter(_with_defaults(AnalysisSections))
+COPY_SAMPLES_ADAPTER = TypeAdapter(_with_defaults(CopySamples))
+# 스트리밍은 섹션이 완성되는 대로 하나씩 보정
+SECTION_ADAPTERS: Dict[str, TypeAdapter] = {
+    key: TypeAdapter(hint) for key, hint in typing.get_type_hints(AnalysisSections, include_extras=True).items()
+}
+
+
+def normalize_ai_sections(data: Any, inputs: dict) -> dict:
+    """모델 응답 전체를 AI_SECTION_KEYS 섹션 dict 로 보정 (응답이 객체가 아니면 ValidationError)"""
+    return ANALYSIS_ADAPTER.validate_python(data, context=inputs)
+
+
+def normalize_ai_section(key: str, value: Any, inputs: dict) -> Any:
+    """섹션 하나 보정 (None 이면 기본값)"""
+    return SECTION_ADAPTERS[key].validate_python(SECTION_DEFAULTS[key](value, inputs), context=inputs)
+
+
+def normalize_copy_samples(data: Any, field_name: str) -> dict:
+    """/regenerate-copy 응답 보정 (응답이 객체가 아니면 ValidationError)"""
+    return COPY_SAMPLES_ADAPTER.validate_python(data, context={"field_name": field_name})
@@ -0,0 +1,106 @@
+"""
+비동기 TTL + LRU 캐시 (single-flight, stale-while-revalidate)
+
+- ttl 이내: 캐시 값 그대로 반환
+- ttl ~ ttl + stale_ttl: 오래된 값을 즉시 반환하고 백그라운드에서 갱신
+- 그 이후 또는 미스: loader 호출. 같은 키의 동시 요청은 하나의 upstream 호출을 공유
+- loader 가 예외를 던지면 캐시하지 않고 대기 중인 모든 호출자에게 그대로 전달
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTTLCache:
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, maxsize: int = 1024, name: str = "cache"):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.name = name
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "shared": 0, "evictions": 0, "errors": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def peek(self, key, allow_stale: bool = True):
+        """loader 호출 없이 캐시된 값을 조회 (없거나 만료면 None)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry[0]
+        limit = self.ttl + self.stale_ttl if allow_stale else self.ttl
+        if age >= limit:
+            return None
+        return entry[1]
+
+    def set(self, key, value):
+        self._store(key, value)
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _load(self, key, loader: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """같은 키에 대해 진행 중인 로드가 있으면 공유, 없으면 새로 시작"""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats["shared"] += 1
+            return fut
+
+        async def _run():
+            try:
+                value = await loader()
+                self._store(key, value)
+                return value
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                self._inflight.pop(key, None)
+
+        fut = asyncio.ensure_future(_run())
+        self._inflight[key] = fut
+        return fut
+
+    async def get_or_load(self, key, loader: Callable[[], Awaitable[Any]]):
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                # 오래된 값을 먼저 돌려주고 갱신은 백그라운드에서
+                self._entries.move_to_end(key)
+                self.stats["stale_hits"] += 1
+                refresh = self._load(key, loader)
+                refresh.add_done_callback(self._log_refresh_error)
+                return entry[1]
+
+        self.stats["misses"] += 1
+        # shield: 한 호출자가 취소되어도 다른 대기자와 캐시 저장은 계속 진행
+        return await asyncio.shield(self._load(key, loader))
+
+    def _log_refresh_error(self, fut: asyncio.Future):
+        if not fut.cancelled() and fut.exception() is not None:
+            logger.warning(f"[{self.name}] background refresh failed: {fut.exception()}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"name": self.name, "size": len(self._entries), "inflight": len(self._inflight), **self.stats}
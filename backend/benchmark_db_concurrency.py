@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+SQLite 동시성 벤치마크: 쓰기(리드/분석 히스토리 저장)가 계속 들어오는 동안 검색 읽기 처리량 비교
+
+    python benchmark_db_concurrency.py [--seconds 5] [--readers 8] [--writers 2]
+
+임시 DB 두 개에 같은 데이터를 만들고
+- baseline: 기존 main.py 와 같은 기본 create_engine (rollback journal)
+- tuned: db.make_engine (WAL + pragma, 읽기/쓰기 풀 분리)
+각각에서 reader 스레드는 site 검색 쿼리, writer 스레드는 lead/analysishistory INSERT 를 반복합니다.
+"""
+
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import text
+from sqlmodel import create_engine
+
+from db import DB_READ_POOL, DB_WRITE_POOL, make_engine
+
+SCHEMA = [
+    "CREATE TABLE site (id TEXT PRIMARY KEY, name TEXT, address TEXT, brand TEXT, status TEXT, last_updated TIMESTAMP)",
+    "CREATE TABLE lead (id INTEGER PRIMARY KEY, name TEXT, phone TEXT, site TEXT, created_at TIMESTAMP)",
+    "CREATE TABLE analysishistory (id INTEGER PRIMARY KEY, user_email TEXT, field_name TEXT, response_json TEXT, created_at TIMESTAMP)",
+]
+SEARCH_SQL = text(
+    "SELECT id, name, address FROM site WHERE name LIKE :q OR address LIKE :q ORDER BY last_updated DESC LIMIT 100"
+)
+REPORT = "x" * 8000  # 분석 리포트 JSON 크기 정도
+
+
+def _prepare(path: str, rows: int):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for ddl in SCHEMA:
+            conn.execute(text(ddl))
+        now = datetime.datetime.now()
+        conn.execute(
+            text("INSERT INTO site VALUES (:id, :name, :address, :brand, :status, :ts)"),
+            [{"id": f"s{i}", "name": f"힐스테이트 {i}", "address": f"서울특별시 {i % 25}구", "brand": "힐스테이트",
+              "status": "분양중", "ts": now} for i in range(rows)],
+        )
+    engine.dispose()
+
+
+def _run(read_engine, write_engine, seconds: float, readers: int, writers: int) -> dict:
+    stop = threading.Event()
+    read_lat, write_lat, errors = [], [], []
+    lock = threading.Lock()
+
+    def reader():
+        while not stop.is_set():
+            t = time.perf_counter()
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(SEARCH_SQL, {"q": "%힐스%"}).all()
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            with lock:
+                read_lat.append(time.perf_counter() - t)
+
+    def writer(n):
+        i = 0
+        while not stop.is_set():
+            i += 1
+            t = time.perf_counter()
+            try:
+                with write_engine.begin() as conn:
+                    now = datetime.datetime.now()
+                    conn.execute(text("INSERT INTO lead (name, phone, site, created_at) VALUES ('b', '010', 's1', :t)"), {"t": now})
+                    conn.execute(text("INSERT INTO analysishistory (user_email, field_name, response_json, created_at) "
+                                      "VALUES (:e, 'f', :r, :t)"), {"e": f"w{n}@x", "r": REPORT, "t": now})
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            with lock:
+                write_lat.append(time.perf_counter() - t)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    def pct(values, p):
+        return round(statistics.quantiles(values, n=100)[p - 1] * 1000, 2) if len(values) >= 2 else None
+
+    return {
+        "reads_per_s": round(len(read_lat) / seconds),
+        "read_p50_ms": pct(read_lat, 50),
+        "read_p99_ms": pct(read_lat, 99),
+        "writes_per_s": round(len(write_lat) / seconds),
+        "write_p99_ms": pct(write_lat, 99),
+        "errors": len(errors),
+        "first_error": errors[0][:120] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_path, tuned_path = os.path.join(tmp, "baseline.db"), os.path.join(tmp, "tuned.db")
+        _prepare(base_path, args.rows)
+        _prepare(tuned_path, args.rows)
+
+        baseline = create_engine(f"sqlite:///{base_path}", connect_args={"check_same_thread": False})
+        print("baseline:", _run(baseline, baseline, args.seconds, args.readers, args.writers))
+        baseline.dispose()
+
+        tuned_write = make_engine(tuned_path, pool_size=DB_WRITE_POOL)
+        tuned_read = make_engine(tuned_path, read_only=True, pool_size=max(DB_READ_POOL, args.readers))
+        with tuned_write.connect():
+            pass  # WAL 전환
+        print("tuned:   ", _run(tuned_read, tuned_write, args.seconds, args.readers, args.writers))
+        tuned_read.dispose()
+        tuned_write.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+분석 리포트 저장 코덱 벤치마크 / 사전 생성
+
+    python benchmark_report_codec.py [--rows 2000]     # 평문 저장 vs 압축 저장 DB 크기·읽기 시간 비교
+    python benchmark_report_codec.py --build-dict      # report_dict_v{REPORT_DICT_VERSION}.txt 생성
+
+임시 DB 에 예전 방식(json.dumps 평문)으로 리포트를 넣고 VACUUM 한 크기와 전체 읽기 시간을 잰 뒤,
+compress_history_rows() 로 이전하고 다시 측정합니다. 리포트는 Smart Local Engine 템플릿으로 만듭니다.
+이미 배포된 버전의 사전 파일은 덮어쓰지 않으므로 템플릿이 크게 바뀌면 REPORT_DICT_VERSION 을 올려 새로 만듭니다.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+# main import 시 실제 database.db 를 건드리지 않도록
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "codec_bench_main.db"))
+
+from sqlalchemy import text
+
+import main
+from db import make_engine
+from report_codec import (REPORT_DICT_VERSION, build_dictionary, compress_history_rows, dictionary_path,
+                          encode_report, report_text)
+
+FIELDS = ["힐스테이트 평택역 센트럴 시티", "e편한세상 부평역", "자이 더 센트럴", "푸르지오 스테이션", "래미안 원베일리"]
+ADDRESSES = ["경기도 평택시 평택동", "인천광역시 부평구", "서울특별시 마포구", "부산광역시 해운대구", "대구광역시 수성구"]
+CATEGORIES = ["아파트", "오피스텔", "지식산업센터"]
+
+
+def sample_report(rng: random.Random) -> dict:
+    req = main.AnalyzeRequest(
+        field_name=rng.choice(FIELDS),
+        address=rng.choice(ADDRESSES),
+        product_category=rng.choice(CATEGORIES),
+        down_payment=rng.choice(["5%", "10%", "1천만원 정액제"]),
+        interest_benefit=rng.choice(["중도금 무이자", "이자후불제", "없음"]),
+        sales_price=rng.randint(1500, 4000),
+        target_area_price=rng.randint(1500, 4500),
+        supply_volume=rng.randint(100, 3000),
+        field_keypoints=rng.choice(["", "역세권 초품아", "숲세권 대단지", "GTX 수혜"]),
+        main_concern=rng.choice(["고분양가", "입지", "미분양 우려", "기타"]),
+    )
+    return main._fallback_analysis(main._analysis_inputs(req))
+
+
+def build_dict():
+    path = dictionary_path(REPORT_DICT_VERSION)
+    if os.path.exists(path):
+        raise SystemExit(f"{path} already exists; bump REPORT_DICT_VERSION instead of rewriting a released dictionary")
+    rng = random.Random(20260101)
+    samples = [json.dumps(sample_report(rng), ensure_ascii=False) for _ in range(8)]
+    data = build_dictionary(samples)
+    with open(path, "wb") as f:
+        f.write(data)
+    print(f"wrote {path} ({len(data)} bytes)")
+
+
+def _measure(engine, path: str) -> dict:
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+        conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT response_json, response_blob FROM analysishistory")).all()
+    reports = [json.loads(report_text(*row)) for row in rows]
+    return {
+        "db_kb": round(os.path.getsize(path) / 1024),
+        "read_all_ms": round((time.perf_counter() - started) * 1000, 1),
+        "rows": len(reports),
+    }
+
+
+def main_bench(rows: int):
+    rng = random.Random(7)
+    reports = [sample_report(rng) for _ in range(rows)]
+    plain = [json.dumps(r) for r in reports]
+    print(f"avg report: {sum(map(len, plain)) / rows:.0f} chars (json.dumps, ascii-escaped)")
+    utf8 = [json.dumps(r, ensure_ascii=False) for r in reports[:200]]
+    for version in (0, REPORT_DICT_VERSION):
+        sizes = [len(encode_report(t, version)) for t in utf8]
+        print(f"  codec v{version}: avg {sum(sizes) / len(sizes):.0f} bytes")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        engine = make_engine(path)
+        main.SQLModel.metadata.create_all(engine, tables=[main.AnalysisHistory.__table__])
+        with engine.begin() as conn:
+            conn.execute(main.AnalysisHistory.__table__.insert(), [
+                {"user_email": "bench@x", "field_name": r["keyword_strategy"][0], "address": "a", "score": r["score"],
+                 "response_json": p} for r, p in zip(reports, plain)
+            ])
+        print("plain:     ", _measure(engine, path))
+        print("migration: ", compress_history_rows(engine, main.AnalysisHistory))
+        print("compressed:", _measure(engine, path))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--build-dict", action="store_true")
+    args = parser.parse_args()
+    if args.build_dict:
+        build_dict()
+    else:
+        main_bench(args.rows)
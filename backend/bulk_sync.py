@@ -5,22 +5,19 @@
 """
 
 import asyncio
-import httpx
-import random
-from sqlmodel import Field, Session, SQLModel, create_engine, select
+from sqlmodel import Field, Session, SQLModel, select
 from typing import Optional
 import datetime
 import logging
+from crawler import IsaleCrawler
+from db import run_write
+from site_store import bump_catalog_version, upsert_sites
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Database setup
-import os
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-sqlite_file_name = os.path.join(BASE_DIR, "database.db")
-sqlite_url = f"sqlite:///{sqlite_file_name}"
-engine = create_engine(sqlite_url, connect_args={"check_same_thread": False})
+# Database setup (WAL + pragma 가 적용된 공용 쓰기 엔진)
+from db import write_engine as engine
 
 class Site(SQLModel, table=True):
     __table_args__ = {'extend_existing': True}
@@ -96,117 +93,63 @@ KEYWORDS = [
     "선착순", "지역주택조합", "재개발", "재건축", "신축", "입주"
 ]
 
-async def fetch_with_retry(client, url, params, headers, max_retries=3):
-    """재시도 로직이 포함된 HTTP 요청"""
-    for attempt in range(max_retries):
-        try:
-            response = await client.get(url, params=params, headers=headers, timeout=15.0)
-            if response.status_code == 200:
-                return response
-            elif response.status_code == 302:
-                logger.warning(f"Redirect detected for keyword: {params.get('keyword')}")
-                await asyncio.sleep(1 + attempt)
-            else:
-                logger.warning(f"Status {response.status_code} for keyword: {params.get('keyword')}")
-        except Exception as e:
-            logger.error(f"Request failed (attempt {attempt + 1}): {e}")
-            await asyncio.sleep(1 + attempt)
-    return None
-
-async def collect_data():
-    """전국 분양 데이터 수집"""
+def save_items(keyword: str, items: list) -> int:
+    """검색 결과 한 페이지를 한 트랜잭션의 일괄 upsert 로 DB에 반영하고 신규 추가 수를 반환
+
+    신규 현장은 전체 필드로 추가, 기존 현장은 분양 상태와 갱신 시각만 업데이트
+    """
+    now = datetime.datetime.now()
+    rows = [{
+        "id": f"extern_isale_{item.get('complexNo')}",
+        "name": item.get("complexName", ""),
+        "address": item.get("address", ""),
+        "brand": item.get("h_name"),
+        "category": item.get("complexTypeName", "부동산"),
+        "price": 1900.0,
+        "target_price": 2200.0,
+        "supply": item.get("totalHouseholdCount", 500),
+        "status": item.get("salesStatusName"),
+        "last_updated": now
+    } for item in items]
+    if not rows:
+        return 0
+    with engine.begin() as conn:
+        new_count, _ = upsert_sites(conn, Site, rows, update_columns=["status", "last_updated"])
+        # 서버의 현장 상세/검색 응답 캐시 무효화
+        bump_catalog_version(conn)
+    return new_count
+
+async def collect_data(url: Optional[str] = None, **crawler_options):
+    """전국 분양 데이터 수집 (워커 수 / 요청 속도는 CRAWL_* 환경변수 또는 crawler_options)"""
     SQLModel.metadata.create_all(engine)
-    
+
     total_count = 0
     new_count = 0
-    
+
+    async def on_items(keyword: str, items: list):
+        nonlocal total_count, new_count
+        if not items:
+            logger.info(f"  No results for '{keyword}'")
+            return
+        logger.info(f"  Found {len(items)} items for '{keyword}'")
+        total_count += len(items)
+        # DB 쓰기는 write 스레드 풀에서 (이벤트 루프를 막지 않아 다른 워커는 계속 수집)
+        added = await run_write(save_items, keyword, items)
+        new_count += added
+
     # 모든 검색 키워드 조합
     all_keywords = REGIONS + BRANDS + KEYWORDS
-    
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        for idx, keyword in enumerate(all_keywords):
-            try:
-                logger.info(f"[{idx+1}/{len(all_keywords)}] Searching: {keyword}")
-                
-                # 랜덤 쿠키 생성
-                fake_nnb = "".join(random.choices("0123456789ABCDEF", k=16))
-                
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                    "Accept": "application/json, text/plain, */*",
-                    "Accept-Language": "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7",
-                    "Accept-Encoding": "gzip, deflate, br",
-                    "Referer": "https://m.land.naver.com/",
-                    "Origin": "https://m.land.naver.com",
-                    "Cookie": f"NNB={fake_nnb}",
-                    "Sec-Fetch-Dest": "empty",
-                    "Sec-Fetch-Mode": "cors",
-                    "Sec-Fetch-Site": "same-site"
-                }
-                
-                url = "https://isale.land.naver.com/iSale/api/complex/searchList"
-                params = {
-                    "keyword": keyword,
-                    "complexType": "APT:ABYG:JGC:OR:OP:VL:DDD:ABC:ETC:UR:HO:SH",
-                    "salesStatus": "0:1:2:3:4:5:6:7:8:9:10:11:12",
-                    "pageSize": "100"
-                }
-                
-                response = await fetch_with_retry(client, url, params, headers)
-                
-                if response and response.status_code == 200:
-                    try:
-                        data = response.json()
-                        items = data.get("result", {}).get("list", [])
-                        
-                        if items:
-                            logger.info(f"  Found {len(items)} items for '{keyword}'")
-                            
-                            with Session(engine) as session:
-                                for item in items:
-                                    total_count += 1
-                                    site_id = f"extern_isale_{item.get('complexNo')}"
-                                    
-                                    existing = session.get(Site, site_id)
-                                    if not existing:
-                                        new_site = Site(
-                                            id=site_id,
-                                            name=item.get("complexName", ""),
-                                            address=item.get("address", ""),
-                                            brand=item.get("h_name"),
-                                            category=item.get("complexTypeName", "부동산"),
-                                            price=1900.0,
-                                            target_price=2200.0,
-                                            supply=item.get("totalHouseholdCount", 500),
-                                            status=item.get("salesStatusName")
-                                        )
-                                        session.add(new_site)
-                                        new_count += 1
-                                    else:
-                                        # 기존 데이터 업데이트
-                                        existing.status = item.get("salesStatusName")
-                                        existing.last_updated = datetime.datetime.now()
-                                
-                                session.commit()
-                        else:
-                            logger.info(f"  No results for '{keyword}'")
-                    except Exception as e:
-                        logger.error(f"  Error processing data for '{keyword}': {e}")
-                
-                # API 호출 간격 (너무 빠르면 차단될 수 있음)
-                await asyncio.sleep(random.uniform(0.3, 0.8))
-                
-            except Exception as e:
-                logger.error(f"Error with keyword '{keyword}': {e}")
-                continue
-    
+    crawler = IsaleCrawler(all_keywords, on_items, url=url, **crawler_options)
+    stats = await crawler.run()
+
     logger.info(f"\n{'='*60}")
     logger.info(f"수집 완료!")
     logger.info(f"총 발견: {total_count}개")
     logger.info(f"신규 추가: {new_count}개")
+    logger.info(f"크롤링 통계: {stats.as_dict()}")
     logger.info(f"{'='*60}")
-    
-    return {"total": total_count, "new": new_count}
+
+    return {"total": total_count, "new": new_count, "stats": stats.as_dict()}
 
 if __name__ == "__main__":
     print("전국 분양 데이터 수집을 시작합니다...")
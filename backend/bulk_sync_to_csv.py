@@ -1,13 +1,13 @@
 import asyncio
-import httpx
 import csv
-import os
-import random
-import time
+import datetime
 from sqlmodel import Session, select
-from main import engine, Site, create_db_and_tables
+from main import engine, Site, create_db_and_tables, prepare_site_fts_for_swap, rebuild_site_fts_after_swap
+from crawler import IsaleCrawler
+from db import run_write
+from site_store import SiteStaging
 
-async def sync_all_industrial():
+async def sync_all_industrial(url=None, **crawler_options):
     print("🚀 Starting INDUSTRIAL Full-Coverage Sync (200+ Regional Scans)")
     create_db_and_tables()
     
@@ -22,77 +22,41 @@ async def sync_all_industrial():
 
     keywords = sorted(list(set(seoul + gyeonggi + incheon + busan + other_major + marketing)))
     
-    # 2. Random User-Agents
-    uas = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Edge/120.0.0.0",
-        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1"
-    ]
-    
     print(f"Plan: {len(keywords)} keywords to scan.")
     
     new_count = 0
     total_found = 0
-    
-    async with httpx.AsyncClient(follow_redirects=False) as client:
-        for i, kw in enumerate(keywords):
-            try:
-                print(f"[{i+1}/{len(keywords)}] {kw}:", end=" ", flush=True)
-                
-                # Randomized Delay to mimic human
-                await asyncio.sleep(random.uniform(1.5, 3.5)) 
-                
-                fake_nnb = "".join(random.choices("0123456789abcdef", k=16))
-                ua = random.choice(uas)
-                h = {
-                    "User-Agent": ua,
-                    "Cookie": f"NNB={fake_nnb}",
-                    "Referer": "https://isale.land.naver.com/"
-                }
-                
-                url = "https://isale.land.naver.com/iSale/api/complex/searchList"
-                params = {
-                    "keyword": kw, 
-                    "complexType": "APT:ABYG:JGC:OR:OP:VL:DDD:ABC:ETC:UR:HO:SH", 
-                    "salesStatus": "0:1:2:3:4:5:6:7:8:9:10:11:12", 
-                    "pageSize": "100"
-                }
-                
-                res = await client.get(url, params=params, headers=h, timeout=10.0)
-                
-                if res.status_code == 200:
-                    data = res.json()
-                    items = data.get("result", {}).get("list", [])
-                    total_found += len(items)
-                    
-                    with Session(engine) as session:
-                        added = 0
-                        for it in items:
-                            sid = f"extern_isale_{it.get('complexNo')}"
-                            if not session.get(Site, sid):
-                                session.add(Site(
-                                    id=sid, 
-                                    name=it.get("complexName"), 
-                                    address=it.get("address"),
-                                    brand=it.get("h_name"), 
-                                    category=it.get("complexTypeName", "부동산"),
-                                    price=1900.0, target_price=2200.0, supply=500, 
-                                    status=it.get("salesStatusName")
-                                ))
-                                new_count += 1
-                                added += 1
-                        session.commit()
-                        print(f"{len(items)} items ({added} new).")
-                elif res.status_code == 302:
-                    print("Blocked (302).")
-                    await asyncio.sleep(10) # Heavy sleep if blocked
-                else:
-                    print(f"Error {res.status_code}.")
-                
-            except Exception as e:
-                print(f"Fail: {e}")
+
+    async def on_items(kw, items):
+        nonlocal new_count, total_found
+        total_found += len(items)
+        # 이미 있는 현장은 그대로 두고 신규만 추가 (한 페이지 = 한 번의 일괄 INSERT, write 스레드 풀에서)
+        added, _ = await run_write(staging.upsert, [{
+            "id": f"extern_isale_{it.get('complexNo')}",
+            "name": it.get("complexName"),
+            "address": it.get("address"),
+            "brand": it.get("h_name"),
+            "category": it.get("complexTypeName", "부동산"),
+            "price": 1900.0, "target_price": 2200.0, "supply": 500,
+            "down_payment": "10%", "interest_benefit": "중도금 무이자",
+            "status": it.get("salesStatusName"),
+            "last_updated": datetime.datetime.now()
+        } for it in items], update_columns=[])
+        new_count += added
+        print(f"{kw}: {len(items)} items ({added} new).")
+
+    # 크롤링 동안 서버는 기존 site 를 그대로 읽고, 결과는 site_staging 에 모은 뒤 한 번에 교체
+    # (크롤링 중 site 에 들어온 CSV import / bulk_sync / 관리자 수정은 swap 때 다시 반영되며 같은 현장이면 그쪽이 우선)
+    staging = SiteStaging(engine, Site)
+    staging.create(copy_existing=True)
+    try:
+        # 워커 풀 + 토큰 버킷 + 차단(302) 시 적응형 backoff (crawler.py)
+        stats = await IsaleCrawler(keywords, on_items, url=url, **crawler_options).run()
+        print(f"Crawl stats: {stats.as_dict()}")
+        staging.swap(after_swap=rebuild_site_fts_after_swap, before_swap=prepare_site_fts_for_swap)
+    except BaseException:
+        staging.discard()
+        raise
 
     # Export all sites to CSV
     print(f"\n📝 Exporting {total_found} cumulative items to CSV...")
@@ -1,11 +1,8 @@
-from sqlmodel import Session, create_engine, select
+from sqlmodel import Session, select
 from main import Site
+from db import DB_PATH as sqlite_file_name, read_engine as engine
 import os
 
-sqlite_file_name = "database.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
-engine = create_engine(sqlite_url)
-
 def check_db():
     with Session(engine) as session:
         # Check for '이안'
@@ -0,0 +1,234 @@
+"""
+isale 키워드 크롤링 엔진 (bulk_sync.py / bulk_sync_to_csv.py 공용)
+
+- N 개의 async 워커가 키워드 큐를 나눠 처리 (CRAWL_WORKERS)
+- 전역 토큰 버킷으로 초당 요청 수 제한 (CRAWL_RATE, CRAWL_BURST)
+- 호스트별 동시 요청 수 제한 (CRAWL_PER_HOST)
+- 고정 sleep 대신 302/403/429(차단) 응답이 오면 모든 워커가 함께 쉬는 시간을 지수적으로 늘리고,
+  정상 응답이 이어지면 다시 줄임
+- 진행률 / 처리량(keywords/s, items/s) 로그
+
+테스트에서는 url 을 로컬 mock 서버로 바꿔 사용합니다 (test_crawler.py).
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ISALE_SEARCH_URL = os.getenv("ISALE_SEARCH_URL", "https://isale.land.naver.com/iSale/api/complex/searchList")
+ISALE_SEARCH_PARAMS = {
+    "complexType": "APT:ABYG:JGC:OR:OP:VL:DDD:ABC:ETC:UR:HO:SH",
+    "salesStatus": "0:1:2:3:4:5:6:7:8:9:10:11:12",
+    "pageSize": "100"
+}
+
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "4"))
+CRAWL_RATE = float(os.getenv("CRAWL_RATE", "2.0"))        # 전체 초당 요청 수
+CRAWL_BURST = int(os.getenv("CRAWL_BURST", "2"))
+CRAWL_PER_HOST = int(os.getenv("CRAWL_PER_HOST", "2"))
+
+BLOCKED_STATUS = {302, 403, 429}
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Edge/120.0.0.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1"
+]
+
+
+def random_headers() -> dict:
+    """요청마다 User-Agent 와 NNB 쿠키를 바꿔 보냄"""
+    fake_nnb = "".join(random.choices("0123456789ABCDEF", k=16))
+    return {
+        "User-Agent": random.choice(USER_AGENTS),
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7",
+        "Referer": "https://isale.land.naver.com/",
+        "Cookie": f"NNB={fake_nnb}"
+    }
+
+
+class TokenBucket:
+    """초당 rate 개, 최대 burst 개까지 모아 둘 수 있는 토큰 버킷"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveBackoff:
+    """차단 응답이 오면 공통 대기 시간을 두 배로, 정상 응답이 오면 절반으로"""
+
+    def __init__(self, base: float = 1.0, max_delay: float = 60.0):
+        self.base = base
+        self.max_delay = max_delay
+        self.delay = 0.0
+        self._pause_until = 0.0
+
+    def blocked(self):
+        self.delay = min(self.max_delay, self.delay * 2 if self.delay else self.base)
+        # 지터를 섞어 워커들이 동시에 재개하지 않도록
+        self._pause_until = max(self._pause_until, time.monotonic() + self.delay * random.uniform(0.8, 1.2))
+
+    def ok(self):
+        self.delay = self.delay / 2 if self.delay > self.base / 4 else 0.0
+
+    async def wait(self):
+        remaining = self._pause_until - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+
+class CrawlStats:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.requests = 0
+        self.blocked = 0
+        self.items = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def as_dict(self) -> dict:
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            "keywords": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "items": self.items,
+            "elapsed_s": round(self.elapsed, 2),
+            "keywords_per_s": round(self.done / elapsed, 2),
+            "items_per_s": round(self.items / elapsed, 1),
+        }
+
+
+ItemsHandler = Callable[[str, List[dict]], Union[None, Awaitable[None]]]
+
+
+class IsaleCrawler:
+    def __init__(self, keywords: List[str], on_items: ItemsHandler, *,
+                 workers: int = CRAWL_WORKERS, rate: float = CRAWL_RATE, burst: int = CRAWL_BURST,
+                 per_host: int = CRAWL_PER_HOST, max_retries: int = 3, url: Optional[str] = None,
+                 params: Optional[dict] = None, headers_factory: Callable[[], dict] = random_headers,
+                 timeout: float = 10.0, backoff: Optional[AdaptiveBackoff] = None, progress_every: int = 10):
+        self.keywords = list(dict.fromkeys(keywords))  # 중복 키워드는 한 번만
+        self.on_items = on_items
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.max_retries = max_retries
+        self.url = url or ISALE_SEARCH_URL
+        self.params = params or ISALE_SEARCH_PARAMS
+        self.headers_factory = headers_factory
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, burst)
+        self.backoff = backoff or AdaptiveBackoff()
+        self.progress_every = max(1, progress_every)
+        self.stats = CrawlStats(len(self.keywords))
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def fetch(self, client: httpx.AsyncClient, keyword: str) -> Optional[List[dict]]:
+        """키워드 하나의 searchList 결과 (재시도 후에도 실패하면 None)"""
+        params = {"keyword": keyword, **self.params}
+        for attempt in range(self.max_retries):
+            await self.backoff.wait()
+            await self.bucket.acquire()
+            try:
+                async with self._host_limit(self.url):
+                    self.stats.requests += 1
+                    res = await client.get(self.url, params=params, headers=self.headers_factory(), timeout=self.timeout)
+            except Exception as e:
+                logger.error(f"Request failed for '{keyword}' (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(min(self.backoff.max_delay, self.backoff.base * (attempt + 1)))
+                continue
+
+            if res.status_code == 200:
+                self.backoff.ok()
+                try:
+                    return res.json().get("result", {}).get("list", []) or []
+                except Exception as e:
+                    logger.error(f"Invalid response for '{keyword}': {e}")
+                    return None
+            if res.status_code in BLOCKED_STATUS:
+                self.stats.blocked += 1
+                self.backoff.blocked()
+                logger.warning(f"Blocked ({res.status_code}) for '{keyword}', backing off {self.backoff.delay:.1f}s")
+            else:
+                logger.warning(f"Status {res.status_code} for keyword: {keyword}")
+        return None
+
+    async def _worker(self, client: httpx.AsyncClient, queue: "asyncio.Queue[str]"):
+        while True:
+            try:
+                keyword = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            items = await self.fetch(client, keyword)
+            if items is None:
+                self.stats.failed += 1
+            else:
+                self.stats.items += len(items)
+                try:
+                    result = self.on_items(keyword, items)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"Error processing data for '{keyword}': {e}")
+            self.stats.done += 1
+            if self.stats.done % self.progress_every == 0 or self.stats.done == self.stats.total:
+                s = self.stats.as_dict()
+                logger.info(
+                    f"[{s['done']}/{s['keywords']}] items={s['items']} blocked={s['blocked']} failed={s['failed']} "
+                    f"({s['keywords_per_s']} kw/s, {s['items_per_s']} items/s)"
+                )
+
+    async def run(self) -> CrawlStats:
+        queue: "asyncio.Queue[str]" = asyncio.Queue()
+        for keyword in self.keywords:
+            queue.put_nowait(keyword)
+
+        limits = httpx.Limits(max_connections=self.per_host * 2, max_keepalive_connections=self.per_host)
+        # 302 는 차단 신호로 판단해야 하므로 리디렉션을 따라가지 않음
+        async with httpx.AsyncClient(follow_redirects=False, limits=limits) as client:
+            await asyncio.gather(*[self._worker(client, queue) for _ in range(min(self.workers, len(self.keywords)) or 1)])
+        self.stats.finished = time.monotonic()
+        return self.stats
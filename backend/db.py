@@ -0,0 +1,111 @@
+"""
+SQLite 엔진 팩토리 (main.py 와 bulk_sync.py / import_csv.py / bulk_sync_to_csv.py 공용)
+
+- WAL 저널: 쓰기 트랜잭션이 진행 중이어도 읽기(검색/상세 조회)가 막히지 않음
+- synchronous=NORMAL, cache_size, mmap_size, temp_store=MEMORY, busy_timeout
+- 쓰기용 작은 풀(write_engine)과 읽기 전용 큰 풀(read_engine)을 분리
+  (read_engine 연결은 query_only 라 실수로 쓰기를 시도하면 바로 오류)
+- async 핸들러용 awaitable 래퍼 (db_read / db_write / run_read / run_write)
+  엔진별 전용 스레드 풀에서 Session 작업을 실행해 이벤트 루프를 막지 않음.
+  CSV import 같은 긴 쓰기가 기본 스레드 풀을 차지해도 검색 읽기는 read 풀에서 따로 처리됨
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, create_engine
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("DATABASE_PATH", os.path.join(BASE_DIR, "database.db"))
+
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_WRITE_POOL = int(os.getenv("DB_WRITE_POOL", "2"))
+DB_READ_POOL = int(os.getenv("DB_READ_POOL", "8"))
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",                                   # WAL 에서는 커밋마다 fsync 하지 않아도 손상 없음
+    "cache_size": os.getenv("DB_CACHE_SIZE", "-65536"),        # 음수 = KiB (64MB)
+    "mmap_size": os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+    "busy_timeout": str(DB_BUSY_TIMEOUT_MS),
+}
+
+
+def make_engine(path: str = DB_PATH, read_only: bool = False, pool_size: int = DB_WRITE_POOL,
+                pragmas: dict = SQLITE_PRAGMAS) -> Engine:
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000},
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        pool_pre_ping=False,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                # journal_mode 는 DB 파일에 유지되는 설정이라 쓰기 연결에서만 변경
+                if name == "journal_mode" and read_only:
+                    continue
+                cur.execute(f"PRAGMA {name}={value}")
+            if read_only:
+                cur.execute("PRAGMA query_only=ON")
+        finally:
+            cur.close()
+
+    return engine
+
+
+write_engine = make_engine(pool_size=DB_WRITE_POOL)
+read_engine = make_engine(read_only=True, pool_size=DB_READ_POOL)
+
+
+# 풀 크기와 같은 수의 스레드 (스레드가 커넥션을 기다리며 노는 일이 없도록)
+read_executor = ThreadPoolExecutor(max_workers=DB_READ_POOL, thread_name_prefix="db-read")
+write_executor = ThreadPoolExecutor(max_workers=DB_WRITE_POOL, thread_name_prefix="db-write")
+
+
+async def run_read(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """읽기 전용 동기 함수를 read 스레드 풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(read_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """쓰기 동기 함수를 write 스레드 풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(write_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _with_session(engine: Engine, fn: Callable[..., T], commit: bool, *args: Any) -> T:
+    with Session(engine) as session:
+        result = fn(session, *args)
+        if commit:
+            session.commit()
+        return result
+
+
+async def db_read(fn: Callable[..., T], *args: Any) -> T:
+    """fn(session, *args) 를 read_engine 세션으로 실행
+
+    세션이 닫힌 뒤에도 쓸 수 있도록 fn 안에서 필요한 값을 모두 읽어 반환해야 합니다.
+    """
+    return await run_read(_with_session, read_engine, fn, False, *args)
+
+
+async def db_write(fn: Callable[..., T], *args: Any) -> T:
+    """fn(session, *args) 를 write_engine 세션으로 실행하고 커밋"""
+    return await run_write(_with_session, write_engine, fn, True, *args)
@@ -0,0 +1,181 @@
+"""
+업스트림별 공유 httpx.AsyncClient 풀
+
+- FastAPI lifespan 에서 start(), 종료 시 aclose()
+- 업스트림(isale / 네이버 검색 / 구글 시트 웹훅)마다 keep-alive 커넥션 풀과 타임아웃을 따로 가짐
+- h2 패키지가 설치되어 있으면 HTTP/2 사용
+- httpcore trace 이벤트로 신규 연결 / 재사용 / 풀 대기 시간을 집계 (metrics())
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 업스트림별 설정 (timeout: 전체 읽기 타임아웃, connect: 연결 타임아웃)
+UPSTREAMS = {
+    "isale": {"timeout": float(os.getenv("ISALE_TIMEOUT", "4.0")), "connect": 2.0, "follow_redirects": True},
+    "naver_search": {"timeout": float(os.getenv("NAVER_SEARCH_TIMEOUT", "4.0")), "connect": 2.0, "follow_redirects": False},
+    # 구글 매크로는 리디렉션을 사용하므로 follow_redirects=True가 필수입니다.
+    "sheet_webhook": {"timeout": float(os.getenv("SHEET_WEBHOOK_TIMEOUT", "8.0")), "connect": 3.0, "follow_redirects": True},
+}
+
+
+class _UpstreamStats:
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.errors = 0
+        self.pool_wait_total = 0.0
+        self.pool_wait_max = 0.0
+
+    def as_dict(self):
+        served = self.new_connections + self.reused_connections
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_ratio": round(self.reused_connections / served, 3) if served else None,
+            "errors": self.errors,
+            "pool_wait_avg_ms": round(self.pool_wait_total / served * 1000, 2) if served else None,
+            "pool_wait_max_ms": round(self.pool_wait_max * 1000, 2),
+        }
+
+
+async def _aclose_quietly(client: httpx.AsyncClient):
+    try:
+        await client.aclose()
+    except Exception as e:
+        # 닫힌 루프의 소켓은 asyncio 로 정리할 수 없어 GC 에 맡김
+        logger.debug(f"Stale HTTP client close failed: {e}")
+
+
+class HttpClientPool:
+    def __init__(self, upstreams: Dict[str, dict] = UPSTREAMS):
+        self.upstreams = upstreams
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+        )
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        self._stats: Dict[str, _UpstreamStats] = {name: _UpstreamStats() for name in upstreams}
+
+    def _make_client(self, name: str) -> httpx.AsyncClient:
+        conf = self.upstreams[name]
+        stats = self._stats.setdefault(name, _UpstreamStats())
+
+        async def on_request(request: httpx.Request):
+            stats.requests += 1
+            stats.in_flight += 1
+            queued_at = time.perf_counter()
+            state = {"connected": False, "done": False}
+
+            async def trace(event_name: str, info: dict):
+                if state["done"]:
+                    return
+                if event_name == "connection.connect_tcp.started":
+                    state["connected"] = True
+                elif event_name.endswith("send_request_headers.started"):
+                    # 커넥션을 확보하기까지 걸린 시간 = 풀 대기(+ 신규 연결 수립)
+                    state["done"] = True
+                    waited = time.perf_counter() - queued_at
+                    stats.pool_wait_total += waited
+                    stats.pool_wait_max = max(stats.pool_wait_max, waited)
+                    if state["connected"]:
+                        stats.new_connections += 1
+                    else:
+                        stats.reused_connections += 1
+
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response):
+            stats.in_flight -= 1
+
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=self.limits,
+            timeout=httpx.Timeout(conf["timeout"], connect=conf["connect"]),
+            follow_redirects=conf["follow_redirects"],
+            # 요청 간에 쿠키가 공유되지 않도록 (요청마다 만들던 이전 클라이언트와 동일하게 stateless)
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """업스트림 이름에 해당하는 공유 클라이언트 (없거나 다른 이벤트 루프에서 만든 것이면 새로 생성)"""
+        try:
+            loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        client = self._clients.get(name)
+        if client is None or client.is_closed or self._loops.get(name) is not loop:
+            if client is not None:
+                self._retire(client, self._loops.get(name), loop)
+            client = self._make_client(name)
+            self._clients[name] = client
+            self._loops[name] = loop
+        return client
+
+    @staticmethod
+    def _retire(client: httpx.AsyncClient, owner: Optional[asyncio.AbstractEventLoop],
+                current: Optional[asyncio.AbstractEventLoop]):
+        """다른 이벤트 루프용 클라이언트로 교체될 때 이전 클라이언트의 커넥션 풀을 닫음"""
+        if client.is_closed:
+            return
+        if owner is not None and not owner.is_closed():
+            # 만든 루프가 아직 살아 있으면 그 루프에서 닫음 (다른 스레드의 루프면 거기서 실행)
+            asyncio.run_coroutine_threadsafe(client.aclose(), owner)
+        elif current is not None:
+            # 루프가 이미 닫혔으면 (asyncio.run 이 끝난 스크립트/테스트) 현재 루프에서 풀을 비움
+            current.create_task(_aclose_quietly(client))
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """공유 클라이언트로 요청 (응답 없이 실패한 요청은 errors 로 집계)"""
+        try:
+            return await self.get(name).request(method, url, **kwargs)
+        except Exception:
+            stats = self._stats[name]
+            stats.errors += 1
+            stats.in_flight = max(0, stats.in_flight - 1)
+            raise
+
+    async def start(self):
+        for name in self.upstreams:
+            self.get(name)
+        logger.info(f"HTTP client pool started (http2={HTTP2_AVAILABLE}, upstreams={list(self.upstreams)})")
+
+    async def aclose(self):
+        current = asyncio.get_running_loop()
+        for name, client in self._clients.items():
+            owner = self._loops.get(name)
+            if owner is not None and owner is not current and not owner.is_closed():
+                self._retire(client, owner, current)
+            elif not client.is_closed:
+                await _aclose_quietly(client)
+        self._clients.clear()
+        self._loops.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+            },
+            "upstreams": {name: stats.as_dict() for name, stats in self._stats.items()},
+        }
@@ -3,83 +3,31 @@
 CSV 파일에서 분양 데이터를 읽어 데이터베이스에 import
 """
 
-import csv
-from sqlmodel import Field, Session, SQLModel, create_engine
-from typing import Optional
-import datetime
+from site_store import import_sites_csv
 
-# Database setup
-import os
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-sqlite_file_name = os.path.join(BASE_DIR, "database.db")
-sqlite_url = f"sqlite:///{sqlite_file_name}"
-engine = create_engine(sqlite_url, connect_args={"check_same_thread": False})
+# Database setup (WAL + pragma 가 적용된 공용 쓰기 엔진)
+from db import write_engine as engine
 
-class Site(SQLModel, table=True):
-    __table_args__ = {'extend_existing': True}
-    
-    id: str = Field(primary_key=True)
-    name: str
-    address: str
-    brand: Optional[str] = None
-    category: str
-    price: float
-    target_price: float
-    supply: int
-    status: Optional[str] = None
-    last_updated: datetime.datetime = Field(default_factory=datetime.datetime.now)
+# content_hash 컬럼이 있는 앱 모델/마이그레이션을 그대로 써야 증분 import 해시/시그니처가 서버와 일치
+from main import Site, create_db_and_tables
 
 def import_csv(filename="sites_data.csv"):
-    """CSV 파일에서 데이터 import"""
-    SQLModel.metadata.create_all(engine)
-    
-    imported = 0
-    updated = 0
+    """CSV 파일에서 데이터 import (청크 단위 일괄 upsert, 기존 행은 갱신 시각도 업데이트)"""
+    create_db_and_tables()
     
-    with open(filename, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        
-        with Session(engine) as session:
-            for row in reader:
-                site_id = row['id']
-                existing = session.get(Site, site_id)
-                
-                if existing:
-                    # 기존 데이터 업데이트
-                    existing.name = row['name']
-                    existing.address = row['address']
-                    existing.brand = row['brand'] if row['brand'] else None
-                    existing.category = row['category']
-                    existing.price = float(row['price'])
-                    existing.target_price = float(row['target_price'])
-                    existing.supply = int(row['supply'])
-                    existing.status = row['status'] if row['status'] else None
-                    existing.last_updated = datetime.datetime.now()
-                    updated += 1
-                else:
-                    # 새 데이터 추가
-                    new_site = Site(
-                        id=site_id,
-                        name=row['name'],
-                        address=row['address'],
-                        brand=row['brand'] if row['brand'] else None,
-                        category=row['category'],
-                        price=float(row['price']),
-                        target_price=float(row['target_price']),
-                        supply=int(row['supply']),
-                        status=row['status'] if row['status'] else None
-                    )
-                    session.add(new_site)
-                    imported += 1
-            
-            session.commit()
+    result = import_sites_csv(
+        engine, Site, filename,
+        update_columns=["name", "address", "brand", "category", "price", "target_price", "supply", "status", "last_updated"]
+    )
+    imported, updated = result["imported"], result["updated"]
     
     print(f"✅ Import 완료!")
     print(f"   신규 추가: {imported}개")
     print(f"   업데이트: {updated}개")
-    print(f"   총: {imported + updated}개")
+    print(f"   건너뜀: {result['skipped']}개")
+    print(f"   총: {imported + updated}개 ({result['elapsed_ms']}ms, {result['rows_per_s']} rows/s)")
     
-    return {"imported": imported, "updated": updated}
+    return result
 
 if __name__ == "__main__":
     print("CSV 데이터 import를 시작합니다...\n")
@@ -0,0 +1,220 @@
+"""
+리드 → 구글 시트 웹훅 전달용 outbox 디스패처
+
+- /submit-lead 는 Lead 와 outbox 행을 한 트랜잭션으로 저장하고 바로 응답 (enqueue)
+- 백그라운드 디스패처가 전송할 차례가 된 행을 batch_size 개씩 가져와 웹훅으로 전송
+- 기본은 리드당 객체 하나씩 전송. LEAD_WEBHOOK_MAX_BATCH 를 올리면 리드가 몰릴 때 linger 동안 모아서
+  max_batch 건씩 JSON 배열 하나로 전송 (웹훅 수신 쪽이 배열을 처리할 수 있어야 함)
+  각 리드에는 enqueue 때 정한 idempotency_key 와 순서용 seq(outbox id)가 들어 있어
+  배치 재전송 시 Apps Script 쪽에서 중복 행을 걸러낼 수 있음
+- 실패하면 지수 백오프(+지터)로 next_attempt_at 을 미루고, max_attempts 를 넘기면 dead 로 표시
+- 전송 전에 lease 만큼 next_attempt_at 을 미뤄 두므로 전송 도중 프로세스가 죽어도
+  lease 가 지나면 다시 전송됨 (at-least-once)
+
+테스트에서는 send 를 로컬 stub 웹훅으로 보내는 함수로 바꿔 사용합니다 (test_lead_outbox.py).
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import suppress
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+
+from sqlalchemy import select, update
+from sqlalchemy.engine import Engine
+
+from db import run_write
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENT = "sent"
+OUTBOX_DEAD = "dead"
+
+LEAD_OUTBOX_BATCH = int(os.getenv("LEAD_OUTBOX_BATCH", "200"))          # 한 번에 가져오는 outbox 행 수
+LEAD_OUTBOX_POLL = float(os.getenv("LEAD_OUTBOX_POLL", "5.0"))
+LEAD_OUTBOX_MAX_ATTEMPTS = int(os.getenv("LEAD_OUTBOX_MAX_ATTEMPTS", "10"))
+LEAD_WEBHOOK_CONCURRENCY = int(os.getenv("LEAD_WEBHOOK_CONCURRENCY", "2"))
+# 웹훅 요청 하나에 담는 리드 수. 기본 1 = 지금의 Apps Script 가 받는 리드 객체 하나 형식.
+# 2 이상이면 본문이 JSON 배열이 되므로 Apps Script 가 배열을 받도록 바꾼 뒤에만 올릴 것
+LEAD_WEBHOOK_MAX_BATCH = int(os.getenv("LEAD_WEBHOOK_MAX_BATCH", "1"))
+LEAD_WEBHOOK_LINGER_MS = float(os.getenv("LEAD_WEBHOOK_LINGER_MS", "200"))
+
+# (outbox id, 시도 횟수, payload)
+Claimed = Tuple[int, int, dict]
+
+
+class LeadOutboxDispatcher:
+    def __init__(self, engine: Engine, outbox_model, send: Callable[[Union[dict, List[dict]]], Awaitable[None]], *,
+                 batch_size: int = LEAD_OUTBOX_BATCH, concurrency: int = LEAD_WEBHOOK_CONCURRENCY,
+                 max_batch: int = LEAD_WEBHOOK_MAX_BATCH, linger: float = LEAD_WEBHOOK_LINGER_MS / 1000,
+                 poll_interval: float = LEAD_OUTBOX_POLL, lease: float = 60.0,
+                 max_attempts: int = LEAD_OUTBOX_MAX_ATTEMPTS, base_delay: float = 2.0, max_delay: float = 900.0):
+        self.engine = engine
+        self.model = outbox_model
+        self.send = send
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_batch = max(1, max_batch)
+        self.linger = linger
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sent = 0
+        self.failed_attempts = 0
+        self.dead = 0
+        self.posts = 0
+        self.max_post_size = 0
+        self.last_error: Optional[str] = None
+        self.last_batch_ms: Optional[float] = None
+        self.last_leads_per_s: Optional[float] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, session, payload: dict, lead_id: Optional[int] = None):
+        """호출한 쪽 트랜잭션 안에서 outbox 행 추가 (커밋은 호출한 쪽에서)
+
+        idempotency_key 는 여기서 한 번 정해 payload 에 저장하므로 재전송해도 바뀌지 않음
+        """
+        payload = {**payload, "idempotency_key": payload.get("idempotency_key") or uuid.uuid4().hex}
+        session.add(self.model(lead_id=lead_id, payload=json.dumps(payload, ensure_ascii=False)))
+
+    def wake(self):
+        """새 행이 커밋되었음을 알려 poll_interval 을 기다리지 않고 바로 전송"""
+        self._wake.set()
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _claim(self) -> List[Claimed]:
+        """전송할 차례인 행을 lease 로 잡아 둠 (UPDATE ... RETURNING 한 문장이라 다른 디스패처와 겹치지 않음)"""
+        table = self.model.__table__
+        now = datetime.datetime.now()
+        due = (
+            select(table.c.id)
+            .where(table.c.status == OUTBOX_PENDING, table.c.next_attempt_at <= now)
+            .order_by(table.c.next_attempt_at, table.c.id)
+            .limit(self.batch_size)
+        )
+        statement = (
+            update(table)
+            .where(table.c.id.in_(due.scalar_subquery()))
+            .values(attempts=table.c.attempts + 1, next_attempt_at=now + datetime.timedelta(seconds=self.lease))
+            .returning(table.c.id, table.c.attempts, table.c.payload)
+        )
+        with self.engine.begin() as conn:
+            rows = conn.execute(statement).all()
+        return sorted((row_id, attempts, json.loads(payload)) for row_id, attempts, payload in rows)
+
+    def _finish(self, results: List[Tuple[int, int, Optional[str]]]):
+        """전송 결과 반영: 성공 → sent, 실패 → 백오프 후 재시도 또는 dead"""
+        table = self.model.__table__
+        now = datetime.datetime.now()
+        with self.engine.begin() as conn:
+            for row_id, attempts, error in results:
+                if error is None:
+                    values = {"status": OUTBOX_SENT, "sent_at": now, "last_error": None}
+                elif attempts >= self.max_attempts:
+                    values = {"status": OUTBOX_DEAD, "last_error": error}
+                else:
+                    values = {"next_attempt_at": now + datetime.timedelta(seconds=self.retry_delay(attempts)),
+                              "last_error": error}
+                conn.execute(update(table).where(table.c.id == row_id).values(**values))
+
+    async def _deliver(self, limit: asyncio.Semaphore, chunk: List[Claimed]) -> List[Tuple[int, int, Optional[str]]]:
+        """outbox 행 묶음을 웹훅 요청 하나로 전송 (요청이 실패하면 묶음 전체가 재시도 대상)"""
+        leads = [{**payload, "seq": row_id} for row_id, _, payload in chunk]
+        async with limit:
+            try:
+                await self.send(leads if self.max_batch > 1 else leads[0])
+                error = None
+            except Exception as e:
+                error = (str(e) or type(e).__name__)[:500]
+        self.posts += 1
+        self.max_post_size = max(self.max_post_size, len(chunk))
+        return [(row_id, attempts, error) for row_id, attempts, _ in chunk]
+
+    async def drain_once(self) -> int:
+        """한 배치 전송 후 가져온 행 수를 반환"""
+        claimed = await run_write(self._claim)
+        if not claimed:
+            return 0
+        started = time.perf_counter()
+        limit = asyncio.Semaphore(self.concurrency)
+        chunks = [claimed[i:i + self.max_batch] for i in range(0, len(claimed), self.max_batch)]
+        results = [r for chunk_results in await asyncio.gather(*(self._deliver(limit, c) for c in chunks))
+                   for r in chunk_results]
+        await run_write(self._finish, results)
+        elapsed = time.perf_counter() - started
+        self.last_batch_ms = round(elapsed * 1000, 1)
+
+        for _, attempts, error in results:
+            if error is None:
+                self.sent += 1
+                continue
+            self.failed_attempts += 1
+            self.last_error = error
+            if attempts >= self.max_attempts:
+                self.dead += 1
+                logger.error(f"Lead webhook gave up after {attempts} attempts: {error}")
+        failed = sum(1 for r in results if r[2] is not None)
+        self.last_leads_per_s = round((len(results) - failed) / max(elapsed, 1e-9), 1)
+        if failed:
+            logger.warning(f"Lead webhook batch: {len(results) - failed} sent, {failed} failed "
+                           f"in {len(chunks)} posts ({self.last_batch_ms}ms)")
+        else:
+            logger.info(f"Lead webhook batch: {len(results)} sent in {len(chunks)} posts "
+                        f"({self.last_batch_ms}ms, {self.last_leads_per_s} leads/s)")
+        return len(claimed)
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            try:
+                claimed = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Lead outbox dispatch error: {e}")
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue  # 밀린 행이 더 있을 수 있음
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                # 새 리드가 들어오면 linger 동안 뒤따르는 리드를 모아 한 요청으로 보냄 (배치 전송일 때만)
+                if self.linger > 0 and self.max_batch > 1:
+                    await asyncio.sleep(self.linger)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            # run 은 대기 없이 첫 배치부터 시작하므로 지난 기동 때 남은 행도 바로 전송됨
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """디스패처 종료 (전송 중이던 행은 lease 가 지난 뒤 다음 기동 때 다시 전송)"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    def metrics(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "sent": self.sent,
+            "failed_attempts": self.failed_attempts,
+            "dead": self.dead,
+            "posts": self.posts,
+            "avg_post_size": round((self.sent + self.failed_attempts) / self.posts, 1) if self.posts else None,
+            "max_post_size": self.max_post_size,
+            "last_error": self.last_error,
+            "last_batch_ms": self.last_batch_ms,
+            "last_leads_per_s": self.last_leads_per_s,
+        }
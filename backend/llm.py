@@ -0,0 +1,332 @@
+"""
+Gemini 호출 실행기
+
+google.generativeai 의 generate_content 는 동기 호출이라 async 핸들러에서 그대로 부르면
+LLM 응답을 기다리는 동안 uvicorn 이벤트 루프 전체가 멈춥니다.
+GeminiRunner 는 전용 스레드 풀에서 호출을 실행하고,
+- 동시 실행 수 제한 (LLM_MAX_CONCURRENCY)
+- 요청별 deadline (대기 + 실행 시간 합산, LLM_DEADLINE)
+- 대기열 / 실행 중 / 실패 / 타임아웃 지표 (metrics())
+를 제공합니다. backend 를 교체하면 실제 Gemini 없이 테스트할 수 있습니다.
+
+hedged_generate() 는 후보 모델 목록을 순서대로 기다리는 대신, 첫 모델이 LLM_HEDGE_DELAY 안에
+끝나지 않거나 실패하면 다음 후보를 겹쳐서 시작하고 가장 먼저 JSON 객체(dict)로 파싱된 응답을 사용합니다.
+모델별 지연/성공률을 기록해 후보 순서를 점진적으로 조정합니다.
+
+stream() 은 generate_content(stream=True) 를 같은 스레드 풀/동시성 한도 안에서 돌리며
+도착하는 텍스트 조각을 async iterator 로 전달합니다 (/analyze/stream).
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "8"))
+# 이 횟수 이상 관측된 모델부터 지연/성공률 기반 순서 조정에 참여
+LLM_MIN_SAMPLES = int(os.getenv("LLM_MIN_SAMPLES", "5"))
+
+
+def gemini_backend(model_name: str, prompt: str, generation_config: Optional[dict], timeout: float) -> str:
+    """실제 Gemini 호출 (스레드 풀에서 실행됨)"""
+    model = genai.GenerativeModel(model_name)
+    response = model.generate_content(
+        prompt,
+        generation_config=generation_config,
+        request_options={"timeout": timeout},
+    )
+    return response.text if response else ""
+
+
+def gemini_stream_backend(model_name: str, prompt: str, generation_config: Optional[dict],
+                          timeout: float) -> Iterator[str]:
+    """실제 Gemini 스트리밍 호출 (스레드 풀에서 순회됨). 도착한 텍스트 조각을 차례로 yield"""
+    model = genai.GenerativeModel(model_name)
+    response = model.generate_content(
+        prompt,
+        generation_config=generation_config,
+        stream=True,
+        request_options={"timeout": timeout},
+    )
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # 안전 필터 등으로 텍스트 파트가 없는 조각
+            continue
+        if text:
+            yield text
+
+
+class ModelStats:
+    """모델별 지연(EWMA)과 성공률"""
+    alpha = 0.2
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.ewma_latency: Optional[float] = None
+
+    @property
+    def samples(self) -> int:
+        return self.successes + self.failures
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.samples if self.samples else 0.0
+
+    def record(self, ok: bool, latency: float):
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.ewma_latency = latency if self.ewma_latency is None else (
+            self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+        )
+
+    def expected_cost(self) -> float:
+        # 성공까지 기대 지연 (실패가 잦을수록 커짐)
+        return (self.ewma_latency or 0.0) / max(self.success_rate, 0.05)
+
+    def as_dict(self) -> dict:
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": round(self.success_rate, 3),
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+        }
+
+
+class GeminiRunner:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, deadline: float = LLM_DEADLINE,
+                 backend: Callable[..., str] = gemini_backend,
+                 stream_backend: Callable[..., Iterable[str]] = gemini_stream_backend):
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.backend = backend
+        self.stream_backend = stream_backend
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gemini")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self.queued = 0
+        self.max_queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.total_latency = 0.0
+        self.hedges = 0
+        self.model_stats: Dict[str, ModelStats] = {}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _acquire(self, deadline: float) -> asyncio.Semaphore:
+        """동시 실행 슬롯 확보 (deadline 안에 못 얻으면 asyncio.TimeoutError)"""
+        semaphore = self._get_semaphore()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=deadline)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.queued -= 1
+        return semaphore
+
+    async def generate(self, model_name: str, prompt: str, generation_config: Optional[dict] = None,
+                       deadline: Optional[float] = None) -> str:
+        """스레드 풀에서 모델을 호출하고 응답 텍스트를 반환. deadline 초과 시 asyncio.TimeoutError"""
+        deadline = deadline or self.deadline
+        started = time.monotonic()
+        semaphore = await self._acquire(deadline)
+
+        remaining = max(0.1, deadline - (time.monotonic() - started))
+        self.in_flight += 1
+        fut = asyncio.get_running_loop().run_in_executor(
+            self._executor, self.backend, model_name, prompt, generation_config, remaining
+        )
+
+        def _release(f):
+            # 슬롯은 스레드가 실제로 끝났을 때 반환 (타임아웃으로 먼저 돌아가도 동시성 한도 유지)
+            self.in_flight -= 1
+            semaphore.release()
+            if not f.cancelled():
+                f.exception()  # 타임아웃 후 끝난 호출의 예외가 'never retrieved' 경고로 남지 않도록
+
+        fut.add_done_callback(_release)
+        try:
+            text = await asyncio.wait_for(asyncio.shield(fut), timeout=remaining)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        self.total_latency += time.monotonic() - started
+        return text
+
+    async def stream(self, model_name: str, prompt: str, generation_config: Optional[dict] = None,
+                     deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """스레드 풀에서 스트리밍 호출을 돌리며 도착하는 텍스트 조각을 전달
+
+        deadline 은 첫 조각이 아니라 스트림 전체에 적용됩니다 (초과 시 asyncio.TimeoutError).
+        소비자가 중간에 멈추면 스레드는 다음 조각을 받는 시점에 순회를 중단합니다.
+        """
+        deadline = deadline or self.deadline
+        started = time.monotonic()
+        semaphore = await self._acquire(deadline)
+
+        remaining = max(0.1, deadline - (time.monotonic() - started))
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def _put(item):
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, item)
+            except RuntimeError:
+                # 이벤트 루프가 이미 닫힘
+                stop.set()
+
+        def _pump():
+            try:
+                for text in self.stream_backend(model_name, prompt, generation_config, remaining):
+                    if stop.is_set():
+                        return
+                    _put(text)
+                _put(end)
+            except Exception as e:
+                _put(e)
+
+        self.in_flight += 1
+        fut = loop.run_in_executor(self._executor, _pump)
+
+        def _release(f):
+            self.in_flight -= 1
+            semaphore.release()
+
+        fut.add_done_callback(_release)
+        try:
+            while True:
+                left = deadline - (time.monotonic() - started)
+                if left <= 0:
+                    raise asyncio.TimeoutError()
+                item = await asyncio.wait_for(chunks.get(), timeout=left)
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            stop.set()
+        self.completed += 1
+        self.total_latency += time.monotonic() - started
+
+    def record_attempt(self, model_name: str, ok: bool, latency: float):
+        """generate() 밖에서 직접 시도한 호출(스트리밍 등)의 결과를 후보 순서 통계에 반영"""
+        self.model_stats.setdefault(model_name, ModelStats()).record(ok, latency)
+
+    def ordered_candidates(self, candidates: List[str]) -> List[str]:
+        """관측이 부족한 모델은 원래 순서대로 먼저, 충분히 관측된 모델은 기대 지연이 낮은 순으로"""
+        unsampled = [m for m in candidates if self.model_stats.get(m, ModelStats()).samples < LLM_MIN_SAMPLES]
+        sampled = [m for m in candidates if m not in unsampled]
+        sampled.sort(key=lambda m: self.model_stats[m].expected_cost())
+        return unsampled + sampled
+
+    async def _attempt(self, model_name: str, prompt: str, generation_config: Optional[dict],
+                       parse: Callable[[str], Any], deadline: Optional[float]):
+        started = time.monotonic()
+        stats = self.model_stats.setdefault(model_name, ModelStats())
+        try:
+            text = await self.generate(model_name, prompt, generation_config=generation_config, deadline=deadline)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats.record(False, time.monotonic() - started)
+            raise
+        parsed = parse(text) if text else None
+        # 리포트/문구 응답은 모두 JSON 객체여야 함 - 배열이나 문자열로 파싱된 응답이 다른 후보를 이기지 않도록
+        if not isinstance(parsed, dict):
+            parsed = None
+        stats.record(bool(parsed), time.monotonic() - started)
+        return parsed
+
+    async def hedged_generate(self, candidates: List[str], prompt: str, parse: Callable[[str], Any],
+                              generation_config: Optional[dict] = None, hedge_delay: Optional[float] = None,
+                              deadline: Optional[float] = None) -> Tuple[Optional[str], Any]:
+        """후보 모델을 지연 시작(hedge)하며 경쟁시키고 처음으로 parse 결과가 비어 있지 않은 dict 인 (모델명, 결과)를 반환
+
+        실패하거나 hedge_delay 동안 응답이 없으면 다음 후보를 시작하고, 성공 시 나머지는 취소합니다.
+        모두 실패하면 (None, None).
+        """
+        hedge_delay = LLM_HEDGE_DELAY if hedge_delay is None else hedge_delay
+        queue = self.ordered_candidates(candidates)
+        running: Dict[asyncio.Task, str] = {}
+
+        def _launch():
+            model_name = queue.pop(0)
+            logger.info(f"Launching model attempt: {model_name}")
+            task = asyncio.ensure_future(self._attempt(model_name, prompt, generation_config, parse, deadline))
+            running[task] = model_name
+
+        _launch()
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    set(running), timeout=hedge_delay if queue else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # 응답이 늦어지면 다음 후보를 겹쳐서 시작
+                    self.hedges += 1
+                    _launch()
+                    continue
+                for task in done:
+                    model_name = running.pop(task)
+                    if task.exception() is None and task.result():
+                        logger.info(f"Success with model: {model_name}")
+                        return model_name, task.result()
+                    logger.error(f"Model {model_name} failed: {str(task.exception() or 'unparseable response')[:100]}")
+                    if queue:
+                        _launch()
+            return None, None
+        finally:
+            for task in running:
+                task.cancel()
+
+    def metrics(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "deadline": self.deadline,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "avg_latency_ms": round(self.total_latency / self.completed * 1000, 1) if self.completed else None,
+            "hedges": self.hedges,
+            "models": {name: stats.as_dict() for name, stats in self.model_stats.items()},
+        }
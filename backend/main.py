@@ -1,5 +1,7 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import random
@@ -7,13 +9,28 @@ import datetime
 import os
 import uvicorn
 import asyncio
-from contextlib import asynccontextmanager
-from sqlmodel import Field, Session, SQLModel, create_engine, select, or_, col
+import time
+from contextlib import aclosing, asynccontextmanager
+from sqlmodel import Field, Session, SQLModel, select, or_, col
+from sqlalchemy import tuple_
 import logging
 import httpx
 import google.generativeai as genai
 import json
+import hashlib
+import base64
 from typing import List, Optional, Union, Any
+from search_index import SiteSearchIndex
+from async_cache import AsyncTTLCache
+from http_clients import HttpClientPool
+from llm import GeminiRunner
+from db import db_read, db_write, read_engine, run_read, write_engine
+from site_store import CatalogVersion, csv_unchanged, ensure_catalog_meta, import_sites_csv, rebuild_sites_csv
+from ai_json import IncrementalJSONObject, extract_json
+from ai_schema import AI_SECTION_KEYS, normalize_ai_section, normalize_ai_sections, normalize_copy_samples
+from prompt_builder import AnalysisPromptBuilder
+from lead_outbox import LeadOutboxDispatcher
+from report_codec import REPORT_CODEC, compress_history_rows, encode_report, report_text
 
 # Gemini API 설정
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -24,51 +41,17 @@ if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
 import logging
-import re
 
 # 구글 시트 웹훅 URL (사용자가 설정한 URL)
-GOOGLE_SHEET_WEBHOOK_URL = "https://script.google.com/macros/s/AKfycbzZLa5HVuEdHpoD3ip6908XGyagJFsfsfJAmlfxLOekrqad0625QbYV4TLai4xHswwDfw/exec"
+GOOGLE_SHEET_WEBHOOK_URL = os.getenv("GOOGLE_SHEET_WEBHOOK_URL", "https://script.google.com/macros/s/AKfycbzZLa5HVuEdHpoD3ip6908XGyagJFsfsfJAmlfxLOekrqad0625QbYV4TLai4xHswwDfw/exec")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_json(text: str):
-    """문자열에서 JSON 블록만 추출하는 고도화된 함수 (RegEx 사용)"""
-    if not text:
-        return None
-    
-    # 1. ```json 블록 추출 시도
-    match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(1).strip())
-        except: pass
-        
-    # 2. 일반 ``` 블록 추출 시도
-    match = re.search(r"```\s*(\{.*?\})\s*```", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(1).strip())
-        except: pass
-
-    # 3. 텍스트 내의 첫 번째 { 와 마지막 } 사이 추출 시도
-    match = re.search(r"(\{.*\})", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(1).strip())
-        except: pass
-        
-    # 4. 전체 텍스트 시도
-    try:
-        return json.loads(text.strip())
-    except:
-        logger.error(f"Failed to parse AI JSON response: {text[:200]}...")
-        return None
-
 # --- Database Setup ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-sqlite_file_name = os.path.join(BASE_DIR, "database.db")
-sqlite_url = f"sqlite:///{sqlite_file_name}"
-engine = create_engine(sqlite_url, connect_args={"check_same_thread": False})
+SITES_CSV_PATH = os.path.join(BASE_DIR, "sites_data.csv")
+# 쓰기/마이그레이션은 engine(WAL + 작은 쓰기 풀), 조회 전용 경로는 read_engine (db.py)
+engine = write_engine
 
 class Site(SQLModel, table=True):
     __table_args__ = {'extend_existing': True}
@@ -85,6 +68,8 @@ class Site(SQLModel, table=True):
     interest_benefit: Optional[str] = "중도금 무이자"
     status: Optional[str] = None
     last_updated: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    # sites_data.csv 에서 마지막으로 반영한 행 내용의 해시 (증분 reload 비교용)
+    content_hash: Optional[str] = None
 
 class Lead(SQLModel, table=True):
     __table_args__ = {'extend_existing': True}
@@ -96,6 +81,19 @@ class Lead(SQLModel, table=True):
     source: Optional[str] = Field(default="알 수 없음")
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
 
+class LeadOutbox(SQLModel, table=True):
+    """구글 시트 웹훅으로 보낼 리드 (Lead 와 같은 트랜잭션에서 저장, lead_outbox.py 가 전송)"""
+    __table_args__ = {'extend_existing': True}
+    id: Optional[int] = Field(default=None, primary_key=True)
+    lead_id: Optional[int] = None
+    payload: str  # 웹훅 JSON
+    status: str = Field(default="pending")  # pending | sent | dead
+    attempts: int = 0
+    next_attempt_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    last_error: Optional[str] = None
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    sent_at: Optional[datetime.datetime] = None
+
 class AnalysisHistory(SQLModel, table=True):
     __table_args__ = {'extend_existing': True}
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -103,7 +101,10 @@ class AnalysisHistory(SQLModel, table=True):
     field_name: str
     address: str
     score: int
-    response_json: str
+    response_json: str  # 압축 저장된 행은 "" (report_codec.report_text 로 읽기)
+    response_blob: Optional[bytes] = None
+    # 정규화된 분석 입력의 해시 (/analyze 캐시 키, AI 분석 결과에만 기록) - 인덱스는 SECONDARY_INDEXES
+    request_hash: Optional[str] = None
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
 
 # --- NATIONWIDE START DATA ---
@@ -118,6 +119,109 @@ MOCK_SITES = [
     {"id": "busan_gangseo_1", "name": "부산 에코델타시티 12BL", "address": "부산광역시 강서구", "brand": "e편한세상", "category": "아파트", "price": 1600, "target_price": 1950, "supply": 1258, "status": "분양중"},
 ]
 
+# 현장 검색 백엔드: index(인메모리 n-gram, 기본) / fts(SQLite FTS5) / like(ILIKE 스캔)
+SITE_SEARCH_BACKEND = os.getenv("SITE_SEARCH_BACKEND", "index")
+
+# 자동완성용 인메모리 n-gram 색인 (lifespan 에서 빌드, 증분 CSV import 는 바뀐 현장만 반영)
+site_index = SiteSearchIndex(check_interval=float(os.getenv("SITE_INDEX_CHECK_INTERVAL", "30")))
+# 증분 import 에서 이보다 많은 행이 바뀌면 개별 반영 대신 전체 재빌드
+SITE_INDEX_INCREMENTAL_MAX = int(os.getenv("SITE_INDEX_INCREMENTAL_MAX", "2000"))
+
+# FTS5 사용 가능 여부 (create_db_and_tables 에서 설정)
+site_fts_ready = False
+
+# site 테이블의 외부 콘텐츠(shadow) FTS5 테이블과 동기화 트리거
+# NOTE: rowid 로 site 와 연결되므로 site 에 VACUUM 을 돌린 뒤에는 rebuild_site_fts() 필요
+def _site_fts_ddl(fts: str = "site_fts", table: str = "site") -> List[str]:
+    """content 는 항상 site (staging 용 색인도 교체 후에는 site 를 가리키도록)"""
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            name, address, brand, category, status,
+            content='site', content_rowid='rowid', tokenize='trigram'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, name, address, brand, category, status)
+            VALUES (new.rowid, new.name, new.address, new.brand, new.category, new.status);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, name, address, brand, category, status)
+            VALUES ('delete', old.rowid, old.name, old.address, old.brand, old.category, old.status);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, name, address, brand, category, status)
+            VALUES ('delete', old.rowid, old.name, old.address, old.brand, old.category, old.status);
+            INSERT INTO {fts}(rowid, name, address, brand, category, status)
+            VALUES (new.rowid, new.name, new.address, new.brand, new.category, new.status);
+        END""",
+    ]
+
+SITE_FTS_DDL = _site_fts_ddl()
+# site_staging 교체 전에 미리 채워 두는 FTS 색인 (교체 트랜잭션에서 이름만 바꿔 site_fts 로 사용)
+SITE_FTS_NEXT = "site_fts_next"
+
+# 실제 조회 패턴에 맞춘 보조 인덱스 (create_db_and_tables 에서 기존 DB 에도 생성)
+SECONDARY_INDEXES = [
+    # 검색 기본 정렬 (ORDER BY last_updated DESC LIMIT 100) / 검색 색인 갱신 감지 max(last_updated)
+    "CREATE INDEX IF NOT EXISTS ix_site_last_updated ON site (last_updated DESC)",
+    # /history?email= 키셋 페이지 (user_email = ? ORDER BY created_at DESC, id DESC)
+    # 오름차순 인덱스를 역방향으로 읽어야 created_at 이 같을 때 id(rowid) 순서까지 인덱스로 해결됨
+    "CREATE INDEX IF NOT EXISTS ix_analysishistory_user_recent ON analysishistory (user_email, created_at)",
+    # /history (전체 최근순)
+    "CREATE INDEX IF NOT EXISTS ix_analysishistory_recent ON analysishistory (created_at)",
+    # /analyze 캐시 조회 (request_hash = ? AND created_at >= ? ORDER BY created_at DESC)
+    "CREATE INDEX IF NOT EXISTS ix_analysishistory_request_created ON analysishistory (request_hash, created_at DESC)",
+    # 현장별 최근 리드
+    "CREATE INDEX IF NOT EXISTS ix_lead_site_created ON lead (site, created_at DESC)",
+    # 웹훅 outbox 디스패처 (status = 'pending' AND next_attempt_at <= ?)
+    "CREATE INDEX IF NOT EXISTS ix_leadoutbox_status_due ON leadoutbox (status, next_attempt_at)",
+]
+# 위 인덱스로 대체된 인덱스
+OBSOLETE_INDEXES = ["ix_analysishistory_request_hash", "ix_analysishistory_user_created", "ix_analysishistory_created"]
+
+SITE_FTS_REBUILD_SQL = "INSERT INTO site_fts(site_fts) VALUES('rebuild')"
+
+def rebuild_site_fts(conn):
+    """site 테이블 내용으로 site_fts 를 다시 채움"""
+    from sqlalchemy import text
+    conn.execute(text(SITE_FTS_REBUILD_SQL))
+
+def prepare_site_fts_for_swap(conn, staging_name: str):
+    """SiteStaging.swap 의 before_swap: staging 내용으로 site_fts_next 를 쓰기 잠금 밖에서 미리 채움
+
+    이후 staging 에 반영되는 행(교체 때 재반영되는 라이브 쓰기 포함)은 staging 의 트리거로 따라갑니다.
+    """
+    if not site_fts_ready:
+        return
+    from sqlalchemy import text
+    conn.execute(text(f"DROP TABLE IF EXISTS {SITE_FTS_NEXT}"))
+    for ddl in _site_fts_ddl(SITE_FTS_NEXT, staging_name):
+        conn.execute(text(ddl))
+    conn.execute(text(
+        f"INSERT INTO {SITE_FTS_NEXT}(rowid, name, address, brand, category, status) "
+        f"SELECT rowid, name, address, brand, category, status FROM {staging_name}"
+    ))
+
+def rebuild_site_fts_after_swap(cursor):
+    """site 테이블 교체(SiteStaging.swap) 직후 같은 트랜잭션에서 FTS 교체 (rowid 가 바뀌므로 필수)
+
+    prepare_site_fts_for_swap 으로 미리 채운 색인이 있으면 이름만 바꾸고, 없으면 전체 재구축.
+    트리거를 다시 만들기 전에 호출되므로 site_fts 를 참조하는 트리거가 없는 상태에서 교체합니다.
+    """
+    if not site_fts_ready:
+        return
+    # staging 에 붙어 있던 동기화 트리거가 RENAME 으로 site 로 따라왔으면 미리 채운 색인이 최신
+    prepared = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (f"{SITE_FTS_NEXT}_ai",)
+    ).fetchone()
+    if prepared:
+        for op in ("ai", "ad", "au"):
+            cursor.execute(f"DROP TRIGGER {SITE_FTS_NEXT}_{op}")
+        cursor.execute("DROP TABLE site_fts")
+        cursor.execute(f"ALTER TABLE {SITE_FTS_NEXT} RENAME TO site_fts")
+    else:
+        cursor.execute(f"DROP TABLE IF EXISTS {SITE_FTS_NEXT}")
+        cursor.execute(SITE_FTS_REBUILD_SQL)
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
     
@@ -139,6 +243,8 @@ def create_db_and_tables():
                     conn.execute(text("ALTER TABLE site ADD COLUMN down_payment TEXT DEFAULT '10%'"))
                 if 'interest_benefit' not in site_columns:
                     conn.execute(text("ALTER TABLE site ADD COLUMN interest_benefit TEXT DEFAULT '중도금 무이자'"))
+                if 'content_hash' not in site_columns:
+                    conn.execute(text("ALTER TABLE site ADD COLUMN content_hash TEXT"))
                 conn.commit()
                 logger.info("Database migration: Added columns to 'site' table.")
             
@@ -151,31 +257,93 @@ def create_db_and_tables():
                     conn.execute(text("ALTER TABLE analysishistory ADD COLUMN score INTEGER DEFAULT 0"))
                 if 'response_json' not in history_columns:
                     conn.execute(text("ALTER TABLE analysishistory ADD COLUMN response_json TEXT"))
+                if 'request_hash' not in history_columns:
+                    conn.execute(text("ALTER TABLE analysishistory ADD COLUMN request_hash TEXT"))
+                if 'response_blob' not in history_columns:
+                    conn.execute(text("ALTER TABLE analysishistory ADD COLUMN response_blob BLOB"))
                 conn.commit()
                 logger.info("Database migration: Added columns to 'analysishistory' table.")
+
+            # CSV 반영 상태 등 카탈로그 메타데이터
+            ensure_catalog_meta(conn)
+            conn.commit()
+
+            # 보조 인덱스 (이미 있으면 건너뜀)
+            for ddl in SECONDARY_INDEXES:
+                conn.execute(text(ddl))
+            for name in OBSOLETE_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.commit()
     except Exception as e:
         logger.error(f"Migration error: {e}")
 
+    # FTS5 shadow 테이블 (trigram 토크나이저가 없는 SQLite 에서는 ILIKE 검색으로 동작)
+    global site_fts_ready
+    try:
+        with engine.connect() as conn:
+            fts_exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'site_fts'")).first()
+            for ddl in SITE_FTS_DDL:
+                conn.execute(text(ddl))
+            if not fts_exists:
+                rebuild_site_fts(conn)
+                logger.info("Database migration: Created 'site_fts' search table.")
+            conn.commit()
+        site_fts_ready = True
+    except Exception as e:
+        site_fts_ready = False
+        logger.error(f"FTS5 setup error (falling back to ILIKE search): {e}")
+
+    # 기본 현장은 없을 때만 추가 (같은 id 가 CSV 에 있으면 CSV 값이 우선 - 변경 없는 CSV 는 기동 시 재import 하지 않음)
     with Session(engine) as session:
         for s_data in MOCK_SITES:
-            existing = session.get(Site, s_data["id"])
-            if not existing:
+            if not session.get(Site, s_data["id"]):
                 session.add(Site(**s_data))
-            else:
-                for key, value in s_data.items():
-                    setattr(existing, key, value)
         session.commit()
 
+# Gemini 호출 실행기 (전용 스레드 풀 + 동시성 제한 + deadline)
+gemini = GeminiRunner()
+
+# 업스트림별 공유 HTTP 커넥션 풀 (lifespan 에서 시작/종료)
+http_pool = HttpClientPool()
+
+async def _post_lead_webhook(payload: Union[dict, List[dict]]):
+    # 기본은 리드 객체 하나, LEAD_WEBHOOK_MAX_BATCH > 1 이면 리드 배열 (Apps Script 가 배열을 받도록 바꾼 경우만)
+    # sheet_webhook 클라이언트는 Apps Script 의 302 리디렉션을 따라감
+    response = await http_pool.request("sheet_webhook", "POST", GOOGLE_SHEET_WEBHOOK_URL, json=payload)
+    response.raise_for_status()
+
+# 리드 → 구글 시트 웹훅 outbox 디스패처 (lifespan 에서 시작/종료)
+lead_outbox = LeadOutboxDispatcher(engine, LeadOutbox, _post_lead_webhook)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 서버 기동 시 DB 초기화 및 CSV 데이터 기반 고정 데이터 로드
     create_db_and_tables()
+    if REPORT_CODEC == "zlib":
+        try:
+            # 압축 코덱 도입 전에 평문으로 저장된 리포트 이전 (이미 옮긴 행은 건너뜀)
+            await asyncio.to_thread(compress_history_rows, engine, AnalysisHistory)
+        except Exception as e:
+            logger.error(f"History compression migration error: {e}")
     try:
-        await import_csv_data()
-        logger.info("Fixed site data loaded from sites_data.csv successfully.")
+        if csv_unchanged(engine, SITES_CSV_PATH):
+            logger.info("sites_data.csv unchanged since last import; skipping startup import.")
+        else:
+            await import_csv_data()
+            logger.info("Fixed site data loaded from sites_data.csv successfully.")
     except Exception as e:
         logger.error(f"Lifespan data load error: {e}")
+    if SITE_SEARCH_BACKEND == "index" and not site_index.ready:
+        try:
+            site_index.rebuild(read_engine, Site)
+        except Exception as e:
+            logger.error(f"Search index build error: {e}")
+    await http_pool.start()
+    if GOOGLE_SHEET_WEBHOOK_URL:
+        lead_outbox.start()
     yield
+    await lead_outbox.stop()
+    await http_pool.aclose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -197,130 +365,344 @@ class SiteSearchResponse(BaseModel):
     brand: Optional[str] = None
     category: Optional[str] = None
 
-@app.get("/search-sites", response_model=List[SiteSearchResponse])
-async def search_sites(q: str):
-    if not q or len(q) < 1:
+def _db_search_sites(q_parts: List[str], limit: int = 100):
+    """색인이 준비되지 않았을 때 사용하는 ILIKE 기반 DB 검색"""
+    with Session(read_engine) as session:
+        # 모든 검색어 조각이 각각 name, address, brand, category, status 중 하나에라도 포함되어야 함 (AND 검색)
+        statement = select(Site)
+        for part in q_parts:
+            part_lower = part.lower()
+            statement = statement.where(
+                or_(
+                    col(Site.name).ilike(f"%{part_lower}%"), 
+                    col(Site.address).ilike(f"%{part_lower}%"), 
+                    col(Site.brand).ilike(f"%{part_lower}%"),
+                    col(Site.category).ilike(f"%{part_lower}%"),
+                    col(Site.status).ilike(f"%{part_lower}%")
+                )
+            )
+        
+        statement = statement.order_by(col(Site.last_updated).desc()).limit(limit)
+        return session.exec(statement).all()
+
+# 검색 결과 정렬 고도화 (FTS 검색의 _SITE_RANK_SQL 과 동일한 순서)
+def site_sort_key(x, q_lower: str):
+    name_l = x.name.lower() if x.name else ""
+    addr_l = x.address.lower() if x.address else ""
+    brand_l = x.brand.lower() if x.brand else ""
+    cat_l = x.category.lower() if x.category else ""
+    
+    # 1. 현장명과 정확히 일치
+    if name_l == q_lower: return (0, 0)
+    # 2. 브랜드명과 정확히 일치
+    if brand_l == q_lower: return (0, 1)
+    
+    # 3. 현장명이 검색어로 시작
+    if name_l.startswith(q_lower): return (1, name_l.find(q_lower))
+    # 4. 브랜드명이 검색어로 시작
+    if brand_l.startswith(q_lower): return (1, 100 + brand_l.find(q_lower))
+    
+    # 5. 현장명에 검색어 포함
+    if q_lower in name_l: return (2, name_l.find(q_lower))
+    # 6. 브랜드명에 검색어 포함
+    if q_lower in brand_l: return (2, 100 + brand_l.find(q_lower))
+    
+    # 7. 주소에 검색어 포함
+    if q_lower in addr_l: return (3, addr_l.find(q_lower))
+    # 8. 카테고리에 검색어 포함
+    if q_lower in cat_l: return (4, cat_l.find(q_lower))
+    
+    return (999, 999)
+
+# site_sort_key 를 SQL 로 옮긴 것 (tier * 100000 + position)
+_SITE_RANK_SQL = """
+    CASE
+        WHEN lower(site.name) = :q THEN 0
+        WHEN lower(coalesce(site.brand, '')) = :q THEN 1
+        WHEN instr(lower(site.name), :q) = 1 THEN 100000
+        WHEN instr(lower(coalesce(site.brand, '')), :q) = 1 THEN 100100
+        WHEN instr(lower(site.name), :q) > 0 THEN 200000 + instr(lower(site.name), :q) - 1
+        WHEN instr(lower(coalesce(site.brand, '')), :q) > 0 THEN 200100 + instr(lower(coalesce(site.brand, '')), :q) - 1
+        WHEN instr(lower(site.address), :q) > 0 THEN 300000 + instr(lower(site.address), :q) - 1
+        WHEN instr(lower(site.category), :q) > 0 THEN 400000 + instr(lower(site.category), :q) - 1
+        ELSE 99900999
+    END
+"""
+
+def _fts_search_sites(q_lower: str, q_parts: List[str], limit: int = 100):
+    """site_fts(trigram) 기반 검색. 정렬(site_sort_key + bm25)까지 SQL 에서 처리해 limit 가 최상위 결과를 고르도록 함"""
+    from sqlalchemy import text
+    params = {"q": q_lower, "limit": limit}
+    match_terms = []
+    where = []
+    for i, part in enumerate(q_parts):
+        if len(part) >= 3:
+            # trigram 토크나이저는 3글자 이상에서만 색인을 탈 수 있음
+            match_terms.append('"' + part.replace('"', '""') + '"')
+        else:
+            params[f"p{i}"] = part
+            where.append(
+                f"(instr(lower(site.name), :p{i}) > 0 OR instr(lower(site.address), :p{i}) > 0"
+                f" OR instr(lower(coalesce(site.brand, '')), :p{i}) > 0 OR instr(lower(site.category), :p{i}) > 0"
+                f" OR instr(lower(coalesce(site.status, '')), :p{i}) > 0)"
+            )
+
+    if match_terms:
+        params["match"] = " AND ".join(match_terms)
+        source = "site_fts JOIN site ON site.rowid = site_fts.rowid"
+        where.insert(0, "site_fts MATCH :match")
+        # 동순위 안에서는 bm25 (현장명 > 브랜드 > 주소 가중치) 로 정렬
+        order_by = [_SITE_RANK_SQL, "bm25(site_fts, 10.0, 2.0, 5.0, 1.0, 1.0)"]
+    else:
+        source = "site"
+        order_by = [_SITE_RANK_SQL]
+    order_by.append("site.last_updated DESC")
+
+    sql = (
+        f"SELECT site.id, site.name, site.address, site.brand, site.category, site.status FROM {source} "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY {', '.join(order_by)} LIMIT :limit"
+    )
+    with read_engine.connect() as conn:
+        return conn.execute(text(sql), params).all()
+
+# --- 네이버 isale 분양 검색 (캐시) ---
+ISALE_SEARCH_URL = os.getenv("ISALE_SEARCH_URL", "https://isale.land.naver.com/iSale/api/complex/searchList")
+ISALE_PAGE_SIZE = 100
+# 검색어 → 파싱된 결과 목록. 자동완성 타이핑 중 같은/이어지는 검색어가 반복되므로 짧게 캐시
+isale_cache = AsyncTTLCache(
+    ttl=float(os.getenv("ISALE_CACHE_TTL", "300")),
+    stale_ttl=float(os.getenv("ISALE_CACHE_STALE_TTL", "1800")),
+    maxsize=int(os.getenv("ISALE_CACHE_SIZE", "2000")),
+    name="isale_search",
+)
+ISALE_PREFIX_REUSE = os.getenv("ISALE_PREFIX_REUSE", "1") == "1"
+
+def _normalize_query(q: str) -> str:
+    return " ".join(q.lower().split())
+
+async def _fetch_isale_list(keyword: str) -> List[dict]:
+    """isale searchList 호출 후 SiteSearchResponse 필드 dict 목록으로 변환 (실패 시 예외 → 캐시하지 않음)"""
+    fake_nnb = "".join(random.choices("0123456789ABCDEF", k=16))
+    h = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Referer": "https://m.land.naver.com/",
+        "Origin": "https://m.land.naver.com",
+        "Cookie": f"NNB={fake_nnb}",
+        "Sec-Fetch-Dest": "empty",
+        "Sec-Fetch-Mode": "cors",
+        "Sec-Fetch-Site": "same-site"
+    }
+    
+    # 분양 정보가 있는 'isale' 데이터베이스만 조회 (오래된 기축 아파트는 여기서 걸러짐)
+    params = {
+        "keyword": keyword, 
+        "complexType": "APT:ABYG:JGC:OR:OP:VL:DDD:ABC:ETC:UR:HO:SH", 
+        "salesStatus": "0:1:2:3:4:5:6:7:8:9:10:11:12", 
+        "pageSize": str(ISALE_PAGE_SIZE)
+    }
+    res_isale = await http_pool.request("isale", "GET", ISALE_SEARCH_URL, params=params, headers=h)
+    if res_isale.status_code != 200 or "application/json" not in res_isale.headers.get("Content-Type", ""):
+        raise RuntimeError(f"isale searchList returned {res_isale.status_code}")
+    data = res_isale.json()
+
+    items = []
+    for it in (data.get("result") or {}).get("list", []):
+        items.append({
+            "id": f"extern_isale_{it.get('complexNo')}",
+            "name": it.get('complexName'),
+            "address": it.get('address'),
+            "status": it.get('salesStatusName'),
+            "brand": it.get('h_name'),
+            "category": it.get('complexTypeName', '아파트'),
+        })
+    return items
+
+def _narrow_from_prefix(key: str) -> Optional[List[dict]]:
+    """캐시된 더 짧은 검색어 결과가 잘리지 않은 전체 목록이면 로컬에서 좁혀서 재사용 ('힐스테' → '힐스테이트')"""
+    for i in range(len(key) - 1, 0, -1):
+        cached = isale_cache.peek(key[:i], allow_stale=False)
+        if cached is None:
+            continue
+        if len(cached) >= ISALE_PAGE_SIZE:
+            return None
+        parts = key.split()
+        return [
+            it for it in cached
+            if all(any(p in (it.get(f) or "").lower() for f in ("name", "address", "brand")) for p in parts)
+        ]
+    return None
+
+async def search_isale(q: str) -> List[dict]:
+    key = _normalize_query(q)
+    if not key:
         return []
+    if ISALE_PREFIX_REUSE and isale_cache.peek(key) is None:
+        narrowed = _narrow_from_prefix(key)
+        if narrowed is not None:
+            isale_cache.set(key, narrowed)
+            return narrowed
+    return await isale_cache.get_or_load(key, lambda: _fetch_isale_list(key))
 
-    results = []
-    seen_ids = set()
-    q_lower = q.lower().strip()
+# isale 응답을 기다리는 최대 시간(초). 넘으면 DB 결과만 응답하고 upstream 호출은 백그라운드에서 캐시를 채움
+SEARCH_UPSTREAM_BUDGET = float(os.getenv("SEARCH_UPSTREAM_BUDGET", "1.5"))
+
+# 카탈로그 버전 (CSV import / 동기화 때마다 바뀜) 과 버전별 응답 캐시
+catalog_version = CatalogVersion(read_engine, check_interval=float(os.getenv("CATALOG_VERSION_CHECK", "5")))
+SITE_DETAILS_MAX_AGE = int(os.getenv("SITE_DETAILS_MAX_AGE", "300"))
+SEARCH_MAX_AGE = int(os.getenv("SEARCH_MAX_AGE", "30"))
+HISTORY_ENTRY_MAX_AGE = int(os.getenv("HISTORY_ENTRY_MAX_AGE", "3600"))
+site_details_cache = AsyncTTLCache(ttl=3600, maxsize=int(os.getenv("SITE_DETAILS_CACHE_SIZE", "2048")), name="site_details")
+search_local_cache = AsyncTTLCache(ttl=600, maxsize=int(os.getenv("SEARCH_LOCAL_CACHE_SIZE", "1024")), name="search_local")
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def _json_response(request: Request, content: Any, max_age: int, private: bool = False) -> Response:
+    """본문 해시로 만든 strong ETag + Cache-Control, If-None-Match 가 같으면 304"""
+    body = content if isinstance(content, bytes) else \
+        json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    scope = "private" if private else "public"
+    cache_control = f"{scope}, max-age={max_age}" if max_age > 0 else "no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-    # 1. DB 검색 (분양 데이터베이스 우선)
+def _local_site_results(q_lower: str) -> List[SiteSearchResponse]:
+    """DB(색인/FTS/ILIKE) 검색 결과"""
+    q_parts = q_lower.split()
+    if not q_parts:
+        return []
+    if SITE_SEARCH_BACKEND == "index" and site_index.ready:
+        # 인메모리 n-gram 색인 우선 사용 (DB 풀스캔 없이 AND 검색)
+        site_index.refresh_if_stale(read_engine, Site)
+        db_sites = site_index.search(q_parts, limit=100, rank=lambda x: site_sort_key(x, q_lower))
+    elif SITE_SEARCH_BACKEND != "like" and site_fts_ready:
+        db_sites = _fts_search_sites(q_lower, q_parts, limit=100)
+    else:
+        db_sites = _db_search_sites(q_parts, limit=100)
+    logger.info(f"DB search for '{q_lower}' (parts: {q_parts}) found {len(db_sites)} results")
+    return [
+        SiteSearchResponse(id=s.id, name=s.name, address=s.address, status=s.status, brand=s.brand, category=s.category)
+        for s in db_sites
+    ]
+
+async def _cached_local_results(q_lower: str) -> List[SiteSearchResponse]:
+    """카탈로그 버전별로 캐시한 DB 검색 결과 (read 스레드 풀에서 조회)"""
     try:
-        q_parts = q_lower.split()
-        if not q_parts:
-            return []
-            
-        with Session(engine) as session:
-            # 모든 검색어 조각이 각각 name, address, brand, category, status 중 하나에라도 포함되어야 함 (AND 검색)
-            statement = select(Site)
-            for part in q_parts:
-                part_lower = part.lower()
-                statement = statement.where(
-                    or_(
-                        col(Site.name).ilike(f"%{part_lower}%"), 
-                        col(Site.address).ilike(f"%{part_lower}%"), 
-                        col(Site.brand).ilike(f"%{part_lower}%"),
-                        col(Site.category).ilike(f"%{part_lower}%"),
-                        col(Site.status).ilike(f"%{part_lower}%")
-                    )
-                )
-            
-            statement = statement.order_by(col(Site.last_updated).desc()).limit(100)
-            db_sites = session.exec(statement).all()
-            logger.info(f"DB search for '{q_lower}' (parts: {q_parts}) found {len(db_sites)} results")
-            for s in db_sites:
-                if s.id not in seen_ids:
-                    results.append(SiteSearchResponse(id=s.id, name=s.name, address=s.address, status=s.status, brand=s.brand, category=s.category))
-                    seen_ids.add(s.id)
+        version = await catalog_version.current()
+        return await search_local_cache.get_or_load(
+            (version, q_lower), lambda: run_read(_local_site_results, q_lower)
+        )
     except Exception as e:
         logger.error(f"DB search error: {e}")
+        return []
 
-    # 2. 실시간 분양 전문 API 검색 (구축 아파트를 원천 배제하기 위해 isale API만 사용)
-    try:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            fake_nnb = "".join(random.choices("0123456789ABCDEF", k=16))
-            h = {
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept": "application/json, text/plain, */*",
-                "Accept-Language": "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Referer": "https://m.land.naver.com/",
-                "Origin": "https://m.land.naver.com",
-                "Cookie": f"NNB={fake_nnb}",
-                "Sec-Fetch-Dest": "empty",
-                "Sec-Fetch-Mode": "cors",
-                "Sec-Fetch-Site": "same-site"
-            }
-            
-            # 분양 정보가 있는 'isale' 데이터베이스만 조회 (오래된 기축 아파트는 여기서 걸러짐)
-            url_isale = "https://isale.land.naver.com/iSale/api/complex/searchList"
-            params = {
-                "keyword": q, 
-                "complexType": "APT:ABYG:JGC:OR:OP:VL:DDD:ABC:ETC:UR:HO:SH", 
-                "salesStatus": "0:1:2:3:4:5:6:7:8:9:10:11:12", 
-                "pageSize": "100"
-            }
-            res_isale = await client.get(url_isale, params=params, headers=h, timeout=4.0)
-            if res_isale.status_code == 200 and "application/json" in res_isale.headers.get("Content-Type", ""):
-                data = res_isale.json()
-                for it in data.get("result", {}).get("list", []):
-                    sid = f"extern_isale_{it.get('complexNo')}"
-                    if sid not in seen_ids:
-                        results.append(SiteSearchResponse(
-                            id=sid, name=it.get('complexName'), address=it.get('address'), 
-                            status=it.get('salesStatusName'), brand=it.get('h_name'),
-                            category=it.get('complexTypeName', '아파트')
-                        ))
-                        seen_ids.add(sid)
-    except Exception as e:
-        logger.error(f"API search error: {e}")
-
-    # 검색 결과 정렬 고도화
-    def sort_key(x):
-        name_l = x.name.lower() if x.name else ""
-        addr_l = x.address.lower() if x.address else ""
-        brand_l = x.brand.lower() if x.brand else ""
-        cat_l = x.category.lower() if x.category else ""
-        
-        # 1. 현장명과 정확히 일치
-        if name_l == q_lower: return (0, 0)
-        # 2. 브랜드명과 정확히 일치
-        if brand_l == q_lower: return (0, 1)
-        
-        # 3. 현장명이 검색어로 시작
-        if name_l.startswith(q_lower): return (1, name_l.find(q_lower))
-        # 4. 브랜드명이 검색어로 시작
-        if brand_l.startswith(q_lower): return (1, 100 + brand_l.find(q_lower))
-        
-        # 5. 현장명에 검색어 포함
-        if q_lower in name_l: return (2, name_l.find(q_lower))
-        # 6. 브랜드명에 검색어 포함
-        if q_lower in brand_l: return (2, 100 + brand_l.find(q_lower))
-        
-        # 7. 주소에 검색어 포함
-        if q_lower in addr_l: return (3, addr_l.find(q_lower))
-        # 8. 카테고리에 검색어 포함
-        if q_lower in cat_l: return (4, cat_l.find(q_lower))
-        
-        return (999, 999)
-    
-    results.sort(key=sort_key)
-    logger.info(f"Search query: '{q}' returned {len(results)} results")
+def _merge_site_results(local: List[SiteSearchResponse], external: List[dict], q_lower: str) -> List[SiteSearchResponse]:
+    """DB 결과 우선으로 외부 결과를 합치고 site_sort_key 순으로 정렬"""
+    results = []
+    seen_ids = set()
+    for r in local:
+        if r.id not in seen_ids:
+            results.append(r)
+            seen_ids.add(r.id)
+    for it in external:
+        if it["id"] not in seen_ids:
+            results.append(SiteSearchResponse(**it))
+            seen_ids.add(it["id"])
+    results.sort(key=lambda x: site_sort_key(x, q_lower))
     return results[:100]
 
+def _log_isale_error(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"API search error: {task.exception()}")
+
+def _start_isale_search(q: str) -> asyncio.Future:
+    task = asyncio.ensure_future(search_isale(q))
+    # 예산 초과로 버려진 경우에도 예외가 로그 없이 사라지지 않도록
+    task.add_done_callback(_log_isale_error)
+    return task
+
+def _isale_succeeded(task: asyncio.Future) -> bool:
+    """끝났고 결과가 있는 경우만 (실패/취소된 호출도 done() 은 True)"""
+    return task.done() and not task.cancelled() and task.exception() is None
+
+async def _await_isale(task: asyncio.Future, budget: Optional[float]) -> List[dict]:
+    """latency budget 안에 끝난 isale 결과만 사용 (끝나지 않은 호출은 취소하지 않고 캐시를 채우도록 둠)"""
+    done, _ = await asyncio.wait({task}, timeout=budget)
+    if not done:
+        logger.warning(f"isale search exceeded {budget}s budget; responding with DB results only")
+        return []
+    if not _isale_succeeded(task):
+        return []
+    return task.result()
+
+@app.get("/search-sites", response_model=List[SiteSearchResponse])
+async def search_sites(q: str, request: Request):
+    if not q or len(q) < 1:
+        return []
+
+    q_lower = q.lower().strip()
+    if not q_lower.split():
+        return []
+
+    # 2. 실시간 분양 전문 API 검색 (구축 아파트를 원천 배제하기 위해 isale API만 사용) - DB 검색과 동시에 진행
+    isale_task = _start_isale_search(q)
+
+    # 1. DB 검색 (분양 데이터베이스 우선, 카탈로그 버전별 캐시)
+    local = await _cached_local_results(q_lower)
+
+    results = _merge_site_results(local, await _await_isale(isale_task, SEARCH_UPSTREAM_BUDGET), q_lower)
+    logger.info(f"Search query: '{q}' returned {len(results)} results")
+    # isale 결과가 예산 안에 오지 않았거나 실패했으면 DB 결과뿐이므로 클라이언트가 재사용하지 않도록
+    max_age = SEARCH_MAX_AGE if _isale_succeeded(isale_task) else 0
+    return _json_response(request, [r.model_dump() for r in results], max_age)
+
+@app.get("/search-sites/stream")
+async def search_sites_stream(q: str):
+    """DB 결과를 즉시 보내고, isale 결과가 도착하면 합쳐서 재정렬한 최종 목록을 이어서 보내는 NDJSON 스트림
+
+    각 줄: {"stage": "local" | "final", "results": [...]}
+    """
+    q_lower = (q or "").lower().strip()
+
+    async def event_stream():
+        if not q_lower.split():
+            yield json.dumps({"stage": "final", "results": []}, ensure_ascii=False) + "\n"
+            return
+        isale_task = _start_isale_search(q)
+        local = await _cached_local_results(q_lower)
+        local_sorted = sorted(local, key=lambda x: site_sort_key(x, q_lower))
+        yield json.dumps({"stage": "local", "results": [r.model_dump() for r in local_sorted]}, ensure_ascii=False) + "\n"
+
+        # 스트림은 예산 없이 upstream 완료(또는 클라이언트 타임아웃)까지 기다림
+        external = await _await_isale(isale_task, None)
+        merged = _merge_site_results(local, external, q_lower)
+        yield json.dumps({"stage": "final", "results": [r.model_dump() for r in merged]}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.get("/force-csv-reload")
-async def force_csv_reload():
-    """업로드된 CSV 파일을 기준으로 DB를 완전히 강제 갱신합니다. (주간 업데이트 시 활용)"""
-    from sqlmodel import delete
+async def force_csv_reload(mode: str = "incremental"):
+    """업로드된 CSV 파일을 기준으로 DB를 완전히 강제 갱신합니다. (주간 업데이트 시 활용)
+
+    테이블을 비우고 다시 넣는 대신 CSV 와 비교해 추가/변경/삭제분만 한 트랜잭션으로 반영하므로
+    갱신 중에도 검색은 이전 카탈로그를 그대로 봅니다. (CSV 에 없는 현장은 MOCK_SITES 를 제외하고 삭제)
+    mode=full: site_staging 테이블을 새로 채운 뒤 site 와 한 번에 교체 (스키마/대량 변경 시)
+    """
     try:
-        with Session(engine) as session:
-            session.exec(delete(Site))
-            session.commit()
-        
-        create_db_and_tables()
-        result = await import_csv_data()
+        result = await _run_csv_import(force=True, full=(mode == "full"))
+        if result.get("status") != "success":
+            return result
         return {"status": "success", "message": "CSV 데이터를 기반으로 DB가 강제 갱신되었습니다.", "result": result}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -334,12 +716,22 @@ async def sync_external_naver():
     # (실시간성보다는 CSV 업로드를 권장한다는 메시지 포함 가능)
     return {"status": "deprecated", "message": "실시간 동기화 대신 로컬에서 스캔 후 CSV 업로드 방식을 권장합니다."}
 
+async def _load_site_details(site_id: str) -> Optional[bytes]:
+    site = await db_read(lambda session: session.get(Site, site_id))
+    if not site:
+        return None
+    # content_hash 는 CSV 증분 reload 용 내부 컬럼이라 응답/ETag 에서 제외
+    data = jsonable_encoder(site, exclude={"content_hash"})
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
 @app.get("/site-details/{site_id}")
-async def get_site_details(site_id: str):
+async def get_site_details(site_id: str, request: Request):
     try:
-        with Session(engine) as session:
-            site = session.get(Site, site_id)
-            if site: return site
+        # 카탈로그 버전별로 직렬화된 응답을 캐시 (CSV 반영/동기화 때만 바뀜)
+        version = await catalog_version.current()
+        body = await site_details_cache.get_or_load((version, site_id), lambda: _load_site_details(site_id))
+        if body is not None:
+            return _json_response(request, body, SITE_DETAILS_MAX_AGE)
     except Exception as e:
         logger.error(f"DB fetch error for site {site_id}: {e}")
         
@@ -420,33 +812,11 @@ async def regenerate_copy(req: AnalyzeRequest):
     ai_data = None
     model_candidates = ['gemini-flash-latest', 'gemini-pro-latest', 'gemini-2.0-flash-lite']
     
-    for model_name in model_candidates:
-        try:
-            logger.info(f"Regenerate copy attempt with: {model_name}")
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
-            if response and response.text:
-                ai_data = extract_json(response.text)
-                if ai_data: break
-        except Exception as e:
-            logger.error(f"Regenerate copy model {model_name} failed: {e}")
-            continue
+    # 후보 모델을 hedge 방식으로 경쟁시켜 가장 먼저 파싱된 응답 사용
+    _, ai_data = await gemini.hedged_generate(model_candidates, prompt, parse=extract_json)
 
-    if ai_data:
-        lms_res = ai_data.get("lms_copy_samples", [])
-        if not isinstance(lms_res, list): lms_res = []
-        lms_res = [str(x) for x in lms_res if x]
-        while len(lms_res) < 3: lms_res.append(f"{field_name} 정밀 분석 카피가 준비 중입니다.")
-        
-        chn_res = ai_data.get("channel_talk_samples", [])
-        if not isinstance(chn_res, list): chn_res = []
-        chn_res = [str(x) for x in chn_res if x]
-        while len(chn_res) < 3: chn_res.append(f"{field_name} 맞춤 채널톡 카피가 준비 중입니다.")
-
-        return RegenerateCopyResponse(
-            lms_copy_samples=lms_res[:3],
-            channel_talk_samples=chn_res[:3]
-        )
+    if ai_data and isinstance(ai_data, dict):
+        return RegenerateCopyResponse(**normalize_copy_samples(ai_data, field_name))
     
     # Fallback to smart templates
     lms_samples = [
@@ -461,427 +831,494 @@ async def regenerate_copy(req: AnalyzeRequest):
     ]
     return RegenerateCopyResponse(lms_copy_samples=lms_samples, channel_talk_samples=channel_samples)
 
+# --- /analyze 결과 캐시 (메모리 LRU + AnalysisHistory 테이블) ---
+ANALYZE_CACHE_TTL = float(os.getenv("ANALYZE_CACHE_TTL", "86400"))
+analyze_cache = AsyncTTLCache(ttl=ANALYZE_CACHE_TTL, maxsize=int(os.getenv("ANALYZE_CACHE_SIZE", "256")), name="analyze")
+
+def analyze_cache_key(req: AnalyzeRequest) -> str:
+    """분석 결과에 영향을 주는 입력만 정규화해 만든 해시 (user_email 등은 제외)
+
+    문자열은 공백을 한 칸으로 줄이고 대소문자를 구분하지 않습니다 (e편한세상 / E편한세상, GTX / gtx).
+    """
+    def _text(v):
+        return " ".join(str(v).casefold().split()) if v is not None else ""
+
+    def _num(v):
+        try:
+            return float(v or 0)
+        except (TypeError, ValueError):
+            return 0.0
+
+    sv_digits = "".join(filter(str.isdigit, str(req.supply_volume or "0")))
+    payload = {
+        "field_name": _text(req.field_name),
+        "address": _text(req.address),
+        "product_category": _text(req.product_category),
+        "sales_price": _num(req.sales_price),
+        "target_area_price": _num(req.target_area_price),
+        "supply_volume": int(sv_digits) if sv_digits else 0,
+        "down_payment": _text(req.down_payment),
+        "interest_benefit": _text(req.interest_benefit),
+        "field_keypoints": _text(req.field_keypoints),
+        "main_concern": _text(req.main_concern),
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+async def _lookup_cached_analysis(cache_key: str) -> Optional[dict]:
+    cached = analyze_cache.peek(cache_key, allow_stale=False)
+    if cached is not None:
+        return cached
+    # 재시작 후에도 유지되도록 AnalysisHistory 의 최근 동일 입력 결과를 재사용
+    cutoff = datetime.datetime.now() - datetime.timedelta(seconds=ANALYZE_CACHE_TTL)
+    row = await db_read(lambda session: session.exec(
+        select(AnalysisHistory.response_json, AnalysisHistory.response_blob)
+        .where(AnalysisHistory.request_hash == cache_key, AnalysisHistory.created_at >= cutoff)
+        .order_by(AnalysisHistory.created_at.desc())
+        .limit(1)
+    ).first())
+    if not row:
+        return None
+    result = json.loads(report_text(*row))
+    analyze_cache.set(cache_key, result)
+    return result
+
+async def _save_analysis_history(user_email: Optional[str], field_name: str, address: str, score: int,
+                                 result: dict, request_hash: Optional[str] = None):
+    if REPORT_CODEC == "zlib":
+        response_json, response_blob = "", encode_report(json.dumps(result, ensure_ascii=False))
+    else:
+        response_json, response_blob = json.dumps(result), None
+    history = AnalysisHistory(
+        user_email=user_email,
+        field_name=field_name,
+        address=address,
+        score=int(score),
+        response_json=response_json,
+        response_blob=response_blob,
+        request_hash=request_hash
+    )
+    await db_write(lambda session: session.add(history))
+
+async def _record_cache_hit_history(req: AnalyzeRequest, cache_key: str, result: dict):
+    """캐시 히트여도 요청한 사용자의 히스토리에 해당 리포트가 없으면 한 건 남김"""
+    if not req.user_email:
+        return
+    cutoff = datetime.datetime.now() - datetime.timedelta(seconds=ANALYZE_CACHE_TTL)
+    exists = await db_read(lambda session: session.exec(
+        select(AnalysisHistory.id)
+        .where(AnalysisHistory.request_hash == cache_key, AnalysisHistory.user_email == req.user_email,
+               AnalysisHistory.created_at >= cutoff)
+        .limit(1)
+    ).first())
+    if not exists:
+        await _save_analysis_history(req.user_email, req.field_name, req.address, result.get("score", 0), result, cache_key)
+
+# --- /analyze 리포트 구성 요소 (/analyze 와 /analyze/stream 공용) ---
+ANALYZE_MODEL_CANDIDATES = [
+    'models/gemini-2.5-flash',
+    'models/gemini-2.0-flash',
+    'models/gemini-flash-latest',
+    'models/gemini-pro-latest'
+]
+# GenerationConfig를 사용하여 JSON 형식 응답 유도 (후보 모두 Gemini 모델)
+ANALYZE_GEN_CONFIG = {"response_mime_type": "application/json"}
+# 섹션별 토큰 예산이 있는 /analyze 프롬프트 (PROMPT_BUDGET_<SECTION>, prompt_builder.py)
+analysis_prompt = AnalysisPromptBuilder()
+
+# 로컬 계산으로 바로 만들 수 있는 섹션 (AI 가 채우는 섹션은 ai_schema.AI_SECTION_KEYS, 최종 리포트의 키 순서와 동일)
+LOCAL_SECTION_KEYS = ["score", "score_breakdown", "market_gap_percent", "price_data", "radar_data"]
+
+def _analysis_inputs(req: AnalyzeRequest) -> dict:
+    """요청 값을 분석용으로 정규화 (숫자 변환 실패 시 기본값)"""
+    field_name = getattr(req, 'field_name', "분석 현장")
+    address = getattr(req, 'address', "지역 정보 없음")
+    product_category = getattr(req, 'product_category', "아파트")
+
+    # 숫자 필드 안전하게 변환
+    try:
+        sales_price = float(req.sales_price or 0.0)
+    except: sales_price = 0.0
+
+    try:
+        target_price = float(req.target_area_price or 0.0)
+    except: target_price = 0.0
+
+    market_gap = target_price - sales_price
+
+    # supply_volume 처리 (문자열 포함 시 숫자만 추출)
+    try:
+        sv_raw = str(req.supply_volume or "0")
+        sv_digits = "".join(filter(str.isdigit, sv_raw))
+        supply_volume = int(sv_digits) if sv_digits else 0
+    except:
+        supply_volume = 0
+
+    field_keypoints = getattr(req, 'field_keypoints', "")
+    return {
+        "field_name": field_name,
+        "address": address,
+        "product_category": product_category,
+        "sales_price": sales_price,
+        "target_price": target_price,
+        "market_gap": market_gap,
+        "gap_status": "저렴" if market_gap > 0 else "높은",
+        "gap_percent": abs(round((market_gap / (sales_price if sales_price > 0 else 1)) * 100, 1)),
+        "supply_volume": supply_volume,
+        "main_concern": req.main_concern or "기타",
+        "field_keypoints": field_keypoints,
+        "dp": str(req.down_payment) if req.down_payment else "10%",
+        "ib": req.interest_benefit or "무이자",
+        "fkp": field_keypoints if field_keypoints else "탁월한 입지와 미래가치",
+    }
+
+SEARCH_HTML_MAX_CHARS = int(os.getenv("SEARCH_HTML_MAX_CHARS", "500000"))
+
+async def _live_search_context(field_name: str) -> str:
+    """실시간 여론 및 데이터 수집 (실패해도 분석은 계속)
+
+    검색 결과 HTML 을 그대로 돌려주고, 프롬프트에는 analysis_prompt 가 관련 문장만 골라 넣습니다.
+    """
+    try:
+        search_url = "https://search.naver.com/search.naver"
+        search_params = {"query": f"{field_name} 분양가 모델하우스", "where": "view"}
+        h = {"User-Agent": "Mozilla/5.0"}
+        res = await http_pool.request("naver_search", "GET", search_url, params=search_params, headers=h)
+        if res.status_code == 200:
+            return res.text[:SEARCH_HTML_MAX_CHARS]
+    except Exception as e:
+        logger.warning(f"Live search skipped: {e}")
+    return ""
+
+def _local_analysis_sections(inputs: dict) -> dict:
+    """AI 응답 없이 계산 가능한 점수 / 가격 비교 / 레이더 섹션"""
+    sales_price, target_price = inputs["sales_price"], inputs["target_price"]
+    price_score = min(100, max(0, 100 - abs(sales_price - target_price) / (target_price if target_price > 0 else 1) * 100))
+    location_score = 75 + random.randint(-5, 10)
+    benefit_score = 70 + random.randint(-5, 10)
+    total_score = int((price_score * 0.4 + location_score * 0.3 + benefit_score * 0.3))
+
+    return {
+        "score": int(total_score),
+        "score_breakdown": {
+            "price_score": int(price_score),
+            "location_score": int(location_score),
+            "benefit_score": int(benefit_score),
+            "total_score": int(total_score)
+        },
+        "market_gap_percent": round(inputs["gap_percent"], 2),
+        "price_data": [
+            {"name": "우리 현장", "price": sales_price},
+            {"name": "주변 시세", "price": target_price},
+            {"name": "시세 차익", "price": abs(target_price - sales_price)}
+        ],
+        "radar_data": [
+            {"subject": "분양가", "A": int(price_score), "B": 70, "fullMark": 100},
+            {"subject": "브랜드", "A": 85, "B": 75, "fullMark": 100},
+            {"subject": "단지규모", "A": min(100, (inputs["supply_volume"] // 10) + 20), "B": 60, "fullMark": 100},
+            {"subject": "입지", "A": int(location_score), "B": 65, "fullMark": 100},
+            {"subject": "분양조건", "A": 80, "B": 50, "fullMark": 100},
+            {"subject": "상품성", "A": int(benefit_score), "B": 70, "fullMark": 100}
+        ]
+    }
+
+def _assemble_analysis(local: dict, sections: dict) -> dict:
+    """로컬 섹션과 보정된 AI 섹션을 최종 리포트로 합침"""
+    return {
+        "score": local["score"],
+        "score_breakdown": local["score_breakdown"],
+        "market_diagnosis": sections["market_diagnosis"],
+        "market_gap_percent": local["market_gap_percent"],
+        "price_data": local["price_data"],
+        "radar_data": local["radar_data"],
+        **{key: sections[key] for key in AI_SECTION_KEYS[1:]}
+    }
+
+def _fallback_analysis(inputs: dict) -> dict:
+    """AI 분석 실패 시 Smart Local Engine 리포트"""
+    field_name, address, product_category = inputs["field_name"], inputs["address"], inputs["product_category"]
+    sales_price, target_price, market_gap = inputs["sales_price"], inputs["target_price"], inputs["market_gap"]
+    gap_percent, gap_status, supply_volume = inputs["gap_percent"], inputs["gap_status"], inputs["supply_volume"]
+    field_keypoints, main_concern = inputs["field_keypoints"], inputs["main_concern"]
+    dp, ib, fkp = inputs["dp"], inputs["ib"], inputs["fkp"]
+
+    cat_msg = "주거 선호도가 높은 아파트" if "아파트" in product_category else "수익형 부동산으로서 가치가 높은 상품"
+    smart_diagnosis = (
+        f"[{field_name}]은 인근 시세({target_price}만원) 대비 약 {gap_percent}% {gap_status}한 가격대로 책정되어 실거주 및 투자 수요의 유입이 매우 강력할 것으로 예측됩니다. "
+        f"특히 {address} 내에서도 {cat_msg}로 분류되어 입지적 희소성이 돋보이며, {field_keypoints if field_keypoints else '탁월한 입지'}를 바탕으로 초기 분양률 80% 이상을 목표로 하는 공격적인 마케팅이 유효한 시점입니다. "
+        f"주변 {product_category} 공급량과 대비해 보았을 때 시세 차익 약 {abs(market_gap):.0f}만원의 프리미엄 확보가 가능하므로, 이를 핵심 소구점으로 한 퍼포먼스 광고 집행을 적극 권장합니다."
+    )
+
+    return {
+        "score": 85,
+        "score_breakdown": {
+            "price_score": 90 if market_gap > 0 else 70,
+            "location_score": 82,
+            "benefit_score": 88,
+            "total_score": 85
+        },
+        "market_diagnosis": smart_diagnosis,
+        "market_gap_percent": round(gap_percent, 2),
+        "price_data": [
+            {"name": "우리 현장", "price": sales_price},
+            {"name": "주변 시세", "price": target_price},
+            {"name": "시세 차익", "price": abs(target_price - sales_price)}
+        ],
+        "radar_data": [
+            {"subject": "분양가", "A": 90 if market_gap > 0 else 72, "B": 70, "fullMark": 100},
+            {"subject": "브랜드", "A": 85, "B": 75, "fullMark": 100},
+            {"subject": "단지규모", "A": min(100, (supply_volume // 10) + 30), "B": 60, "fullMark": 100},
+            {"subject": "입지", "A": 80, "B": 65, "fullMark": 100},
+            {"subject": "분양조건", "A": 80, "B": 50, "fullMark": 100},
+            {"subject": "상품성", "A": 90, "B": 70, "fullMark": 100}
+        ],
+        "target_persona": f"{address} 인근 실거주를 희망하는 3040 맞벌이 부부 및 안정적 자산 증식을 노리는 50대 투자자",
+        "target_audience": ["#내집마련", "#실수요자", f"#{address.split()[0] if address and address.split() else '분양'}", "#프리미엄", "#분양정보"],
+        "competitors": [
+            {"name": "인근 비교 단지 A", "price": target_price, "gap_label": "1.1km 인접"},
+            {"name": "인근 비교 단지 B", "price": round(target_price * 1.05), "gap_label": "도보 15분"}
+        ],
+        "ad_recommendation": "네이버 브랜드검색을 통한 신뢰도 확보와 메타/인스타의 '시세차익' 강조 리드광고 비중 7:3 집행 권장",
+        "copywriting": f"[{field_name}] 주변 시세보다 {gap_percent}% 더 가볍게! 마포의 새로운 중심을 선점하십시오.",
+        "keyword_strategy": [field_name, f"{field_name} 분양가", f"{address.split()[0]} 신축아파트", "청약일정", "모델하우스위치"],
+        "weekly_plan": [
+            "1주: 티징 광고 및 관심고객 DB 300건 확보 목표",
+            "2주: 분양가 및 혜택 강조 정밀 타겟팅 캠페인 확산",
+            "3주: 모델하우스 방문 예약 이벤트 및 집중 DB 관리",
+            "4주: 청약 전 마감 입박 메시지 및 최종 상담 전환 활동"
+        ],
+        "roi_forecast": {"expected_leads": 120, "expected_cpl": 48000, "expected_ctr": 1.7, "conversion_rate": 3.2},
+        "lms_copy_samples": [
+            f"【{field_name} | 프리미엄 분양 안내】\n\n대한민국 주거 문화를 선도하는 {field_name}의 특별한 가치에 초대합니다. ✨\n\n현재 {address} 일대는 입지적 희소성과 함께 실거주자들의 문의가 폭주하고 있습니다. 특히 본 현장만이 가진 {fkp if fkp else '압도적 미래 가치'}는 시간이 흐를수록 그 진가를 발휘할 것입니다.\n\n✅ 수분양자를 위한 파격적 혜택:\n- 계약금 단 {dp}로 내 집 마련의 꿈을 실현하세요.\n- 입주 전까지 금융 부담 제로! {ib} 혜택 전격 시행.\n\n주변 구축 시세 대비 약 {gap_percent}% 낮은 합리적 분양가는 향후 강력한 시세 차익의 발판이 될 것입니다. 지금 이 기회를 놓치지 마십시오.\n\n☎️ 공식 분양 센터: 1600-0000",
+            f"[High-End 분석] {field_name} 자산가치 집중 조명\n\n왜 지금 {field_name}이어야 하는가? 팩트로 증명합니다. 📊\n\n본 현장은 {address} 내에서도 {fkp if fkp else '우수한 입지'}를 점유하고 있으며, 1군 브랜드의 시공 능력이 더해진 명품 단지입니다.\n\n💰 금융 프로모션 안내:\n1. {ib} 수혜로 잔금 시까지 금융 비용 0원!\n2. 신축 아파트만의 특화 평면 및 최고급 커뮤니티\n3. {supply_volume}세대 랜드마크 스케일\n\n선착순 호수 지정 제도로 운영 중이오니, 로얄층 선점을 위해 서둘러 연락 주시기 바랍니다.\n☎️ 전문 상담: 010-0000-0000",
+            f"🚨 [긴급] {field_name} 인기 타입 선착순 마감 직전 🚨\n\n오늘 당신의 선택이 5년 뒤 자산의 크기를 바꿉니다! 🔥\n현재 {field_name} 현장은 실시간 계약 폭주로 인해 잔여 물량이 급속도로 소진되고 있습니다.\n\n✨ 핵심 소구점:\n- {address} 중심 인프라를 한 걸음에 누리는 완벽한 입지\n- 전매 무제한 수혜 및 {ib} 파격 조건\n- {fkp} 적용\n\n지금 바로 모델하우스 방문 예약하시고 마지막 남은 로얄층의 주인공이 되십시오. 🎁\n📞 긴급 접수처: 1800-0000"
+        ],
+        "channel_talk_samples": [
+            f"🔥 {field_name} | 파격 조건변경 소식! 🔥\n\n현재 호갱노노 급상승 검색어 등재! 💎\n입주 시까지 계약금 {dp}만으로 내 집 마련이 가능한 마지막 현장.\n\n이자 부담 걱정 끝! {ib} 확정 수혜 단지.\n🚅 {address}의 미래를 선점할 유일한 입지.\n\n지금 바로 채팅으로 잔여 세대를 확인하세요! 👇",
+            f"🚨 [긴급] {field_name} 로열층 선착순 폭주 중! 🚨\n\n망설이면 사라지는 마지막 기회! 현재 홍보관 방문 예약이 줄을 잇고 있습니다. 💨\n\n💎 투자 핵심:\n1. {address} 랜드마크급 {supply_volume}세대 스케일\n2. 인근 대비 {gap_percent}% 합리적 공급가\n\n실시간 잔여 호수와 특별 혜택 정보를 지금 바로 안내해 드립니다! 🗨️",
+            f"📊 {field_name} 전용 [정밀 분석 리포트 확인] 📊\n\n전문가가 분석한 진짜 정보, 궁금하시죠? 🧐\n\n수록 내용:\n- {address} 입지적 가치 및 공급 현황 정밀 진단\n- 시세 차익을 결정짓는 {fkp if fkp else '핵심 입지 가치'}\n- 금융 혜택 적용 시 실투자금 시뮬레이션\n\n지금 채널톡 신청 시 리포트를 즉시 발송해 드립니다! 💎"
+        ],
+        "media_mix": [
+            {"media_id": "gdn", "attention": "3초 안에 관심을 끄는 구글 배너", "empathy": "전국 투자자의 시세차익 열망 자극", "action": "홈페이지 방문 유도"},
+            {"media_id": "kakao", "attention": "카카오톡 알림톡 최적화 메시지", "empathy": "신뢰도 높은 카카오 채널 정보", "action": "카톡 상담 버튼"},
+            {"media_id": "daangn", "attention": "동네 주민 타겟의 이웃 메시지", "empathy": "실거주 로망 실현", "action": "채팅하기 유도"},
+            {"media_id": "hogangnono", "attention": "빅데이터 기반 타겟팅 전문 리포트", "empathy": f"주변 시세 대비 확실한 차익 강조로 {main_concern} 해소", "action": "단독 팝업으로 상세 리포트 신청 유도"},
+            {"media_id": "meta", "attention": "비주얼 임팩트가 강한 숏폼 릴스", "empathy": "3040 신혼부부 및 실수요자 폭넓은 도달", "action": f"화려한 커뮤니티 시설 노출로 {main_concern} 돌파 및 양식 제출"},
+            {"media_id": "lms", "attention": "다이렉트 도달하는 긴급 마감 정보", "empathy": "지역 내 투자자 및 50대 이상 고관여군 자극", "action": "파격적 혜택 부각시킨 장문 메시지로 콜 유도"}
+        ]
+    }
+
 @app.post("/analyze")
 async def analyze_site(request: Optional[AnalyzeRequest] = None):
     """Gemini AI를 사용한 현장 정밀 분석 API (고도화 버전)"""
-    # 기본값 설정 (fallback 시 NameError 방지)
-    field_name = "분석 현장"
-    address = "지역 정보 없음"
-    product_category = "아파트"
-    sales_price = 0.0
-    target_price = 0.0
-    market_gap = 0.0
-    gap_percent = 0.0
-    gap_status = "높은"
-    supply_volume = 0
-    field_keypoints = ""
-    ib = "무이자"
-    dp = "10%"
-    fkp = "탁월한 입지와 미래가치"
-    main_concern = "기타"
-
     logger.info(f">>> Analyze request received: {request.field_name if request else 'No request body'}")
-    
+
+    req = request if request else AnalyzeRequest()
+    inputs = _analysis_inputs(req)
+    field_name, address = inputs["field_name"], inputs["address"]
+
     try:
-        req = request if request else AnalyzeRequest()
-        
-        field_name = getattr(req, 'field_name', "분석 현장")
-        address = getattr(req, 'address', "지역 정보 없음")
-        product_category = getattr(req, 'product_category', "아파트")
-        
-        # 숫자 필드 안전하게 변환
-        try:
-            sales_price = float(req.sales_price or 0.0)
-        except: sales_price = 0.0
-        
-        try:
-            target_price = float(req.target_area_price or 0.0)
-        except: target_price = 0.0
-        
-        market_gap = target_price - sales_price
-        gap_status = "저렴" if market_gap > 0 else "높은"
-        gap_percent = abs(round((market_gap / (sales_price if sales_price > 0 else 1)) * 100, 1))
-        
-        # supply_volume 처리 (문자열 포함 시 숫자만 추출)
+        # 0. 동일 입력의 최근 분석 결과가 있으면 바로 반환
+        cache_key = analyze_cache_key(req)
         try:
-            sv_raw = str(req.supply_volume or "0")
-            sv_digits = "".join(filter(str.isdigit, sv_raw))
-            supply_volume = int(sv_digits) if sv_digits else 0
-        except:
-            supply_volume = 0
-            
-        main_concern = req.main_concern or "기타"
-        field_keypoints = getattr(req, 'field_keypoints', "")
-        dp = str(req.down_payment) if req.down_payment else "10%"
-        ib = req.interest_benefit or "무이자"
-        fkp = field_keypoints if field_keypoints else "탁월한 입지와 미래가치"
-        
+            cached = await _lookup_cached_analysis(cache_key)
+            if cached is not None:
+                logger.info(f"Analyze cache hit for {req.field_name}")
+                await _record_cache_hit_history(req, cache_key, cached)
+                return {**cached, "from_cache": True}
+        except Exception as ce:
+            logger.error(f"Analyze cache lookup failed: {ce}")
+
         # 1. 실시간 여론 및 데이터 수집
-        search_context = ""
-        try:
-            async with httpx.AsyncClient() as client:
-                search_url = "https://search.naver.com/search.naver"
-                search_params = {"query": f"{field_name} 분양가 모델하우스", "where": "view"}
-                h = {"User-Agent": "Mozilla/5.0"}
-                res = await client.get(search_url, params=search_params, headers=h, timeout=4.0)
-                if res.status_code == 200:
-                    search_context = res.text[:3000]
-        except Exception as e:
-            logger.warning(f"Live search skipped: {e}")
-
-        # 2. AI 분석을 위한 프롬프트 작성
-        prompt = f"""
-        당신은 대한민국 부동산 분양 마케팅 상위 0.1% 전문가이자 '분양 알파고' 시스템입니다. 
-        [{field_name}] 현장의 성공적인 분양을 위한 '정밀 시장 및 매체 분석 리포트'를 전문가 수준으로 JSON 작성하십시오.
-
-        [분석 요청 사항]
-        - market_diagnosis: 전문 용어를 적극 활용하여 시장의 거시적 흐름과 단지의 입지적 강점을 최소 5문장 이상으로 상세히 분석하되, 사용자의 가장 큰 고민({main_concern})을 해결할 솔루션을 제안하십시오.
-        - lms_copy_samples & channel_talk_samples: 이모지를 풍부하게 사용하고, 가독성이 좋으면서도 내용이 매우 긴 '호소력 짙은' 문안을 각 매체당 3개씩 작성하십시오.
-        - media_mix: '구글 GDN', '카카오 모먼트', '당근마켓 배너', '호갱노노 채널톡', '메타 릴스', 'LMS 문자' 등 총 6개의 핵심 매체 전부에 대해, **사용자의 핵심 강조 포인트({fkp})와 고민({main_concern})을 타파할 수 있는 매체별 차별화된 광고 3요소(attention, empathy, action)**를 각각 작성하십시오. (media_id는 각각 gdn, kakao, daangn, hogangnono, meta, lms 로 고정)
-
-        [데이터 세트]
-        - 현장명: {field_name} / 위치: {address} / 상품군: {product_category}
-        - 프라이싱: 공급가 {sales_price} VS 주변 시세 {target_price}
-        - 규모/공급: {supply_volume}세대 / 금융조건: 계약금 {dp}, {ib}
-        - 핵심 특장점: {fkp}
-        - 🚨 현장의 가장 큰 마케팅 고민: {main_concern}
-        
-        [JSON Output Structure]
-        {{
-            "market_diagnosis": "...",
-            "target_persona": "...",
-            "target_audience": ["#1", "#2", "#3", "#4", "#5"],
-            "competitors": [
-                {{"name": "인근 단지 A", "price": {target_price or 0}, "gap_label": "도보 5분"}},
-                {{"name": "인근 단지 B", "price": {target_price * 1.05 if target_price else 0}, "gap_label": "1.2km"}}
-            ],
-            "ad_recommendation": "...",
-            "copywriting": "...",
-            "keyword_strategy": ["키원드1", "2", "3", "4", "5"],
-            "weekly_plan": ["1주", "2주", "3주", "4주"],
-            "roi_forecast": {{"expected_leads": 150, "expected_cpl": 45000, "conversion_rate": 3.5, "expected_ctr": 1.9}},
-            "lms_copy_samples": ["긴 카피 1안", "긴 카피 2안", "긴 카피 3안"],
-            "channel_talk_samples": ["채널톡 긴 카피 1안", "채널톡 긴 카피 2안", "채널톡 긴 카피 3안"],
-            "media_mix": [
-                {{"media_id": "gdn", "attention": "시선 집중 예시 카피", "empathy": "공감 메시지", "action": "행동 촉구 메시지"}}
-            ]
-        }}
-        """
-
-        ai_data = None
-        model_candidates = [
-            'models/gemini-2.5-flash',
-            'models/gemini-2.0-flash',
-            'models/gemini-flash-latest',
-            'models/gemini-pro-latest'
-        ]
-        
-        for model_name in model_candidates:
-            try:
-                logger.info(f"Attempting AI analysis with model: {model_name}")
-                model = genai.GenerativeModel(model_name)
-                # GenerationConfig를 사용하여 JSON 형식 응답 유도 (Gemini 지원 모델인 경우)
-                gen_config = {"response_mime_type": "application/json"} if "gemini" in model_name else None
-                
-                response = model.generate_content(prompt, generation_config=gen_config)
-                if response and response.text:
-                    ai_data = extract_json(response.text)
-                    if ai_data: 
-                        logger.info(f"Success with model: {model_name}")
-                        break
-            except Exception as e:
-                logger.error(f"Model {model_name} failed: {str(e)[:100]}")
-                continue
-
-        if not ai_data:
+        search_context = await _live_search_context(field_name)
+
+        # 2. AI 분석을 위한 프롬프트 작성 (검색 HTML 정리는 이벤트 루프 밖에서)
+        prompt = await asyncio.to_thread(analysis_prompt.build, inputs, search_context)
+
+        # 첫 모델이 늦거나 실패하면 다음 후보를 겹쳐 시작하고, 먼저 파싱에 성공한 응답을 사용
+        _, ai_data = await gemini.hedged_generate(
+            ANALYZE_MODEL_CANDIDATES, prompt, parse=extract_json, generation_config=ANALYZE_GEN_CONFIG
+        )
+
+        if not ai_data or not isinstance(ai_data, dict):
             logger.warning("AI model failed. Triggering Smart Local Engine.")
             raise Exception("AI Response Parsing Failed")
 
-        # 필수 필드 누락 방지 및 기본값 보정
-        safe_data = {
-            "market_diagnosis": ai_data.get("market_diagnosis") or "데이터 분석 중입니다.",
-            "target_audience": ai_data.get("target_audience") or ["실거주자", "투자자"],
-            "target_persona": ai_data.get("target_persona") or "안정적 자산 증식을 노리는 수요자",
-            "competitors": ai_data.get("competitors") or [],
-            "ad_recommendation": ai_data.get("ad_recommendation") or "메타 및 네이버 광고 집행 권장",
-            "copywriting": ai_data.get("copywriting") or f"[{field_name}] 지금 바로 만나보세요.",
-            "keyword_strategy": ai_data.get("keyword_strategy") or [field_name, "분양정보"],
-            "weekly_plan": ai_data.get("weekly_plan") or ["1주차: 마케팅 기획"],
-            "roi_forecast": ai_data.get("roi_forecast") or {"expected_leads": 100, "expected_cpl": 50000, "conversion_rate": 2.5, "expected_ctr": 1.8},
-            "lms_copy_samples": ai_data.get("lms_copy_samples") or [],
-            "channel_talk_samples": ai_data.get("channel_talk_samples") or [],
-            "media_mix": ai_data.get("media_mix") or []
-        }
-        
-        # media_mix 내부 필드 보정
-        final_media_mix = []
-        for m in safe_data["media_mix"]:
-            if isinstance(m, dict):
-                final_media_mix.append({
-                    "media_id": str(m.get("media_id", "meta")),
-                    "attention": str(m.get("attention", "3초 안에 핵심 메시지를 전달하세요.")),
-                    "empathy": str(m.get("empathy", "실거주자와 투자자의 니즈를 자극하세요.")),
-                    "action": str(m.get("action", "즉각적인 상담 신청(CTA)을 유도하세요."))
-                })
-        safe_data["media_mix"] = final_media_mix
-        if "expected_ctr" not in safe_data["roi_forecast"]:
-            safe_data["roi_forecast"]["expected_ctr"] = 1.8
-
-        # ROI Forecast 필드 보정
-        default_roi = {"expected_leads": 100, "expected_cpl": 50000, "conversion_rate": 2.5, "expected_ctr": 1.8}
-        if not isinstance(safe_data.get("roi_forecast"), dict):
-            safe_data["roi_forecast"] = default_roi
-        else:
-            for k, v in default_roi.items():
-                if k not in safe_data["roi_forecast"]:
-                    safe_data["roi_forecast"][k] = v
-                else:
-                    try:
-                        safe_data["roi_forecast"][k] = float(safe_data["roi_forecast"][k])
-                    except:
-                        safe_data["roi_forecast"][k] = v
-
-        # 리스트 필드 보정
-        for key in ["lms_copy_samples", "channel_talk_samples", "target_audience", "weekly_plan", "keyword_strategy"]:
-            val = safe_data.get(key)
-            if isinstance(val, str):
-                val = [val]
-            elif not isinstance(val, list):
-                val = []
-            
-            # 카피 샘플은 반드시 3개 보장
-            if key in ["lms_copy_samples", "channel_talk_samples"]:
-                val = [str(x) for x in val if x]
-                while len(val) < 3:
-                    val.append(f"{field_name} 마케팅 정밀 카피 분석 중입니다.")
-                val = val[:3]
-            else:
-                val = [str(x) for x in val]
-                
-            safe_data[key] = val
-
-        # competitors 필드 보정
-        final_competitors = []
-        for c in safe_data["competitors"]:
-            if isinstance(c, dict):
-                try:
-                    p_val = float(c.get("price", 0))
-                except: p_val = 0.0
-                
-                final_competitors.append({
-                    "name": str(c.get("name", "경쟁 단지")),
-                    "price": p_val,
-                    "gap_label": str(c.get("gap_label") or c.get("distance") or "비교군")
-                })
-        safe_data["competitors"] = final_competitors
-
-        price_score = min(100, max(0, 100 - abs(sales_price - target_price) / (target_price if target_price > 0 else 1) * 100))
-        location_score = 75 + random.randint(-5, 10)
-        benefit_score = 70 + random.randint(-5, 10)
-        total_score = int((price_score * 0.4 + location_score * 0.3 + benefit_score * 0.3))
-
-        final_result = {
-            "score": int(total_score),
-            "score_breakdown": {
-                "price_score": int(price_score),
-                "location_score": int(location_score),
-                "benefit_score": int(benefit_score),
-                "total_score": int(total_score)
-            },
-            "market_diagnosis": safe_data["market_diagnosis"],
-            "market_gap_percent": round(gap_percent, 2),
-            "price_data": [
-                {"name": "우리 현장", "price": sales_price},
-                {"name": "주변 시세", "price": target_price},
-                {"name": "시세 차익", "price": abs(target_price - sales_price)}
-            ],
-            "radar_data": [
-                {"subject": "분양가", "A": int(price_score), "B": 70, "fullMark": 100},
-                {"subject": "브랜드", "A": 85, "B": 75, "fullMark": 100},
-                {"subject": "단지규모", "A": min(100, (supply_volume // 10) + 20), "B": 60, "fullMark": 100},
-                {"subject": "입지", "A": int(location_score), "B": 65, "fullMark": 100},
-                {"subject": "분양조건", "A": 80, "B": 50, "fullMark": 100},
-                {"subject": "상품성", "A": int(benefit_score), "B": 70, "fullMark": 100}
-            ],
-            "target_persona": safe_data["target_persona"],
-            "target_audience": safe_data["target_audience"],
-            "competitors": safe_data["competitors"],
-            "ad_recommendation": safe_data["ad_recommendation"],
-            "copywriting": safe_data["copywriting"],
-            "keyword_strategy": safe_data["keyword_strategy"],
-            "weekly_plan": safe_data["weekly_plan"],
-            "roi_forecast": safe_data["roi_forecast"],
-            "lms_copy_samples": safe_data["lms_copy_samples"],
-            "channel_talk_samples": safe_data["channel_talk_samples"],
-            "media_mix": safe_data["media_mix"] if safe_data["media_mix"] else [
-                {"media_id": "gdn", "attention": f"[{field_name}] {fkp}를 강조한 전국 확산 배너 카피!", "empathy": f"{main_concern} 돌파하는 시세차익 강조로 이성적 설득.", "action": "지금 바로 단독 팝업 배너 클릭 유도."},
-                {"media_id": "kakao", "attention": "카카오톡 사용자 최적화된 시선 집중 메시지 구성.", "empathy": "채팅방 내 실시간 정보 제공 및 신뢰도 강화.", "action": "대화형(CTA) 버튼으로 빠른 카톡 상담 유입."},
-                {"media_id": "daangn", "attention": "우리 동네 이웃들에게 보내는 친근하고 핫한 아파트 소식.", "empathy": "현장과 가장 가까운 동네 생활권 내 실거주 수요 자극.", "action": "가벼운 마음으로 채팅 문의 유도."},
-                {"media_id": "hogangnono", "attention": "빅데이터 검색 유저를 위한 확고한 타겟팅 팝업 노출.", "empathy": "실시간 관심 고객에게 투자가치 리포트 및 매력 발산.", "action": f"{main_concern} 극복형 전문 리포트 신청 CTA."},
-                {"media_id": "meta", "attention": "화려한 숏폼 릴스와 비주얼 임팩트로 초기 3초 시선 강탈.", "empathy": "3040 신혼부부의 주거 로망을 자극하는 감성 터치.", "action": "스폰서드 링크에서 즉시 양식 작성 및 콜백 유도."},
-                {"media_id": "lms", "attention": "다이렉트 도달! 스마트폰 즉각 확인 가능한 긴급 SMS 헤드라인.", "empathy": "지역 내 고관여 투자자에게 강력한 이자 지원 동기 부여.", "action": "선착순 방문 예약 링크 클릭 및 혜택 한정 공지."}
-            ]
-        }
-        
-        # 결과를 히스토리에 저장
+        sections = normalize_ai_sections(ai_data, inputs)
+        final_result = _assemble_analysis(_local_analysis_sections(inputs), sections)
+
+        # 결과를 히스토리에 저장 (request_hash 로 이후 동일 요청의 캐시로 사용)
+        analyze_cache.set(cache_key, final_result)
         try:
-            with Session(engine) as session:
-                new_history = AnalysisHistory(
-                    user_email=req.user_email,
-                    field_name=field_name,
-                    address=address,
-                    score=int(total_score),
-                    response_json=json.dumps(final_result)
-                )
-                session.add(new_history)
-                session.commit()
-                logger.info(f"Analysis saved to history for {field_name}")
+            await _save_analysis_history(req.user_email, field_name, address, final_result["score"], final_result, cache_key)
+            logger.info(f"Analysis saved to history for {field_name}")
         except Exception as he:
             logger.error(f"Failed to save analysis to history: {he}")
-            
-        return final_result
+
+        return {**final_result, "from_cache": False}
     except Exception as e:
         import traceback
         logger.error(f"Critical analyze error: {e}\n{traceback.format_exc()}")
-        
-        cat_msg = "주거 선호도가 높은 아파트" if "아파트" in product_category else "수익형 부동산으로서 가치가 높은 상품"
-        smart_diagnosis = (
-            f"[{field_name}]은 인근 시세({target_price}만원) 대비 약 {gap_percent}% {gap_status}한 가격대로 책정되어 실거주 및 투자 수요의 유입이 매우 강력할 것으로 예측됩니다. "
-            f"특히 {address} 내에서도 {cat_msg}로 분류되어 입지적 희소성이 돋보이며, {field_keypoints if field_keypoints else '탁월한 입지'}를 바탕으로 초기 분양률 80% 이상을 목표로 하는 공격적인 마케팅이 유효한 시점입니다. "
-            f"주변 {product_category} 공급량과 대비해 보았을 때 시세 차익 약 {abs(market_gap):.0f}만원의 프리미엄 확보가 가능하므로, 이를 핵심 소구점으로 한 퍼포먼스 광고 집행을 적극 권장합니다."
-        )
 
-        final_result = {
-            "score": 85,
-            "score_breakdown": {
-                "price_score": 90 if market_gap > 0 else 70,
-                "location_score": 82,
-                "benefit_score": 88,
-                "total_score": 85
-            },
-            "market_diagnosis": smart_diagnosis,
-            "market_gap_percent": round(gap_percent, 2),
-            "price_data": [
-                {"name": "우리 현장", "price": sales_price},
-                {"name": "주변 시세", "price": target_price},
-                {"name": "시세 차익", "price": abs(target_price - sales_price)}
-            ],
-            "radar_data": [
-                {"subject": "분양가", "A": 90 if market_gap > 0 else 72, "B": 70, "fullMark": 100},
-                {"subject": "브랜드", "A": 85, "B": 75, "fullMark": 100},
-                {"subject": "단지규모", "A": min(100, (supply_volume // 10) + 30), "B": 60, "fullMark": 100},
-                {"subject": "입지", "A": 80, "B": 65, "fullMark": 100},
-                {"subject": "분양조건", "A": 80, "B": 50, "fullMark": 100},
-                {"subject": "상품성", "A": 90, "B": 70, "fullMark": 100}
-            ],
-            "target_persona": f"{address} 인근 실거주를 희망하는 3040 맞벌이 부부 및 안정적 자산 증식을 노리는 50대 투자자",
-            "target_audience": ["#내집마련", "#실수요자", f"#{address.split()[0] if address and address.split() else '분양'}", "#프리미엄", "#분양정보"],
-            "competitors": [
-                {"name": "인근 비교 단지 A", "price": target_price, "gap_label": "1.1km 인접"},
-                {"name": "인근 비교 단지 B", "price": round(target_price * 1.05), "gap_label": "도보 15분"}
-            ],
-            "ad_recommendation": "네이버 브랜드검색을 통한 신뢰도 확보와 메타/인스타의 '시세차익' 강조 리드광고 비중 7:3 집행 권장",
-            "copywriting": f"[{field_name}] 주변 시세보다 {gap_percent}% 더 가볍게! 마포의 새로운 중심을 선점하십시오.",
-            "keyword_strategy": [field_name, f"{field_name} 분양가", f"{address.split()[0]} 신축아파트", "청약일정", "모델하우스위치"],
-            "weekly_plan": [
-                "1주: 티징 광고 및 관심고객 DB 300건 확보 목표",
-                "2주: 분양가 및 혜택 강조 정밀 타겟팅 캠페인 확산",
-                "3주: 모델하우스 방문 예약 이벤트 및 집중 DB 관리",
-                "4주: 청약 전 마감 입박 메시지 및 최종 상담 전환 활동"
-            ],
-            "roi_forecast": {"expected_leads": 120, "expected_cpl": 48000, "expected_ctr": 1.7, "conversion_rate": 3.2},
-            "lms_copy_samples": [
-                f"【{field_name} | 프리미엄 분양 안내】\n\n대한민국 주거 문화를 선도하는 {field_name}의 특별한 가치에 초대합니다. ✨\n\n현재 {address} 일대는 입지적 희소성과 함께 실거주자들의 문의가 폭주하고 있습니다. 특히 본 현장만이 가진 {fkp if fkp else '압도적 미래 가치'}는 시간이 흐를수록 그 진가를 발휘할 것입니다.\n\n✅ 수분양자를 위한 파격적 혜택:\n- 계약금 단 {dp}로 내 집 마련의 꿈을 실현하세요.\n- 입주 전까지 금융 부담 제로! {ib} 혜택 전격 시행.\n\n주변 구축 시세 대비 약 {gap_percent}% 낮은 합리적 분양가는 향후 강력한 시세 차익의 발판이 될 것입니다. 지금 이 기회를 놓치지 마십시오.\n\n☎️ 공식 분양 센터: 1600-0000",
-                f"[High-End 분석] {field_name} 자산가치 집중 조명\n\n왜 지금 {field_name}이어야 하는가? 팩트로 증명합니다. 📊\n\n본 현장은 {address} 내에서도 {fkp if fkp else '우수한 입지'}를 점유하고 있으며, 1군 브랜드의 시공 능력이 더해진 명품 단지입니다.\n\n💰 금융 프로모션 안내:\n1. {ib} 수혜로 잔금 시까지 금융 비용 0원!\n2. 신축 아파트만의 특화 평면 및 최고급 커뮤니티\n3. {supply_volume}세대 랜드마크 스케일\n\n선착순 호수 지정 제도로 운영 중이오니, 로얄층 선점을 위해 서둘러 연락 주시기 바랍니다.\n☎️ 전문 상담: 010-0000-0000",
-                f"🚨 [긴급] {field_name} 인기 타입 선착순 마감 직전 🚨\n\n오늘 당신의 선택이 5년 뒤 자산의 크기를 바꿉니다! 🔥\n현재 {field_name} 현장은 실시간 계약 폭주로 인해 잔여 물량이 급속도로 소진되고 있습니다.\n\n✨ 핵심 소구점:\n- {address} 중심 인프라를 한 걸음에 누리는 완벽한 입지\n- 전매 무제한 수혜 및 {ib} 파격 조건\n- {fkp} 적용\n\n지금 바로 모델하우스 방문 예약하시고 마지막 남은 로얄층의 주인공이 되십시오. 🎁\n📞 긴급 접수처: 1800-0000"
-            ],
-            "channel_talk_samples": [
-                f"🔥 {field_name} | 파격 조건변경 소식! 🔥\n\n현재 호갱노노 급상승 검색어 등재! 💎\n입주 시까지 계약금 {dp}만으로 내 집 마련이 가능한 마지막 현장.\n\n이자 부담 걱정 끝! {ib} 확정 수혜 단지.\n🚅 {address}의 미래를 선점할 유일한 입지.\n\n지금 바로 채팅으로 잔여 세대를 확인하세요! 👇",
-                f"🚨 [긴급] {field_name} 로열층 선착순 폭주 중! 🚨\n\n망설이면 사라지는 마지막 기회! 현재 홍보관 방문 예약이 줄을 잇고 있습니다. 💨\n\n💎 투자 핵심:\n1. {address} 랜드마크급 {supply_volume}세대 스케일\n2. 인근 대비 {gap_percent}% 합리적 공급가\n\n실시간 잔여 호수와 특별 혜택 정보를 지금 바로 안내해 드립니다! 🗨️",
-                f"📊 {field_name} 전용 [정밀 분석 리포트 확인] 📊\n\n전문가가 분석한 진짜 정보, 궁금하시죠? 🧐\n\n수록 내용:\n- {address} 입지적 가치 및 공급 현황 정밀 진단\n- 시세 차익을 결정짓는 {fkp if fkp else '핵심 입지 가치'}\n- 금융 혜택 적용 시 실투자금 시뮬레이션\n\n지금 채널톡 신청 시 리포트를 즉시 발송해 드립니다! 💎"
-            ],
-            "media_mix": [
-                {"media_id": "gdn", "attention": "3초 안에 관심을 끄는 구글 배너", "empathy": "전국 투자자의 시세차익 열망 자극", "action": "홈페이지 방문 유도"},
-                {"media_id": "kakao", "attention": "카카오톡 알림톡 최적화 메시지", "empathy": "신뢰도 높은 카카오 채널 정보", "action": "카톡 상담 버튼"},
-                {"media_id": "daangn", "attention": "동네 주민 타겟의 이웃 메시지", "empathy": "실거주 로망 실현", "action": "채팅하기 유도"},
-                {"media_id": "hogangnono", "attention": "빅데이터 기반 타겟팅 전문 리포트", "empathy": f"주변 시세 대비 확실한 차익 강조로 {main_concern} 해소", "action": "단독 팝업으로 상세 리포트 신청 유도"},
-                {"media_id": "meta", "attention": "비주얼 임팩트가 강한 숏폼 릴스", "empathy": "3040 신혼부부 및 실수요자 폭넓은 도달", "action": f"화려한 커뮤니티 시설 노출로 {main_concern} 돌파 및 양식 제출"},
-                {"media_id": "lms", "attention": "다이렉트 도달하는 긴급 마감 정보", "empathy": "지역 내 투자자 및 50대 이상 고관여군 자극", "action": "파격적 혜택 부각시킨 장문 메시지로 콜 유도"}
-            ]
-        }
-        
-        # 결과를 히스토리에 저장 (Fallback 케이스)
+        final_result = _fallback_analysis(inputs)
+
+        # 결과를 히스토리에 저장 (Fallback 케이스 - 캐시하지 않음)
         try:
-            with Session(engine) as session:
-                new_history = AnalysisHistory(
-                    user_email=req.user_email,
-                    field_name=field_name,
-                    address=address,
-                    score=85,
-                    response_json=json.dumps(final_result)
-                )
-                session.add(new_history)
-                session.commit()
-                logger.info(f"Fallback analysis saved to history for {field_name}")
+            await _save_analysis_history(req.user_email, field_name, address, 85, final_result)
+            logger.info(f"Fallback analysis saved to history for {field_name}")
         except Exception as he:
             logger.error(f"Failed to save fallback analysis to history: {he}")
-            
-        return final_result
 
-@app.get("/import-csv")
-async def import_csv_data():
-    """CSV 파일에서 데이터를 import"""
-    import csv
-    
-    csv_file = os.path.join(BASE_DIR, "sites_data.csv")
-    if not os.path.exists(csv_file):
+        return {**final_result, "from_cache": False}
+
+async def _stream_ai_sections(prompt: str):
+    """후보 모델을 순서대로 스트리밍 호출하며 완성된 최상위 JSON 멤버를 (키, 값)으로 전달
+
+    첫 섹션이 나오기 전에 실패하면 다음 후보로 넘어가고, 섹션을 보낸 뒤 끊기면 거기서 멈춥니다.
+    """
+    for model_name in gemini.ordered_candidates(ANALYZE_MODEL_CANDIDATES):
+        logger.info(f"Streaming model attempt: {model_name}")
+        parser = IncrementalJSONObject()
+        text_parts = []
+        emitted = 0
+        started = time.monotonic()
+        try:
+            async with aclosing(gemini.stream(model_name, prompt, generation_config=ANALYZE_GEN_CONFIG)) as chunks:
+                async for chunk in chunks:
+                    text_parts.append(chunk)
+                    for key, value in parser.feed(chunk):
+                        emitted += 1
+                        yield key, value
+            if not emitted:
+                # 멤버 단위로 읽지 못한 응답은 전체 텍스트로 한 번 더 파싱
+                ai_data = extract_json("".join(text_parts))
+                if isinstance(ai_data, dict):
+                    for key, value in ai_data.items():
+                        emitted += 1
+                        yield key, value
+        except Exception as e:
+            logger.error(f"Model {model_name} stream failed: {str(e)[:100]}")
+        gemini.record_attempt(model_name, emitted > 0, time.monotonic() - started)
+        if emitted:
+            return
+
+def _ndjson(section: str, data: Any) -> str:
+    return json.dumps({"section": section, "data": data}, ensure_ascii=False) + "\n"
+
+@app.post("/analyze/stream")
+async def analyze_site_stream(request: Optional[AnalyzeRequest] = None):
+    """/analyze 의 스트리밍 버전 (NDJSON, 한 줄에 {"section": ..., "data": ...})
+
+    - "local": 점수 / 가격 비교 / 레이더 등 AI 없이 계산되는 섹션 (즉시 전송)
+    - AI 섹션 키(market_diagnosis, media_mix ...): 모델 응답에서 해당 섹션이 완성되는 대로 보정 후 전송
+    - "done": 최종 리포트 전체 (/analyze 응답과 동일한 형태). AI 가 실패하면 로컬 엔진 리포트이므로
+      클라이언트는 done 의 값을 최종 결과로 사용해야 합니다.
+    """
+    logger.info(f">>> Analyze stream request received: {request.field_name if request else 'No request body'}")
+    req = request if request else AnalyzeRequest()
+    inputs = _analysis_inputs(req)
+    field_name, address = inputs["field_name"], inputs["address"]
+    cache_key = analyze_cache_key(req)
+
+    async def event_stream():
+        try:
+            cached = await _lookup_cached_analysis(cache_key)
+            if cached is not None:
+                logger.info(f"Analyze cache hit for {req.field_name}")
+                await _record_cache_hit_history(req, cache_key, cached)
+        except Exception as ce:
+            logger.error(f"Analyze cache lookup failed: {ce}")
+            cached = None
+        if cached is not None:
+            yield _ndjson("local", {key: cached.get(key) for key in LOCAL_SECTION_KEYS})
+            for key in AI_SECTION_KEYS:
+                yield _ndjson(key, cached.get(key))
+            yield _ndjson("done", {**cached, "from_cache": True})
+            return
+
+        local = _local_analysis_sections(inputs)
+        yield _ndjson("local", local)
+
+        search_context = await _live_search_context(field_name)
+        prompt = await asyncio.to_thread(analysis_prompt.build, inputs, search_context)
+
+        sections = {}
+        async with aclosing(_stream_ai_sections(prompt)) as ai_sections:
+            async for key, value in ai_sections:
+                if key in AI_SECTION_KEYS and key not in sections:
+                    sections[key] = normalize_ai_section(key, value, inputs)
+                    yield _ndjson(key, sections[key])
+
+        request_hash = None
+        if sections:
+            complete = len(sections) == len(AI_SECTION_KEYS)
+            # 응답에 빠진 섹션은 기본값으로 채움
+            for key in AI_SECTION_KEYS:
+                if key not in sections:
+                    sections[key] = normalize_ai_section(key, None, inputs)
+                    yield _ndjson(key, sections[key])
+            final_result = _assemble_analysis(local, sections)
+            if complete:
+                # 중간에 끊긴 응답은 캐시하지 않음
+                analyze_cache.set(cache_key, final_result)
+                request_hash = cache_key
+        else:
+            logger.warning("AI stream failed. Triggering Smart Local Engine.")
+            final_result = _fallback_analysis(inputs)
+
+        try:
+            await _save_analysis_history(req.user_email, field_name, address, final_result["score"], final_result, request_hash)
+            logger.info(f"Analysis saved to history for {field_name}")
+        except Exception as he:
+            logger.error(f"Failed to save analysis to history: {he}")
+
+        yield _ndjson("done", {**final_result, "from_cache": False})
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+def _import_csv_sync(csv_file: str, force: bool = False, full: bool = False) -> dict:
+    """CSV 반영 + 검색 색인 갱신 (스레드에서 실행)
+
+    기본은 바뀐 행만 반영하는 증분 모드, full=True 이면 site_staging 으로 재구축 후 교체.
+    """
+    keep_ids = [s["id"] for s in MOCK_SITES]
+    touched: List[str] = []
+    if full:
+        result = rebuild_sites_csv(engine, Site, csv_file, keep_ids=keep_ids, after_swap=rebuild_site_fts_after_swap,
+                                   before_swap=prepare_site_fts_for_swap)
+        changed = True
+    else:
+        result = import_sites_csv(engine, Site, csv_file, delete_missing=force, keep_ids=keep_ids,
+                                  after_commit=touched.extend)
+        changed = bool(touched)
+    # 검색 색인 반영 (FTS 는 트리거로 자동 반영)
+    if SITE_SEARCH_BACKEND == "index":
+        if site_index.ready and not full and len(touched) <= SITE_INDEX_INCREMENTAL_MAX:
+            # 바뀐 현장만 다시 색인 (n-gram 전체 재빌드 없이)
+            if touched:
+                site_index.refresh_ids(read_engine, Site, touched)
+        elif changed or not site_index.ready:
+            site_index.rebuild(read_engine, Site)
+    return result
+
+async def _run_csv_import(force: bool = False, full: bool = False) -> dict:
+    """force=True 이면 CSV 에 없는 현장도 삭제 (/force-csv-reload), full=True 이면 테이블 교체 방식"""
+    if not os.path.exists(SITES_CSV_PATH):
         return {"status": "error", "message": "CSV 파일을 찾을 수 없습니다."}
     
-    imported = 0
-    updated = 0
-    
     try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            
-            with Session(engine) as session:
-                for row in reader:
-                    site_id = row['id']
-                    existing = session.get(Site, site_id)
-                    
-                    if existing:
-                        existing.name = row['name']
-                        existing.address = row['address']
-                        existing.brand = row['brand'] if row['brand'] else None
-                        existing.category = row['category']
-                        existing.price = float(row['price'])
-                        existing.target_price = float(row['target_price'])
-                        existing.supply = int(row['supply'])
-                        existing.down_payment = row.get('down_payment', '10%')
-                        existing.interest_benefit = row.get('interest_benefit', '중도금 무이자')
-                        existing.status = row['status'] if row['status'] else None
-                        updated += 1
-                    else:
-                        session.add(Site(
-                            id=site_id,
-                            name=row['name'],
-                            address=row['address'],
-                            brand=row['brand'] if row['brand'] else None,
-                            category=row['category'],
-                            price=float(row['price']),
-                            target_price=float(row['target_price']),
-                            supply=int(row['supply']),
-                            down_payment=row.get('down_payment', '10%'),
-                            interest_benefit=row.get('interest_benefit', '중도금 무이자'),
-                            status=row['status'] if row['status'] else None
-                        ))
-                        imported += 1
-                session.commit()
-        return {"status": "success", "imported": imported, "updated": updated}
+        result = await asyncio.to_thread(_import_csv_sync, SITES_CSV_PATH, force, full)
+        # 바뀐 행이 있으면 catalog.version 이 갱신되었으므로 다음 요청에서 다시 읽음
+        catalog_version.invalidate()
+        return {"status": "success", **result}
     except Exception as e:
         logger.error(f"CSV import error: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.get("/import-csv")
+async def import_csv_data():
+    """CSV 파일에서 데이터를 import (바뀐 행만 일괄 upsert, 이벤트 루프 밖에서 실행)"""
+    return await _run_csv_import()
+
 class LeadSubmitRequest(BaseModel):
     name: str
     phone: str
@@ -893,55 +1330,119 @@ class LeadSubmitRequest(BaseModel):
 async def submit_lead(req: LeadSubmitRequest):
     """모수 신청(리드) 제출 API"""
     try:
-        with Session(engine) as session:
-            new_lead = Lead(
-                name=req.name,
-                phone=req.phone,
-                rank=req.rank,
-                site=req.site,
-                source=req.source
-            )
+        new_lead = Lead(
+            name=req.name,
+            phone=req.phone,
+            rank=req.rank,
+            site=req.site,
+            source=req.source
+        )
+        payload = {
+            "timestamp": new_lead.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "name": req.name,
+            "phone": req.phone,
+            "rank": req.rank,
+            "site": req.site,
+            "source": req.source
+        }
+
+        def save(session):
             session.add(new_lead)
-            session.commit()
-            logger.info(f"New lead submitted: {req.name} ({req.site})")
-            
-            # 구글 시트 연동 (웹훅 URL이 설정된 경우)
+            session.flush()
+            # 구글 시트 연동 (웹훅 URL이 설정된 경우): 같은 트랜잭션에 outbox 행을 남기고 전송은 디스패처가 담당
             if GOOGLE_SHEET_WEBHOOK_URL:
-                try:
-                    # 구글 매크로는 리디렉션을 사용하므로 follow_redirects=True가 필수입니다.
-                    async with httpx.AsyncClient(follow_redirects=True) as client:
-                        payload = {
-                            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "name": req.name,
-                            "phone": req.phone,
-                            "rank": req.rank,
-                            "site": req.site,
-                            "source": req.source
-                        }
-                        # 데이터가 확실히 전송될 때까지 기다립니다.
-                        response = await client.post(GOOGLE_SHEET_WEBHOOK_URL, json=payload, timeout=8.0)
-                        logger.info(f"Google Sheet webhook triggered. Status: {response.status_code}")
-                except Exception as ex:
-                    logger.error(f"Google Sheet sync error: {ex}")
+                lead_outbox.enqueue(session, payload, lead_id=new_lead.id)
+
+        await db_write(save)
+        lead_outbox.wake()
+        logger.info(f"New lead submitted: {req.name} ({req.site})")
 
         return {"status": "success", "message": "Lead submitted successfully"}
     except Exception as e:
         logger.error(f"Lead submission error: {e}")
         raise HTTPException(status_code=500, detail="리드 제출 중 서버 오류가 발생했습니다.")
-@app.get("/history", response_model=List[AnalysisHistory])
-async def get_history(email: Optional[str] = None):
-    """분석 히스토리 조회 API"""
+
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+class HistorySummary(BaseModel):
+    """히스토리 목록용 요약 (리포트 본문 response_json 은 /history/{id} 에서)"""
+    id: int
+    field_name: str
+    address: str
+    score: int
+    created_at: datetime.datetime
+
+class HistoryPage(BaseModel):
+    items: List[HistorySummary]
+    next_cursor: Optional[str] = None
+
+def _encode_history_cursor(created_at: datetime.datetime, history_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{history_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_history_cursor(cursor: str) -> tuple:
     try:
-        with Session(engine) as session:
-            statement = select(AnalysisHistory)
-            if email:
-                statement = statement.where(AnalysisHistory.user_email == email)
-            statement = statement.order_by(AnalysisHistory.created_at.desc()).limit(50)
-            results = session.exec(statement).all()
-            return results
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, history_id = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(created_at), int(history_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="잘못된 cursor 입니다.")
+
+def history_query(email: Optional[str] = None, limit: int = HISTORY_PAGE_SIZE, after: Optional[tuple] = None):
+    """최근 분석 히스토리 요약 (created_at, id) 키셋 페이지
+
+    after: 이전 페이지 마지막 항목의 (created_at, id). ix_analysishistory_user_recent / _recent 사용
+    """
+    statement = select(
+        AnalysisHistory.id, AnalysisHistory.field_name, AnalysisHistory.address,
+        AnalysisHistory.score, AnalysisHistory.created_at
+    )
+    if email:
+        statement = statement.where(AnalysisHistory.user_email == email)
+    if after:
+        statement = statement.where(tuple_(col(AnalysisHistory.created_at), col(AnalysisHistory.id)) < tuple_(*after))
+    return statement.order_by(col(AnalysisHistory.created_at).desc(), col(AnalysisHistory.id).desc()).limit(limit)
+
+@app.get("/history", response_model=HistoryPage)
+async def get_history(email: Optional[str] = None, cursor: Optional[str] = None, limit: int = HISTORY_PAGE_SIZE):
+    """분석 히스토리 목록 API (최신순, next_cursor 로 다음 페이지)"""
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    after = _decode_history_cursor(cursor) if cursor else None
+    try:
+        # 다음 페이지 유무 확인을 위해 한 건 더 조회
+        rows = await db_read(lambda session: session.exec(history_query(email, limit + 1, after)).all())
     except Exception as e:
         logger.error(f"History fetch error: {e}")
-        return []
+        return HistoryPage(items=[])
+    items = [HistorySummary(id=r.id, field_name=r.field_name, address=r.address, score=r.score, created_at=r.created_at)
+             for r in rows[:limit]]
+    next_cursor = _encode_history_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return HistoryPage(items=items, next_cursor=next_cursor)
+
+@app.get("/history/{history_id}", response_model=AnalysisHistory)
+async def get_history_entry(history_id: int, request: Request):
+    """분석 리포트 한 건 (response_json 포함). 저장된 리포트는 바뀌지 않으므로 ETag 로 재사용"""
+    entry = await db_read(lambda session: session.get(AnalysisHistory, history_id))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="리포트를 찾을 수 없습니다.")
+    data = jsonable_encoder(entry, exclude={"response_blob"})
+    data["response_json"] = report_text(entry.response_json, entry.response_blob)
+    return _json_response(request, data, HISTORY_ENTRY_MAX_AGE, private=True)
+
+@app.get("/metrics")
+async def get_metrics():
+    """커넥션 풀 / 캐시 상태 조회 (운영 모니터링용)"""
+    return {
+        "http_pool": http_pool.metrics(),
+        "lead_outbox": lead_outbox.metrics(),
+        "isale_cache": isale_cache.snapshot(),
+        "analyze_cache": analyze_cache.snapshot(),
+        "site_details_cache": site_details_cache.snapshot(),
+        "search_local_cache": search_local_cache.snapshot(),
+        "llm": gemini.metrics(),
+        "analysis_prompt": analysis_prompt.metrics(),
+    }
 
 @app.get("/")
 async def root():
@@ -0,0 +1,244 @@
+"""
+/analyze 프롬프트 빌더
+
+- 정적 섹션(역할, 분석 요청 사항, 데이터 세트 틀, 출력 JSON 구조)은 import 시 들여쓰기를 걷어내고
+  리터럴/자리 목록으로 미리 나눠 두고(PromptTemplate), 요청마다 값만 채움
+- 섹션마다 토큰 예산(PROMPT_BUDGET_<SECTION>)이 있어 넘치면 잘라냄.
+  현장명/특장점 같은 자유 입력은 값 하나당 PROMPT_FIELD_TOKENS 까지만 넣음
+- 네이버 검색 결과 HTML 은 html_to_text() 로 텍스트만 남긴 뒤 현장명·분양 관련 문장만 골라
+  search 섹션 예산 안에서 넣음 (스니펫이 없으면 섹션 생략)
+- estimate_tokens(): 토크나이저 없이 쓰는 대략치 (ASCII 약 4자, 한글 등은 약 1.5자당 1토큰)
+
+예산별 토큰 수 / 빌드 시간 비교는 python test_prompt_builder.py --bench
+"""
+
+import html
+import logging
+import os
+import re
+import string
+import textwrap
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SECTION_BUDGETS = {"role": 130, "request": 400, "dataset": 400, "search": 300, "output": 260}
+SECTION_BUDGETS = {
+    name: int(os.getenv(f"PROMPT_BUDGET_{name.upper()}", str(default)))
+    for name, default in DEFAULT_SECTION_BUDGETS.items()
+}
+PROMPT_FIELD_TOKENS = int(os.getenv("PROMPT_FIELD_TOKENS", "60"))
+SEARCH_SNIPPET_CHARS = 160
+
+# 현장명 외에 분양 분석에 쓸모 있는 문장을 고르는 단어
+SEARCH_TOPIC_TERMS = ("분양가", "모델하우스", "청약", "경쟁률", "평당", "만원", "억", "입주", "계약금", "중도금",
+                      "프리미엄", "미분양", "시세", "세대", "역세권", "학군", "잔여", "특별공급")
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    # 한글은 UTF-8 로 3바이트라 (바이트 수 - 글자 수) / 2 가 대략 비ASCII 글자 수
+    non_ascii = (len(text.encode("utf-8")) - len(text)) // 2
+    return (len(text) - non_ascii) // 4 + (non_ascii * 2) // 3 + 1
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """예산을 넘으면 줄/문장 경계에서 잘라 … 를 붙임"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) < max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    boundary = max(cut.rfind("\n"), cut.rfind(". "), cut.rfind("다. "))
+    if boundary > lo // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + "…"
+
+
+# --- HTML → 텍스트 스니펫 ---
+
+_DROP_BLOCKS = re.compile(r"<(script|style|noscript|svg|head|template)\b.*?</\1\s*>", re.S | re.I)
+_COMMENTS = re.compile(r"<!--.*?-->", re.S)
+_BLOCK_TAGS = re.compile(r"<(?:br|/?(?:p|div|li|ul|ol|tr|td|th|h[1-6]|section|article|header|footer|a|dt|dd))\b[^>]*>",
+                         re.I)
+_TAGS = re.compile(r"<[^>]*>")
+_SPACES = re.compile(r"[^\S\n]+")
+_LINES = re.compile(r"\s*\n\s*")
+
+
+def html_to_text(raw: str) -> str:
+    """스크립트/스타일을 버리고 블록 태그 단위로 줄을 나눈 평문 (정규식 몇 번으로 끝나는 가벼운 변환)"""
+    text = _COMMENTS.sub(" ", _DROP_BLOCKS.sub(" ", raw))
+    text = _TAGS.sub(" ", _BLOCK_TAGS.sub("\n", text))
+    text = _SPACES.sub(" ", html.unescape(text))
+    return _LINES.sub("\n", text).strip()
+
+
+def search_snippets(raw_html: str, field_name: str, max_tokens: int) -> List[str]:
+    """현장과 관련된 문장을 점수순으로 골라 예산 안에서 원래 순서대로 반환"""
+    if not raw_html or max_tokens <= 0:
+        return []
+    name_terms = [t for t in field_name.split() if len(t) >= 2] or [field_name]
+    scored: List[Tuple[int, int, str]] = []
+    seen = set()
+    for idx, line in enumerate(html_to_text(raw_html).split("\n")):
+        if len(line) < 12 or line in seen:
+            continue
+        seen.add(line)
+        score = 3 * sum(term in line for term in name_terms) + sum(term in line for term in SEARCH_TOPIC_TERMS)
+        if score:
+            scored.append((-score, idx, line[:SEARCH_SNIPPET_CHARS]))
+
+    picked: List[Tuple[int, str]] = []
+    used = 0
+    for _, idx, line in sorted(scored):
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            continue
+        picked.append((idx, line))
+        used += cost
+    return [line for _, line in sorted(picked)]
+
+
+# --- 템플릿 ---
+
+class PromptTemplate:
+    """str.format 문법 템플릿을 import 시 (리터럴, 자리) 목록으로 한 번만 파싱"""
+
+    def __init__(self, name: str, template: str):
+        self.name = name
+        self.budget = SECTION_BUDGETS[name]
+        self.parts: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in string.Formatter().parse(textwrap.dedent(template).strip())
+        ]
+        self.fields = {field for _, field in self.parts if field}
+        self.static_tokens = estimate_tokens("".join(literal for literal, _ in self.parts))
+        if self.static_tokens > self.budget:
+            logger.warning(f"Prompt section {name} static text ({self.static_tokens} tokens) exceeds budget {self.budget}")
+
+    def render(self, values: Dict[str, str]) -> str:
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(values[field])
+        return trim_to_tokens("".join(out), self.budget)
+
+
+ROLE = PromptTemplate("role", """
+    당신은 대한민국 부동산 분양 마케팅 상위 0.1% 전문가이자 '분양 알파고' 시스템입니다.
+    [{field_name}] 현장의 성공적인 분양을 위한 '정밀 시장 및 매체 분석 리포트'를 전문가 수준으로 JSON 작성하십시오.
+""")
+
+REQUEST = PromptTemplate("request", """
+    [분석 요청 사항]
+    - market_diagnosis: 전문 용어를 적극 활용하여 시장의 거시적 흐름과 단지의 입지적 강점을 최소 5문장 이상으로 상세히 분석하되, 사용자의 가장 큰 고민({main_concern})을 해결할 솔루션을 제안하십시오.
+    - lms_copy_samples & channel_talk_samples: 이모지를 풍부하게 사용하고, 가독성이 좋으면서도 내용이 매우 긴 '호소력 짙은' 문안을 각 매체당 3개씩 작성하십시오.
+    - media_mix: '구글 GDN', '카카오 모먼트', '당근마켓 배너', '호갱노노 채널톡', '메타 릴스', 'LMS 문자' 등 총 6개의 핵심 매체 전부에 대해, **사용자의 핵심 강조 포인트({fkp})와 고민({main_concern})을 타파할 수 있는 매체별 차별화된 광고 3요소(attention, empathy, action)**를 각각 작성하십시오. (media_id는 각각 gdn, kakao, daangn, hogangnono, meta, lms 로 고정)
+""")
+
+DATASET = PromptTemplate("dataset", """
+    [데이터 세트]
+    - 현장명: {field_name} / 위치: {address} / 상품군: {product_category}
+    - 프라이싱: 공급가 {sales_price} VS 주변 시세 {target_price}
+    - 규모/공급: {supply_volume}세대 / 금융조건: 계약금 {dp}, {ib}
+    - 핵심 특장점: {fkp}
+    - 🚨 현장의 가장 큰 마케팅 고민: {main_concern}
+""")
+
+SEARCH = PromptTemplate("search", """
+    [실시간 검색 발췌] (네이버 검색 결과 중 현장 관련 문장, 사실 확인이 필요한 참고 자료)
+    {snippets}
+""")
+
+# JSON 예시는 들여쓰기 없이 (모델 응답 형식에는 영향 없음)
+OUTPUT = PromptTemplate("output", """
+    [JSON Output Structure]
+    {{
+    "market_diagnosis": "...",
+    "target_persona": "...",
+    "target_audience": ["#1", "#2", "#3", "#4", "#5"],
+    "competitors": [
+    {{"name": "인근 단지 A", "price": {competitor_a_price}, "gap_label": "도보 5분"}},
+    {{"name": "인근 단지 B", "price": {competitor_b_price}, "gap_label": "1.2km"}}
+    ],
+    "ad_recommendation": "...",
+    "copywriting": "...",
+    "keyword_strategy": ["키원드1", "2", "3", "4", "5"],
+    "weekly_plan": ["1주", "2주", "3주", "4주"],
+    "roi_forecast": {{"expected_leads": 150, "expected_cpl": 45000, "conversion_rate": 3.5, "expected_ctr": 1.9}},
+    "lms_copy_samples": ["긴 카피 1안", "긴 카피 2안", "긴 카피 3안"],
+    "channel_talk_samples": ["채널톡 긴 카피 1안", "채널톡 긴 카피 2안", "채널톡 긴 카피 3안"],
+    "media_mix": [
+    {{"media_id": "gdn", "attention": "시선 집중 예시 카피", "empathy": "공감 메시지", "action": "행동 촉구 메시지"}}
+    ]
+    }}
+""")
+
+# 사용자가 자유롭게 입력하는 값 (값 하나당 PROMPT_FIELD_TOKENS 까지만)
+FREE_TEXT_FIELDS = ("field_name", "address", "product_category", "dp", "ib", "fkp", "main_concern")
+
+
+class AnalysisPromptBuilder:
+    def __init__(self, sections: Tuple[PromptTemplate, ...] = (ROLE, REQUEST, DATASET, SEARCH, OUTPUT)):
+        self.sections = sections
+        self.calls = 0
+        self.total_tokens = 0
+        self.last_tokens: Optional[int] = None
+        self.last_section_tokens: Dict[str, int] = {}
+        self.last_snippets = 0
+        self.last_build_ms: Optional[float] = None
+
+    def values(self, inputs: dict) -> Dict[str, str]:
+        values = {key: trim_to_tokens(str(inputs[key]), PROMPT_FIELD_TOKENS) for key in FREE_TEXT_FIELDS}
+        target_price = inputs["target_price"]
+        values.update({
+            "sales_price": str(inputs["sales_price"]),
+            "target_price": str(target_price),
+            "supply_volume": str(inputs["supply_volume"]),
+            "competitor_a_price": str(target_price or 0),
+            "competitor_b_price": str(target_price * 1.05 if target_price else 0),
+        })
+        return values
+
+    def build(self, inputs: dict, search_html: str = "") -> str:
+        started = time.perf_counter()
+        values = self.values(inputs)
+        snippets = search_snippets(search_html, inputs["field_name"], SEARCH.budget - SEARCH.static_tokens)
+        values["snippets"] = "\n".join(f"- {s}" for s in snippets)
+
+        rendered = []
+        section_tokens = {}
+        for section in self.sections:
+            if section is SEARCH and not snippets:
+                continue
+            text = section.render(values)
+            rendered.append(text)
+            section_tokens[section.name] = estimate_tokens(text)
+        prompt = "\n\n".join(rendered)
+
+        self.calls += 1
+        self.last_tokens = estimate_tokens(prompt)
+        self.total_tokens += self.last_tokens
+        self.last_section_tokens = section_tokens
+        self.last_snippets = len(snippets)
+        self.last_build_ms = round((time.perf_counter() - started) * 1000, 2)
+        return prompt
+
+    def metrics(self) -> dict:
+        return {
+            "calls": self.calls,
+            "avg_tokens": round(self.total_tokens / self.calls) if self.calls else None,
+            "last_tokens": self.last_tokens,
+            "last_section_tokens": self.last_section_tokens,
+            "last_snippets": self.last_snippets,
+            "last_build_ms": self.last_build_ms,
+            "budgets": SECTION_BUDGETS,
+        }
@@ -0,0 +1,128 @@
+"""
+AnalysisHistory 리포트 저장 코덱
+
+/analyze 리포트 JSON 은 템플릿 문구와 키 이름이 반복되는 긴 한국어 텍스트라 압축 효과가 큽니다.
+- response_blob 에 b"RZ" + 사전 버전(1 byte) + zlib 압축 데이터를 저장하고 response_json 은 비워 둠
+- 사전(preset dictionary)은 Smart Local Engine 리포트 템플릿으로 만든 report_dict_v{N}.txt
+  (한 번 배포한 버전의 파일은 절대 수정하지 않음 - 기존 행의 복원에 그대로 필요)
+- 읽을 때는 report_text() 가 두 컬럼 중 채워진 쪽을 돌려주므로 압축 전/후 행이 섞여 있어도 됨
+
+사전 재생성 / 크기·읽기 시간 비교는 benchmark_report_codec.py 참고.
+"""
+
+import functools
+import json
+import logging
+import os
+import time
+import zlib
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+REPORT_CODEC = os.getenv("REPORT_CODEC", "zlib")  # zlib | none (평문 저장)
+REPORT_DICT_VERSION = 1
+REPORT_DICT_SIZE = 32 * 1024  # zlib 윈도 크기보다 긴 사전은 앞부분이 쓰이지 않음
+_MAGIC = b"RZ"
+
+
+def dictionary_path(version: int) -> str:
+    return os.path.join(BASE_DIR, f"report_dict_v{version}.txt")
+
+
+@functools.lru_cache(maxsize=None)
+def load_dictionary(version: int) -> Optional[bytes]:
+    """버전 0 은 사전 없이 압축한 데이터"""
+    if version == 0:
+        return None
+    with open(dictionary_path(version), "rb") as f:
+        return f.read()
+
+
+def _available_version() -> int:
+    try:
+        load_dictionary(REPORT_DICT_VERSION)
+        return REPORT_DICT_VERSION
+    except OSError:
+        logger.warning(f"Report dictionary v{REPORT_DICT_VERSION} not found; compressing without dictionary")
+        return 0
+
+
+def encode_report(text: str, version: Optional[int] = None) -> bytes:
+    version = _available_version() if version is None else version
+    zdict = load_dictionary(version)
+    compressor = zlib.compressobj(9, zdict=zdict) if zdict else zlib.compressobj(9)
+    return _MAGIC + bytes([version]) + compressor.compress(text.encode("utf-8")) + compressor.flush()
+
+
+def decode_report(blob: bytes) -> str:
+    if blob[:2] != _MAGIC:
+        raise ValueError("Unknown report blob format")
+    zdict = load_dictionary(blob[2])
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return (decompressor.decompress(blob[3:]) + decompressor.flush()).decode("utf-8")
+
+
+def report_text(response_json: Optional[str], response_blob: Optional[bytes]) -> str:
+    """압축된 행이면 복원, 아니면 평문 그대로"""
+    if response_blob:
+        return decode_report(response_blob)
+    return response_json or ""
+
+
+def build_dictionary(samples: Iterable[str], size: int = REPORT_DICT_SIZE) -> bytes:
+    """샘플 리포트들로 사전 생성 (zlib 은 사전 끝부분일수록 짧은 거리로 참조하므로 자주 나오는 샘플을 뒤에)"""
+    data = b"".join(s.encode("utf-8") for s in samples)
+    tail = data[-size:]
+    # UTF-8 문자 중간에서 잘렸으면 다음 문자 경계부터
+    start = 0
+    while start < len(tail) and (tail[start] & 0xC0) == 0x80:
+        start += 1
+    return tail[start:]
+
+
+def _unescaped(text: str) -> str:
+    """예전 행은 json.dumps 기본값(\\uXXXX 이스케이프)으로 저장되어 있어 한글 그대로 다시 직렬화"""
+    try:
+        return json.dumps(json.loads(text), ensure_ascii=False)
+    except ValueError:
+        return text
+
+
+def compress_history_rows(engine: Engine, history_model, batch_size: int = 500) -> dict:
+    """아직 평문인 기존 행을 압축 컬럼으로 옮김 (배치마다 커밋, 여러 번 실행해도 안전)
+
+    줄어든 파일 크기는 VACUUM 후에 반영됩니다.
+    """
+    table = getattr(history_model, "__table__", history_model)
+    rows = plain_bytes = packed_bytes = 0
+    started = time.perf_counter()
+    while True:
+        with engine.begin() as conn:
+            batch = conn.execute(
+                select(table.c.id, table.c.response_json)
+                .where(table.c.response_blob.is_(None), table.c.response_json != "")
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            for row_id, text in batch:
+                blob = encode_report(_unescaped(text))
+                conn.execute(update(table).where(table.c.id == row_id).values(response_json="", response_blob=blob))
+                plain_bytes += len(text.encode("utf-8"))
+                packed_bytes += len(blob)
+            rows += len(batch)
+    result = {
+        "rows": rows,
+        "plain_bytes": plain_bytes,
+        "packed_bytes": packed_bytes,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if rows:
+        logger.info(f"Compressed analysis history rows: {result}")
+    return result
@@ -0,0 +1,204 @@
+"""
+현장(Site) 자동완성용 인메모리 n-gram 역색인
+
+- name / address / brand / category / status 컬럼을 문자 단위 1/2/3-gram 으로 색인
+- 한글은 형태소 분리 없이도 부분 문자열(예: '힐스테', '스테이트') 매칭이 가능
+- 서버 기동(lifespan) 시 전체 빌드, 증분 CSV import 는 바뀐 id 만 반영(refresh_ids), 전체 교체 시 재빌드,
+  bulk_sync 스크립트처럼 다른 프로세스가 DB를 갱신한 경우는 주기적인 시그니처 확인으로 감지
+
+조회 비용 비교(색인 vs 선형 부분 문자열 검사)는 python test_search_index.py --bench
+"""
+
+import datetime
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ("name", "address", "brand", "category", "status")
+# SQLite 바인드 변수 한도 안에서 IN 조회
+_ID_CHUNK = 500
+
+
+class SiteDoc(NamedTuple):
+    id: str
+    name: str
+    address: str
+    brand: Optional[str]
+    category: Optional[str]
+    status: Optional[str]
+    last_updated: object
+
+
+def _grams(text: str) -> Set[str]:
+    """문자열의 1/2/3-gram 집합"""
+    grams = set(text)
+    for n in (2, 3):
+        for i in range(len(text) - n + 1):
+            grams.add(text[i:i + n])
+    return grams
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    return 0.0
+
+
+class SiteSearchIndex:
+    def __init__(self, check_interval: float = 30.0):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._docs: Dict[str, SiteDoc] = {}
+        self._fields: Dict[str, tuple] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._signature = None
+        self._last_check = 0.0
+        self._refreshing = False
+        self.ready = False
+
+    # --- 색인 구성 ---
+    def _add(self, doc: SiteDoc):
+        fields = tuple((getattr(doc, f) or "").lower() for f in SEARCH_FIELDS)
+        self._docs[doc.id] = doc
+        self._fields[doc.id] = fields
+        for field in fields:
+            for g in _grams(field):
+                self._postings.setdefault(g, set()).add(doc.id)
+
+    def _remove(self, site_id: str):
+        fields = self._fields.pop(site_id, None)
+        self._docs.pop(site_id, None)
+        if fields is None:
+            return
+        for field in fields:
+            for g in _grams(field):
+                ids = self._postings.get(g)
+                if ids is not None:
+                    ids.discard(site_id)
+                    if not ids:
+                        del self._postings[g]
+
+    def refresh_ids(self, engine, site_model, site_ids: Iterable[str]):
+        """바뀐 현장만 DB 에서 다시 읽어 색인에 반영 (DB 에 없는 id 는 색인에서 제거)
+
+        증분 CSV import 처럼 몇 행만 바뀐 경우 전체 재빌드 대신 사용.
+        시그니처도 함께 갱신하므로 refresh_if_stale 이 같은 변경으로 다시 재빌드하지 않음
+        """
+        site_ids = list(dict.fromkeys(site_ids))
+        cols = [getattr(site_model, f) for f in SiteDoc._fields]
+        docs = []
+        with Session(engine) as session:
+            for i in range(0, len(site_ids), _ID_CHUNK):
+                chunk = site_ids[i:i + _ID_CHUNK]
+                docs.extend(SiteDoc(*row) for row in session.exec(select(*cols).where(site_model.id.in_(chunk))))
+            signature = self._read_signature(session, site_model)
+
+        found = {doc.id for doc in docs}
+        with self._lock:
+            for site_id in site_ids:
+                self._remove(site_id)
+            for doc in docs:
+                self._add(doc)
+            self._signature = signature
+            self._last_check = time.monotonic()
+        logger.info(f"Site search index refreshed: {len(found)} upserted, {len(site_ids) - len(found)} removed")
+
+    def rebuild(self, engine, site_model):
+        """DB의 site 테이블 전체로 색인을 새로 만들고 교체"""
+        started = time.perf_counter()
+        fresh = SiteSearchIndex(self.check_interval)
+        with Session(engine) as session:
+            cols = [getattr(site_model, f) for f in SiteDoc._fields]
+            for row in session.exec(select(*cols)):
+                fresh._add(SiteDoc(*row))
+            signature = self._read_signature(session, site_model)
+
+        with self._lock:
+            self._docs, self._fields, self._postings = fresh._docs, fresh._fields, fresh._postings
+            self._signature = signature
+            self._last_check = time.monotonic()
+            self.ready = True
+        logger.info(f"Site search index built: {len(self._docs)} sites, {len(self._postings)} grams "
+                    f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    # --- 외부 프로세스(bulk_sync 등) 갱신 감지 ---
+    @staticmethod
+    def _read_signature(session, site_model):
+        return tuple(session.exec(
+            select(func.count(), func.max(site_model.last_updated)).select_from(site_model)
+        ).one())
+
+    def refresh_if_stale(self, engine, site_model):
+        """check_interval 마다 DB 시그니처(행 수, 최종 갱신 시각)를 비교해 바뀌었으면 백그라운드 재빌드"""
+        now = time.monotonic()
+        if self._refreshing or now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            with Session(engine) as session:
+                signature = self._read_signature(session, site_model)
+        except Exception as e:
+            logger.error(f"Search index signature check failed: {e}")
+            return
+        if signature == self._signature:
+            return
+
+        def _run():
+            try:
+                self.rebuild(engine, site_model)
+            except Exception as e:
+                logger.error(f"Search index rebuild failed: {e}")
+            finally:
+                self._refreshing = False
+
+        self._refreshing = True
+        threading.Thread(target=_run, name="site-index-rebuild", daemon=True).start()
+
+    # --- 검색 ---
+    def _match_part(self, part: str) -> Set[str]:
+        if len(part) <= 3:
+            return self._postings.get(part, set())
+
+        # 4글자 이상은 trigram 교집합으로 후보를 좁힌 뒤 실제 부분 문자열 포함 여부 확인
+        trigram_sets = []
+        for i in range(len(part) - 2):
+            ids = self._postings.get(part[i:i + 3])
+            if not ids:
+                return set()
+            trigram_sets.append(ids)
+        trigram_sets.sort(key=len)
+        candidates = set(trigram_sets[0])
+        for ids in trigram_sets[1:]:
+            candidates &= ids
+            if not candidates:
+                return candidates
+        return {sid for sid in candidates if any(part in f for f in self._fields[sid])}
+
+    def search(self, q_parts: List[str], limit: int = 100, rank: Optional[Callable] = None) -> List[SiteDoc]:
+        """모든 검색어 조각을 포함하는(AND) 현장을 최대 limit 개 반환
+
+        rank 가 주어지면 rank(doc) 오름차순 → 최근 갱신순, 아니면 최근 갱신순으로 상위 limit 개를 고름
+        """
+        with self._lock:
+            matched = None
+            for part in sorted({p.lower() for p in q_parts if p}, key=len, reverse=True):
+                ids = self._match_part(part)
+                matched = ids if matched is None else matched & ids
+                if not matched:
+                    return []
+            if matched is None:
+                return []
+            docs = [self._docs[sid] for sid in matched]
+        if rank is None:
+            return heapq.nlargest(limit, docs, key=lambda d: d.last_updated or datetime.datetime.min)
+        return heapq.nsmallest(limit, docs, key=lambda d: (rank(d), -_timestamp(d.last_updated)))
+
+    def __len__(self):
+        return len(self._docs)
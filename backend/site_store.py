@@ -0,0 +1,552 @@
+"""
+site 테이블 일괄 쓰기
+
+크롤링/CSV 결과를 행마다 session.get → add/수정 하는 대신,
+한 묶음을 INSERT ... ON CONFLICT(id) DO UPDATE 하나의 executemany 로 한 트랜잭션에 반영합니다.
+bulk_sync.py 처럼 별도 Site 모델을 쓰는 스크립트도 있으므로 모델(또는 Table)을 인자로 받습니다.
+
+import_sites_csv(): sites_data.csv 를 청크 단위로 읽어 타입을 변환/검증하고, 행별 content_hash 를
+DB 값과 비교해 바뀐 행만 upsert (필요하면 CSV 에 없는 행 삭제). 전체가 하나의 트랜잭션이라
+읽는 쪽은 적용 전 또는 적용 후의 카탈로그만 봅니다. main.import_csv_data, import_csv.py 공용.
+파일 mtime/크기/checksum 은 catalog_meta 에 기록해 csv_unchanged() 로 재import 여부를 판단합니다.
+site 내용을 바꾸는 트랜잭션은 같은 트랜잭션에서 catalog.version 도 새로 기록하므로
+(bump_catalog_version) 응답 캐시/ETag 는 이 값만 비교하면 됩니다 (CatalogVersion).
+
+SiteStaging: 전체 재구축용. site 와 같은 스키마의 site_staging 을 채운 뒤 한 트랜잭션에서
+DROP + RENAME 으로 교체하므로, 재구축하는 동안에도 검색/상세 조회는 기존 site 를 그대로 읽습니다.
+기존 행을 복사해 시작한 경우(copy_existing) 그 사이 site 에 쓰인 행은 트리거로 기록했다가 교체 때 다시 반영합니다.
+보조 인덱스는 교체 전에 staging 에 미리 만들어 두므로 쓰기 잠금을 잡는 교체 트랜잭션은 짧게 끝납니다.
+"""
+
+import csv
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import MetaData, Table, bindparam, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+
+from db import run_read
+
+logger = logging.getLogger(__name__)
+
+# SQLite 바인드 변수 한도 안에서 IN 조회
+_ID_CHUNK = 500
+# sqlite_master 의 CREATE INDEX 문에서 인덱스 이름
+_INDEX_NAME_RE = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?("[^"]+"|\S+)', re.IGNORECASE)
+
+CSV_CHUNK_SIZE = int(os.getenv("CSV_IMPORT_CHUNK", "1000"))
+# sites_data.csv 의 컬럼 (bulk_sync_to_csv.py 가 내보내는 순서)
+CSV_SITE_COLUMNS = ["id", "name", "address", "brand", "category", "price", "target_price", "supply",
+                    "down_payment", "interest_benefit", "status"]
+
+CATALOG_META_DDL = """
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TIMESTAMP
+)
+"""
+_META_UPSERT_SQL = (
+    "INSERT INTO catalog_meta (key, value, updated_at) VALUES (:k, :v, :t) "
+    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at"
+)
+CATALOG_VERSION_KEY = "catalog.version"
+
+
+def _table(site_model) -> Table:
+    return getattr(site_model, "__table__", site_model)
+
+
+def existing_site_ids(conn: Connection, site_model, ids: Sequence[str]) -> set:
+    table = _table(site_model)
+    found = set()
+    for i in range(0, len(ids), _ID_CHUNK):
+        chunk = ids[i:i + _ID_CHUNK]
+        found.update(conn.execute(select(table.c.id).where(table.c.id.in_(chunk))).scalars())
+    return found
+
+
+def upsert_sites(bind: Union[Engine, Connection], site_model, rows: Iterable[dict],
+                 update_columns: Optional[Sequence[str]] = None) -> Tuple[int, int]:
+    """rows 를 id 기준으로 일괄 upsert 하고 (신규, 갱신) 건수를 반환
+
+    update_columns: 이미 있는 행에서 덮어쓸 컬럼. None 이면 id 를 제외한 전달된 전체 컬럼,
+    빈 목록이면 기존 행은 건드리지 않음 (DO NOTHING).
+    Engine 을 넘기면 자체 트랜잭션으로, Connection 을 넘기면 호출자의 트랜잭션 안에서 실행합니다.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return upsert_sites(conn, site_model, rows, update_columns)
+
+    # 같은 묶음 안에서 겹치는 id 는 마지막 값만 사용 (키워드가 겹치면 같은 단지가 반복해서 옴)
+    by_id: Dict[str, dict] = {}
+    for row in rows:
+        by_id[row["id"]] = row
+    if not by_id:
+        return 0, 0
+
+    table = _table(site_model)
+    columns: List[str] = list(next(iter(by_id.values())).keys())
+    params = [{c: row.get(c) for c in columns} for row in by_id.values()]
+
+    existing = existing_site_ids(bind, table, list(by_id))
+
+    stmt = sqlite_insert(table)
+    if update_columns is None:
+        update_columns = [c for c in columns if c != "id"]
+    if update_columns:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.id])
+    bind.execute(stmt, params)
+
+    inserted = len(by_id) - len(existing)
+    updated = len(existing) if update_columns else 0
+    return inserted, updated
+
+
+def _csv_site_row(row: dict, now: datetime.datetime) -> dict:
+    """CSV 한 행을 site 컬럼 타입으로 변환 (필수 값이 없거나 숫자가 아니면 ValueError)"""
+    site_id = (row.get("id") or "").strip()
+    if not site_id:
+        raise ValueError("missing id")
+    return {
+        "id": site_id,
+        "name": row["name"],
+        "address": row["address"],
+        "brand": row["brand"] if row.get("brand") else None,
+        "category": row["category"],
+        "price": float(row["price"]),
+        "target_price": float(row["target_price"]),
+        "supply": int(row["supply"]),
+        "down_payment": row.get("down_payment", "10%"),
+        "interest_benefit": row.get("interest_benefit", "중도금 무이자"),
+        "status": row["status"] if row.get("status") else None,
+        "last_updated": now
+    }
+
+
+def iter_csv_chunks(path: str, chunk_size: int = CSV_CHUNK_SIZE, stats: Optional[dict] = None) -> Iterator[List[dict]]:
+    """CSV 를 chunk_size 행씩 변환해 전달 (파일 전체를 메모리에 올리지 않음)
+
+    변환에 실패한 행은 건너뛰고 stats["skipped"] 에 집계합니다.
+    id 는 읽히는 행은 stats["skipped_ids"] 에 모아 두므로, 호출하는 쪽은 "CSV 에 없는 행" 삭제에서 이 id 를 제외합니다.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("rows", 0)
+    stats.setdefault("skipped", 0)
+    stats.setdefault("skipped_ids", set())
+    now = datetime.datetime.now()
+    chunk: List[dict] = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            stats["rows"] += 1
+            try:
+                chunk.append(_csv_site_row(row, now))
+            except (KeyError, TypeError, ValueError) as e:
+                stats["skipped"] += 1
+                if (row.get("id") or "").strip():
+                    stats["skipped_ids"].add(row["id"].strip())
+                if stats["skipped"] <= 5:
+                    logger.warning(f"CSV line {line_no} skipped: {e!r}")
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def ensure_catalog_meta(conn: Connection):
+    conn.execute(text(CATALOG_META_DDL))
+
+
+def read_meta(conn: Connection, prefix: str = "") -> Dict[str, str]:
+    ensure_catalog_meta(conn)
+    rows = conn.execute(text("SELECT key, value FROM catalog_meta WHERE key LIKE :p"), {"p": f"{prefix}%"}).all()
+    return {k: v for k, v in rows}
+
+
+def write_meta(conn: Connection, values: Dict[str, str]):
+    ensure_catalog_meta(conn)
+    now = datetime.datetime.now()
+    conn.execute(text(_META_UPSERT_SQL), [{"k": k, "v": str(v), "t": now} for k, v in values.items()])
+
+
+def _new_catalog_version() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def bump_catalog_version(conn: Connection) -> str:
+    """site 내용이 바뀐 트랜잭션 안에서 호출 (커밋과 함께 새 버전이 보임)"""
+    version = _new_catalog_version()
+    write_meta(conn, {CATALOG_VERSION_KEY: version})
+    return version
+
+
+def read_catalog_version(conn: Connection) -> str:
+    return read_meta(conn, CATALOG_VERSION_KEY).get(CATALOG_VERSION_KEY, "0")
+
+
+class CatalogVersion:
+    """catalog.version 을 check_interval 초 동안 메모리에 두고 재사용
+
+    같은 프로세스의 import 는 set() 으로 바로 반영하고, 다른 프로세스(bulk_sync.py 등)의 변경은
+    check_interval 안에 반영됩니다.
+    """
+
+    def __init__(self, engine: Engine, check_interval: float = 5.0):
+        self.engine = engine
+        self.check_interval = check_interval
+        self._value: Optional[str] = None
+        self._checked = 0.0
+
+    def _read(self) -> str:
+        with self.engine.connect() as conn:
+            return read_catalog_version(conn)
+
+    async def current(self) -> str:
+        if self._value is None or time.monotonic() - self._checked >= self.check_interval:
+            self.set(await run_read(self._read))
+        return self._value
+
+    def set(self, version: str):
+        self._value = version
+        self._checked = time.monotonic()
+
+    def invalidate(self):
+        self._value = None
+
+
+def site_row_hash(row: dict) -> str:
+    """CSV 에서 온 내용 컬럼만으로 만든 행 해시 (last_updated 제외)"""
+    payload = json.dumps([row.get(c) for c in CSV_SITE_COLUMNS], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def csv_file_signature(path: str, with_checksum: bool = True) -> Dict[str, str]:
+    st = os.stat(path)
+    sig = {"sites_csv.mtime_ns": str(st.st_mtime_ns), "sites_csv.size": str(st.st_size)}
+    if with_checksum:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        sig["sites_csv.sha256"] = digest.hexdigest()
+    return sig
+
+
+def csv_unchanged(engine: Engine, path: str) -> bool:
+    """마지막으로 반영한 CSV 와 같은 파일인지 (mtime/크기가 같으면 바로, 다르면 checksum 으로 확인)"""
+    with engine.connect() as conn:
+        meta = read_meta(conn, "sites_csv.")
+    if not meta.get("sites_csv.sha256"):
+        return False
+    quick = csv_file_signature(path, with_checksum=False)
+    if all(meta.get(k) == v for k, v in quick.items()):
+        return True
+    return csv_file_signature(path)["sites_csv.sha256"] == meta["sites_csv.sha256"]
+
+
+def import_sites_csv(engine: Engine, site_model, path: str, chunk_size: int = CSV_CHUNK_SIZE,
+                     update_columns: Optional[Sequence[str]] = None, delete_missing: bool = False,
+                     keep_ids: Iterable[str] = (), after_commit: Optional[Callable[[List[str]], None]] = None) -> dict:
+    """CSV 와 DB 를 비교해 바뀐 행만 반영 (동기 함수 - async 핸들러에서는 asyncio.to_thread 로 호출)
+
+    - CSV 에만 있는 행: insert / content_hash 가 달라진 행: update / 같은 행: 건드리지 않음
+    - delete_missing: CSV 에 없는 행 삭제 (keep_ids 와 변환에 실패해 건너뛴 행의 id 는 제외)
+    - after_commit: 커밋 후 바뀌거나 삭제된 id 목록으로 호출 (검색 색인 증분 반영용)
+    update_columns: 기존 행에서 덮어쓸 컬럼 (기본: id / last_updated 를 제외한 CSV 컬럼).
+    모델에 없는 CSV 컬럼은 무시하고, content_hash 컬럼이 없는 모델이면 모든 행을 upsert 합니다.
+    이때 DB 에 남은 content_hash 는 비우고 파일 시그니처도 기록하지 않습니다
+    (다음 증분 import / csv_unchanged 가 오래된 해시를 믿고 변경을 건너뛰지 않도록).
+    """
+    table = _table(site_model)
+    hashed = "content_hash" in table.c
+    columns = [c for c in CSV_SITE_COLUMNS + ["last_updated"] if c in table.c]
+    if update_columns is None:
+        update_columns = [c for c in CSV_SITE_COLUMNS if c != "id" and c in table.c]
+    if hashed:
+        columns.append("content_hash")
+        update_columns = list(update_columns) + ["content_hash"]
+    keep_ids = set(keep_ids)
+
+    stats = {"rows": 0, "skipped": 0}
+    imported = updated = unchanged = deleted = 0
+    touched: List[str] = []
+    started = time.perf_counter()
+    signature = csv_file_signature(path)
+    with engine.begin() as conn:
+        if hashed:
+            current = dict(conn.execute(select(table.c.id, table.c.content_hash)).all())
+        else:
+            current = dict.fromkeys(conn.execute(select(table.c.id)).scalars())
+            stale_hash = any(row[1] == "content_hash" for row in conn.execute(text(f"PRAGMA table_info({table.name})")))
+        seen = set()
+        for chunk in iter_csv_chunks(path, chunk_size, stats):
+            changed = []
+            for r in chunk:
+                seen.add(r["id"])
+                if hashed:
+                    r["content_hash"] = site_row_hash(r)
+                    if r["id"] in current and current[r["id"]] == r["content_hash"]:
+                        unchanged += 1
+                        continue
+                    current[r["id"]] = r["content_hash"]
+                changed.append({c: r[c] for c in columns})
+            if changed:
+                touched.extend(r["id"] for r in changed)
+                inserted, changed_count = upsert_sites(conn, table, changed, update_columns)
+                imported += inserted
+                updated += changed_count
+                if not hashed and stale_hash:
+                    conn.execute(text(f"UPDATE {table.name} SET content_hash = NULL WHERE id = :sid"),
+                                 [{"sid": r["id"]} for r in changed])
+
+        if delete_missing:
+            # 잘못된 값 때문에 건너뛴 행은 CSV 에서 빠진 것이 아니므로 기존 행을 유지
+            keep_ids |= stats["skipped_ids"]
+            stale = [site_id for site_id in current if site_id not in seen and site_id not in keep_ids]
+            if stale:
+                conn.execute(table.delete().where(table.c.id == bindparam("sid")), [{"sid": i} for i in stale])
+                deleted = len(stale)
+                touched.extend(stale)
+
+        if imported or updated or deleted:
+            bump_catalog_version(conn)
+        if hashed:
+            write_meta(conn, signature)
+    elapsed = time.perf_counter() - started
+    if after_commit is not None and touched:
+        after_commit(touched)
+
+    result = {
+        "imported": imported,
+        "updated": updated,
+        "unchanged": unchanged,
+        "deleted": deleted,
+        "skipped": stats["skipped"],
+        "rows": stats["rows"],
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "rows_per_s": round(stats["rows"] / elapsed) if elapsed > 0 else None,
+    }
+    logger.info(f"CSV import: {result}")
+    return result
+
+
+class SiteStaging:
+    """site_staging 을 만들어 채운 뒤 site 와 원자적으로 교체
+
+        staging = SiteStaging(engine, Site)
+        staging.create(copy_existing=True)
+        staging.upsert(rows)            # 여러 번 호출 가능 (호출마다 별도 트랜잭션)
+        staging.swap(keep_ids=[...])    # 보조 인덱스/before_swap 은 먼저 별도 트랜잭션에서,
+                                        # DROP + RENAME, 트리거 재생성, after_swap, catalog.version 갱신은 한 트랜잭션
+
+    copy_existing=True 로 만든 뒤 교체 전까지 site 에 들어온 쓰기(CSV import, bulk_sync, 다른 프로세스 포함)는
+    site 의 트리거가 <staging>_changes 에 id 를 기록해 두고, swap 에서 그 행들을 site 의 현재 값으로
+    staging 에 다시 반영합니다 (삭제된 행은 staging 에서도 삭제). 같은 id 는 라이브 쓰기가 우선.
+    """
+
+    def __init__(self, engine: Engine, site_model, staging_name: str = "site_staging"):
+        self.engine = engine
+        self.table = _table(site_model)
+        self.name = self.table.name
+        self.staging_name = staging_name
+        self.staging = self.table.to_metadata(MetaData(), name=staging_name)
+        self.changes_name = f"{staging_name}_changes"
+        self.rows = 0
+        self.replayed = 0
+        self._moved_indexes: List[str] = []  # staging 으로 옮긴 site 인덱스의 원래 CREATE 문 (discard 때 복원)
+
+    def _capture_triggers(self) -> Dict[str, str]:
+        """스냅샷 이후 site 변경 id 를 기록하는 트리거 {이름: CREATE 문}"""
+        return {
+            f"{self.changes_name}_{op.lower()}": (
+                f'CREATE TRIGGER "{self.changes_name}_{op.lower()}" AFTER {op} ON "{self.name}" BEGIN '
+                f'INSERT OR IGNORE INTO "{self.changes_name}" (id) VALUES ({ref}.id); END'
+            )
+            for op, ref in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"))
+        }
+
+    def _drop_capture_sql(self) -> List[str]:
+        return [f'DROP TRIGGER IF EXISTS "{name}"' for name in self._capture_triggers()] + [
+            f'DROP TABLE IF EXISTS "{self.changes_name}"']
+
+    def _schema(self, conn: Connection, kind: str) -> List[str]:
+        return [sql for (sql,) in conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE tbl_name = :t AND type = :k AND sql IS NOT NULL"),
+            {"t": self.name, "k": kind},
+        )]
+
+    def create(self, copy_existing: bool = False):
+        """기존 site 의 CREATE 문(마이그레이션으로 추가된 컬럼 포함)으로 빈 staging 테이블 생성"""
+        with self.engine.begin() as conn:
+            (table_sql,) = self._schema(conn, "table")
+            # 이전 실행이 중간에 끝나 남은 변경 기록 트리거/테이블 정리
+            for sql in self._drop_capture_sql():
+                conn.execute(text(sql))
+            conn.execute(text(f'DROP TABLE IF EXISTS "{self.staging_name}"'))
+            conn.execute(text(re.sub(r'^CREATE TABLE\s+("?)' + re.escape(self.name) + r'\1',
+                                     f'CREATE TABLE "{self.staging_name}"', table_sql, count=1)))
+            if copy_existing:
+                # 스냅샷과 같은 트랜잭션에서 변경 기록을 시작해 그 사이 쓰기가 빠지지 않도록
+                conn.execute(text(f'CREATE TABLE "{self.changes_name}" (id TEXT PRIMARY KEY)'))
+                for sql in self._capture_triggers().values():
+                    conn.execute(text(sql))
+                self.rows = conn.execute(
+                    text(f'INSERT INTO "{self.staging_name}" SELECT * FROM "{self.name}"')
+                ).rowcount
+
+    def _move_indexes(self):
+        """site 의 보조 인덱스를 staging 에 미리 생성 (교체 트랜잭션 밖에서, 채우기가 끝난 뒤 한 번에)
+
+        SQLite 인덱스 이름은 DB 전체에서 유일하고 바꿀 수 없으므로, 한 트랜잭션에서 site 의 인덱스를 지우고
+        같은 이름으로 staging 에 만듭니다. 커밋부터 교체까지의 짧은 사이에만 site 조회가 인덱스 없이 동작합니다.
+        """
+        with self.engine.begin() as conn:
+            for sql in self._schema(conn, "index"):
+                name = _INDEX_NAME_RE.match(sql).group(1)
+                conn.execute(text(f"DROP INDEX {name}"))
+                conn.execute(text(re.sub(r'\bON\s+("?)' + re.escape(self.name) + r'\1\s*\(',
+                                         f'ON "{self.staging_name}" (', sql, count=1)))
+                self._moved_indexes.append(sql)
+
+    def upsert(self, rows: Iterable[dict], update_columns: Optional[Sequence[str]] = None) -> Tuple[int, int]:
+        inserted, updated = upsert_sites(self.engine, self.staging, rows, update_columns)
+        self.rows += inserted
+        return inserted, updated
+
+    def swap(self, keep_ids: Iterable[str] = (), after_swap: Optional[Callable] = None,
+             before_swap: Optional[Callable] = None):
+        """site 를 staging 으로 교체
+
+        오래 걸리는 작업(보조 인덱스 생성, before_swap)은 교체 전에 각각 별도 트랜잭션으로 끝내고,
+        쓰기 잠금(BEGIN IMMEDIATE)을 잡은 교체 트랜잭션은 변경 재반영 + DROP/RENAME + 트리거 재생성만 합니다.
+        keep_ids: staging 에 없으면 현재 site 에서 그대로 옮겨 올 행.
+        before_swap(conn, staging_name): 교체 전에 미리 만들어 둘 파생 데이터 (예: staging 기준 FTS 색인).
+        after_swap(cursor): RENAME 직후, 트리거를 다시 만들기 전에 같은 트랜잭션에서 실행할 작업 (예: FTS 교체).
+        """
+        keep_ids = list(keep_ids)
+        if before_swap:
+            with self.engine.begin() as conn:
+                before_swap(conn, self.staging_name)
+        self._move_indexes()
+        raw = self.engine.raw_connection()
+        driver = raw.driver_connection
+        isolation = driver.isolation_level
+        # pysqlite 는 DDL 앞에 BEGIN 을 넣지 않으므로 트랜잭션을 직접 관리
+        driver.isolation_level = None
+        cur = driver.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                indexes = [sql for (sql,) in cur.execute(
+                    "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type = 'index' AND sql IS NOT NULL", (self.name,))]
+                capture = self._capture_triggers()
+                triggers = [sql for (name, sql) in cur.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE tbl_name = ? AND type = 'trigger'", (self.name,))
+                    if name not in capture]
+                self.replayed = self._replay_changes(cur)
+                for i in range(0, len(keep_ids), _ID_CHUNK):
+                    chunk = keep_ids[i:i + _ID_CHUNK]
+                    cur.execute(
+                        f'INSERT OR IGNORE INTO "{self.staging_name}" SELECT * FROM "{self.name}" '
+                        f'WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+                # DROP 은 트리거를 먼저 제거하므로 삭제 트리거가 실행되지 않음
+                cur.execute(f'DROP TABLE "{self.name}"')
+                cur.execute(f'DROP TABLE IF EXISTS "{self.changes_name}"')
+                cur.execute(f'ALTER TABLE "{self.staging_name}" RENAME TO "{self.name}"')
+                # 미리 옮긴 인덱스는 RENAME 으로 따라오고, 그 뒤 site 에 새로 생긴 인덱스만 여기서 생성
+                for sql in indexes:
+                    cur.execute(sql)
+                if after_swap:
+                    after_swap(cur)
+                for sql in triggers:
+                    cur.execute(sql)
+                cur.execute(CATALOG_META_DDL)
+                cur.execute(_META_UPSERT_SQL, {"k": CATALOG_VERSION_KEY, "v": _new_catalog_version(),
+                                               "t": datetime.datetime.now().isoformat(sep=" ")})
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        finally:
+            cur.close()
+            driver.isolation_level = isolation
+            raw.close()
+        self._moved_indexes = []
+        logger.info(f"Swapped '{self.staging_name}' in as '{self.name}' ({len(indexes)} indexes, {len(triggers)} triggers, "
+                    f"{self.replayed} rows written during staging re-applied)")
+
+    def _replay_changes(self, cur) -> int:
+        """스냅샷 이후 site 에서 바뀐 행을 staging 에 현재 값으로 덮어씀 (swap 트랜잭션 안에서 호출)"""
+        if not cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.changes_name,)).fetchone():
+            return 0
+        changed = [site_id for (site_id,) in cur.execute(f'SELECT id FROM "{self.changes_name}"')]
+        for i in range(0, len(changed), _ID_CHUNK):
+            chunk = changed[i:i + _ID_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            cur.execute(f'DELETE FROM "{self.staging_name}" WHERE id IN ({marks})', chunk)
+            cur.execute(f'INSERT INTO "{self.staging_name}" SELECT * FROM "{self.name}" WHERE id IN ({marks})', chunk)
+        return len(changed)
+
+    def discard(self):
+        with self.engine.begin() as conn:
+            for sql in self._drop_capture_sql():
+                conn.execute(text(sql))
+            conn.execute(text(f'DROP TABLE IF EXISTS "{self.staging_name}"'))
+            # 교체 전에 staging 으로 옮겼던 인덱스는 site 에 다시 생성
+            for sql in self._moved_indexes:
+                conn.execute(text(sql))
+        self._moved_indexes = []
+
+
+def rebuild_sites_csv(engine: Engine, site_model, path: str, chunk_size: int = CSV_CHUNK_SIZE,
+                      keep_ids: Iterable[str] = (), after_swap: Optional[Callable] = None,
+                      before_swap: Optional[Callable] = None) -> dict:
+    """CSV 로 site 를 통째로 재구축 (site_staging 에 채운 뒤 교체, CSV 에 없는 행은 keep_ids 외 삭제)
+
+    변환에 실패해 건너뛴 행은 기존 site 의 값을 그대로 가져갑니다.
+    """
+    table = _table(site_model)
+    columns = [c for c in CSV_SITE_COLUMNS + ["last_updated", "content_hash"] if c in table.c]
+    stats = {"rows": 0, "skipped": 0}
+    started = time.perf_counter()
+    signature = csv_file_signature(path)
+
+    staging = SiteStaging(engine, table)
+    staging.create()
+    try:
+        for chunk in iter_csv_chunks(path, chunk_size, stats):
+            for r in chunk:
+                r["content_hash"] = site_row_hash(r)
+            staging.upsert([{c: r[c] for c in columns} for r in chunk])
+        staging.swap(keep_ids=set(keep_ids) | stats["skipped_ids"], after_swap=after_swap, before_swap=before_swap)
+    except Exception:
+        staging.discard()
+        raise
+    with engine.begin() as conn:
+        write_meta(conn, signature)
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "imported": staging.rows,
+        "skipped": stats["skipped"],
+        "rows": stats["rows"],
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "rows_per_s": round(stats["rows"] / elapsed) if elapsed > 0 else None,
+    }
+    logger.info(f"CSV rebuild: {result}")
+    return result
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+# main import 시 실제 database.db 를 건드리지 않도록
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "ai_json_test.db"))
+
+import httpx
+import pytest
+
+import main
+from ai_json import IncrementalJSONObject, extract_json
+from llm import GeminiRunner
+
+REPORT = {
+    "score": 82,
+    "score_eval": "입지 \"A\" 등급, 분양가는 주변 시세 대비 {적정} 수준",
+    "market_diagnosis": "평택역 역세권 대단지로 실수요 유입이 꾸준합니다.",
+    "target_persona": "30대 신혼부부",
+    "keyword_strategy": ["역세권", "초품아", "GTX"],
+    "lms_copy_samples": ["【힐스테이트】\n✔ 계약금 5%", "\\ 이스케이프 } 괄호"],
+}
+
+
+def _recorded_outputs(report: dict) -> list:
+    """모델이 실제로 돌려주던 응답 형태들"""
+    body = json.dumps(report, ensure_ascii=False, indent=2)
+    return [
+        body,
+        f"```json\n{body}\n```",
+        f"```\n{body}\n```",
+        f"요청하신 분석 결과입니다.\n\n```json\n{body}\n```\n\n참고: 점수는 {{시세, 공급}} 기준으로 산정했습니다.",
+        f"{body}\n\n위 결과는 \"예시\" 데이터가 아닌 실제 입력값 기준입니다.",
+        f"형식 {{\"score\": 0}} 에 맞춰 작성했습니다 {{\n{body}",
+    ]
+
+
+def test_extracts_report_from_recorded_output_shapes():
+    for text in _recorded_outputs(REPORT):
+        assert extract_json(text) == REPORT, text[:80]
+    assert extract_json('["역세권", "대단지"]') == ["역세권", "대단지"]
+    assert extract_json("") is None
+    assert extract_json("JSON 없이 설명만 있는 응답 {") is None
+    # 생성이 중간에 끊긴 응답
+    assert extract_json('```json\n{"score": 80, "market_diagnosis": "입지가') is None
+
+
+def test_repairs_trailing_commas_and_smart_quotes():
+    text = '```json\n{“score”: 70, "keyword_strategy": ["역세권", "대단지",], “target_persona”: “신혼부부”,}\n```'
+    assert extract_json(text) == {"score": 70, "keyword_strategy": ["역세권", "대단지"], "target_persona": "신혼부부"}
+    # 문자열 안의 스마트 따옴표와 쉼표는 그대로
+    assert extract_json('{"copy": "“특별공급” 마감, }", }') == {"copy": "“특별공급” 마감, }"}
+    assert extract_json('{"a": 1,}', repair=False) is None
+
+
+def _feed_in_chunks(text: str, size: int) -> list:
+    parser = IncrementalJSONObject()
+    members = []
+    for i in range(0, len(text), size):
+        members.extend(parser.feed(text[i:i + size]))
+    assert parser.done
+    return members
+
+
+def test_incremental_members_match_whole_parse():
+    body = json.dumps(REPORT, ensure_ascii=False, indent=2)
+    # 1~7 글자 조각이면 키/값/이스케이프가 조각 경계에서 잘리는 경우가 모두 나옴
+    for text in (body, f"요청하신 결과입니다.\n```json\n{body}\n```\n설명 {{끝}}"):
+        for size in range(1, 8):
+            members = _feed_in_chunks(text, size)
+            assert [k for k, _ in members] == list(REPORT), size
+            assert dict(members) == REPORT, size
+
+
+def test_incremental_members_are_emitted_as_they_complete():
+    parser = IncrementalJSONObject()
+    assert parser.feed('```json\n{"score": 8') == []
+    assert parser.feed('2, "score_eval": "\\"A\\" 등급, {적') == [("score", 82)]
+    assert parser.feed('정} 수준",') == [("score_eval", '"A" 등급, {적정} 수준')]
+    assert parser.feed(' "keyword_strategy": ["역세권", "}"') == []
+    assert parser.feed(']}\n```') == [("keyword_strategy", ["역세권", "}"])]
+    assert parser.done and parser.feed('{"late": 1}') == []
+
+
+def _ai_payload() -> dict:
+    inputs = main._analysis_inputs(main.AnalyzeRequest(field_name="스트림 현장", address="경기도 평택시"))
+    report = main._fallback_analysis(inputs)
+    return {key: report[key] for key in main.AI_SECTION_KEYS}
+
+
+def test_stream_endpoint_sections_match_analyze():
+    main.create_db_and_tables()
+    text = "```json\n" + json.dumps(_ai_payload(), ensure_ascii=False) + "\n```"
+
+    def backend(model_name, prompt, generation_config, timeout):
+        return text
+
+    def stream_backend(model_name, prompt, generation_config, timeout):
+        return (text[i:i + 7] for i in range(0, len(text), 7))
+
+    async def no_context(field_name):
+        return ""
+
+    async def no_cache(key):
+        return None
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = {"field_name": "스트림 현장", "address": "경기도 평택시", "sales_price": 2500}
+            streamed = await client.post("/analyze/stream", json=body)
+            whole = await client.post("/analyze", json=body)
+        return streamed, whole
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "gemini", GeminiRunner(max_concurrency=2, backend=backend, stream_backend=stream_backend))
+        mp.setattr(main, "_live_search_context", no_context)
+        # 두 엔드포인트 모두 모델 응답으로 새로 만든 결과를 비교
+        mp.setattr(main, "_lookup_cached_analysis", no_cache)
+        streamed, whole = asyncio.run(scenario())
+
+    lines = [json.loads(line) for line in streamed.text.splitlines()]
+    assert [line["section"] for line in lines] == ["local", *main.AI_SECTION_KEYS, "done"]
+    done, report = lines[-1]["data"], whole.json()
+    # 로컬 점수에는 난수 보정이 섞이므로 형태와 AI 섹션만 /analyze 와 비교
+    assert set(done) == set(report) and done["from_cache"] is report["from_cache"] is False
+    assert {key: done[key] for key in main.AI_SECTION_KEYS} == {key: report[key] for key in main.AI_SECTION_KEYS}
+    assert all(done[line["section"]] == line["data"] for line in lines[1:-1])
+    assert all(done[key] == value for key, value in lines[0]["data"].items())
+
+
+def _corpus(rng: random.Random) -> list:
+    reports = [main._fallback_analysis(main._analysis_inputs(main.AnalyzeRequest(
+        field_name=f"현장{i}", address="경기도 평택시", sales_price=rng.randint(1500, 4000),
+        target_area_price=rng.randint(1500, 4500), supply_volume=rng.randint(100, 3000),
+    ))) for i in range(8)]
+    return [text for report in reports for text in _recorded_outputs(report)]
+
+
+def _scaled(text: str, factor: int) -> str:
+    """설명 문구를 늘려 같은 응답을 factor 배 길이로 (괄호가 많은 긴 한국어 설명 포함)"""
+    commentary = "시세 {비교} 결과 분양가가 적정하며 \"입지\" 점수가 높습니다. " * (40 * factor)
+    return f"{commentary}\n```json\n{text}\n```\n{commentary}{{"
+
+
+def _time_per_call(texts: list, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            extract_json(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(texts)
+
+
+def test_scan_time_is_linear_in_output_length():
+    corpus = _corpus(random.Random(7))
+    small = [_scaled(t, 1) for t in corpus]
+    large = [_scaled(t, 16) for t in corpus]
+    for text in small + large:
+        assert isinstance(extract_json(text), dict)
+    ratio = _time_per_call(large) / _time_per_call(small)
+    length_ratio = sum(map(len, large)) / sum(map(len, small))
+    # 선형이면 시간 비율이 길이 비율과 비슷 (제곱이면 수십 배 이상 벌어짐)
+    assert ratio < length_ratio * 2, (ratio, length_ratio)
+
+
+def _legacy_extract_json(text: str):
+    """비교용: 예전 정규식 기반 구현 (실패 시 로그 없이 None)"""
+    for pattern in (r"```json\s*(\{.*?\})\s*```", r"```\s*(\{.*?\})\s*```", r"(\{.*\})"):
+        match = re.search(pattern, text, re.DOTALL)
+        if match:
+            try:
+                return json.loads(match.group(1).strip())
+            except ValueError:
+                pass
+    try:
+        return json.loads(text.strip())
+    except ValueError:
+        return None
+
+
+def benchmark():
+    corpus = _corpus(random.Random(7))
+    expected = [extract_json(t) for t in corpus]
+    for factor in (0, 1, 4, 16):
+        texts = [_scaled(t, factor) if factor else t for t in corpus]
+        avg_len = sum(map(len, texts)) / len(texts)
+        new = _time_per_call(texts) * 1000
+        started = time.perf_counter()
+        legacy_ok = sum(_legacy_extract_json(t) == e for t, e in zip(texts, expected))
+        legacy = (time.perf_counter() - started) / len(texts) * 1000
+        print(f"x{factor:<3} avg {avg_len:8.0f} chars  scanner {new:7.3f}ms  "
+              f"legacy regex {legacy:7.3f}ms ({legacy_ok}/{len(texts)} parsed)")
+
+
+if __name__ == "__main__":
+    test_extracts_report_from_recorded_output_shapes()
+    test_repairs_trailing_commas_and_smart_quotes()
+    test_incremental_members_match_whole_parse()
+    test_incremental_members_are_emitted_as_they_complete()
+    test_stream_endpoint_sections_match_analyze()
+    test_scan_time_is_linear_in_output_length()
+    if "--bench" in sys.argv:
+        benchmark()
+    print("OK")
@@ -0,0 +1,130 @@
+import json
+import sys
+import time
+
+from pydantic import ValidationError
+
+from ai_schema import (AI_SECTION_KEYS, DEFAULT_ROI_FORECAST, default_media_mix, normalize_ai_section,
+                       normalize_ai_sections, normalize_copy_samples)
+
+INPUTS = {"field_name": "힐스테이트 평택", "fkp": "역세권 대단지", "main_concern": "고분양가"}
+
+# 모델이 자주 돌려주던 어긋난 응답 (문자열 숫자, 빠진 필드, null, 잘못된 타입)
+MESSY = {
+    "market_diagnosis": "평택역 역세권 대단지로 실수요 유입이 꾸준합니다.",
+    "target_persona": "",
+    "target_audience": "30대 신혼부부",
+    "competitors": [{"name": "자이", "price": "2,100"}, {"name": "푸르지오", "price": "1950.5", "distance": "1.2km"},
+                    "잘못된 항목", {"name": None, "gap_label": "", "price": None}],
+    "keyword_strategy": ["역세권", 2026, "GTX"],
+    "roi_forecast": {"expected_leads": "120", "expected_cpl": "문의", "roas": 3.1},
+    "lms_copy_samples": ["1안", "", None],
+    "channel_talk_samples": ["1안", "2안", "3안", "4안"],
+    "media_mix": [{"media_id": "kakao", "attention": None}, 7],
+    "unknown_section": "무시됨",
+}
+
+
+def test_empty_payload_gets_todays_defaults():
+    sections = normalize_ai_sections({}, INPUTS)
+    assert list(sections) == AI_SECTION_KEYS
+    assert sections["market_diagnosis"] == "데이터 분석 중입니다."
+    assert sections["target_audience"] == ["실거주자", "투자자"]
+    assert sections["copywriting"] == "[힐스테이트 평택] 지금 바로 만나보세요."
+    assert sections["keyword_strategy"] == ["힐스테이트 평택", "분양정보"]
+    assert sections["weekly_plan"] == ["1주차: 마케팅 기획"]
+    assert sections["competitors"] == []
+    assert sections["roi_forecast"] == DEFAULT_ROI_FORECAST
+    assert sections["lms_copy_samples"] == ["힐스테이트 평택 마케팅 정밀 카피 분석 중입니다."] * 3
+    assert sections["media_mix"] == default_media_mix(INPUTS)
+
+
+def test_non_object_payload_is_rejected():
+    # 배열 등은 기본값 리포트로 채우지 않고 실패 (/analyze 가 로컬 엔진 리포트로 대체)
+    for payload in (["not", "a", "dict"], "text", 3, None):
+        try:
+            normalize_ai_sections(payload, INPUTS)
+        except ValidationError:
+            pass
+        else:
+            raise AssertionError(payload)
+    try:
+        normalize_copy_samples(["카피"], "자이")
+    except ValidationError:
+        pass
+    else:
+        raise AssertionError("copy samples")
+
+
+def test_messy_payload_is_coerced():
+    sections = normalize_ai_sections(MESSY, INPUTS)
+    assert "unknown_section" not in sections
+    assert sections["target_persona"] == "안정적 자산 증식을 노리는 수요자"
+    assert sections["target_audience"] == ["30대 신혼부부"]
+    assert sections["keyword_strategy"] == ["역세권", "2026", "GTX"]
+    assert sections["competitors"] == [
+        {"name": "자이", "price": 0.0, "gap_label": "비교군"},
+        {"name": "푸르지오", "price": 1950.5, "gap_label": "1.2km"},
+        {"name": "경쟁 단지", "price": 0.0, "gap_label": "비교군"},
+    ]
+    assert sections["roi_forecast"] == {"expected_leads": 120.0, "expected_cpl": 50000, "conversion_rate": 2.5,
+                                        "expected_ctr": 1.8, "roas": 3.1}
+    assert sections["lms_copy_samples"] == ["1안", "힐스테이트 평택 마케팅 정밀 카피 분석 중입니다.",
+                                            "힐스테이트 평택 마케팅 정밀 카피 분석 중입니다."]
+    assert sections["channel_talk_samples"] == ["1안", "2안", "3안"]
+    assert sections["media_mix"] == [{"media_id": "kakao", "attention": "3초 안에 핵심 메시지를 전달하세요.",
+                                      "empathy": "실거주자와 투자자의 니즈를 자극하세요.",
+                                      "action": "즉각적인 상담 신청(CTA)을 유도하세요."}]
+    # 결과는 그대로 JSON 으로 저장/전송 가능
+    json.dumps(sections, ensure_ascii=False)
+
+
+def test_streamed_sections_match_whole_payload():
+    whole = normalize_ai_sections(MESSY, INPUTS)
+    assert {key: normalize_ai_section(key, MESSY.get(key), INPUTS) for key in AI_SECTION_KEYS} == whole
+
+
+def test_all_invalid_media_mix_gets_default_strategy():
+    # 항목이 모두 빠지는 경우: dict 가 아닌 항목 / 문자열로 볼 수 없는 필드
+    for media_mix in ([7, "x"], [{"media_id": ["gdn"], "attention": {"a": 1}}], []):
+        assert normalize_ai_sections({"media_mix": media_mix}, INPUTS)["media_mix"] == default_media_mix(INPUTS)
+        assert normalize_ai_section("media_mix", media_mix, INPUTS) == default_media_mix(INPUTS)
+    assert normalize_ai_section("media_mix", None, INPUTS) == default_media_mix(INPUTS)
+
+
+def test_regenerate_copy_samples():
+    copies = normalize_copy_samples({"lms_copy_samples": ["장문 1안", 0], "channel_talk_samples": "단일 카피"}, "자이")
+    assert copies == {
+        "lms_copy_samples": ["장문 1안", "자이 정밀 분석 카피가 준비 중입니다.", "자이 정밀 분석 카피가 준비 중입니다."],
+        "channel_talk_samples": ["단일 카피", "자이 맞춤 채널톡 카피가 준비 중입니다.", "자이 맞춤 채널톡 카피가 준비 중입니다."],
+    }
+
+
+def benchmark(rounds: int = 5000):
+    """요청당 보정 비용 (/analyze 전체, /analyze/stream 섹션별, /regenerate-copy)"""
+    cases = [
+        ("analyze (messy)", lambda: normalize_ai_sections(MESSY, INPUTS)),
+        ("analyze (empty)", lambda: normalize_ai_sections({}, INPUTS)),
+        ("stream 12 sections", lambda: [normalize_ai_section(k, MESSY.get(k), INPUTS) for k in AI_SECTION_KEYS]),
+        ("regenerate-copy", lambda: normalize_copy_samples(MESSY, "자이")),
+    ]
+    for name, fn in cases:
+        best = float("inf")
+        for _ in range(5):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                fn()
+            best = min(best, time.perf_counter() - started)
+        print(f"{name:<20} {best / rounds * 1e6:7.1f} us/request")
+
+
+if __name__ == "__main__":
+    test_empty_payload_gets_todays_defaults()
+    test_non_object_payload_is_rejected()
+    test_messy_payload_is_coerced()
+    test_streamed_sections_match_whole_payload()
+    test_all_invalid_media_mix_gets_default_strategy()
+    test_regenerate_copy_samples()
+    if "--bench" in sys.argv:
+        benchmark()
+    print("OK")
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+import tempfile
+
+# 실제 database.db 대신 임시 DB (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "analyze_cache_test.db"))
+
+import httpx
+import pytest
+
+import main
+from llm import GeminiRunner
+
+REQUEST = {"field_name": "e편한세상 부평역 센트럴", "address": "인천광역시 부평구", "sales_price": 2500,
+           "target_area_price": 2800, "supply_volume": "1,200세대", "field_keypoints": "GTX 역세권"}
+
+
+def test_cache_key_normalizes_inputs():
+    key = main.analyze_cache_key(main.AnalyzeRequest(**REQUEST))
+    same = [
+        {**REQUEST, "field_name": "  E편한세상   부평역\t센트럴 "},
+        {**REQUEST, "field_keypoints": "gtx  역세권"},
+        {**REQUEST, "sales_price": "2500", "target_area_price": 2800.0, "supply_volume": 1200},
+        # 결과에 영향이 없는 값은 키에서 제외
+        {**REQUEST, "user_email": "other@test", "monthly_budget": 3000},
+    ]
+    different = [{**REQUEST, "sales_price": 2600}, {**REQUEST, "address": "인천광역시 남동구"},
+                 {**REQUEST, "main_concern": "고분양가"}]
+    assert all(main.analyze_cache_key(main.AnalyzeRequest(**body)) == key for body in same)
+    assert all(main.analyze_cache_key(main.AnalyzeRequest(**body)) != key for body in different)
+
+
+def test_memory_then_db_tier_with_from_cache_flag():
+    main.create_db_and_tables()
+    calls = []
+    text = json.dumps({"market_diagnosis": "부평역 역세권 실수요 단지", "target_persona": "30대 맞벌이"}, ensure_ascii=False)
+
+    def backend(model_name, prompt, generation_config, timeout):
+        calls.append(model_name)
+        return text
+
+    async def no_context(field_name):
+        return ""
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = (await client.post("/analyze", json=REQUEST)).json()
+            # 공백/대소문자만 다른 같은 입력 → 메모리 캐시
+            memory = (await client.post("/analyze", json={**REQUEST, "field_name": "E편한세상  부평역 센트럴"})).json()
+            # 재시작처럼 메모리 캐시를 비우면 AnalysisHistory 에서 복원
+            main.analyze_cache.invalidate()
+            stored = (await client.post("/analyze", json={**REQUEST, "user_email": "cache-hit@test"})).json()
+            history = (await client.get("/history", params={"email": "cache-hit@test"})).json()
+        return first, memory, stored, history
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "gemini", GeminiRunner(max_concurrency=2, backend=backend))
+        mp.setattr(main, "_live_search_context", no_context)
+        main.analyze_cache.invalidate()
+        first, memory, stored, history = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert first.pop("from_cache") is False and first["market_diagnosis"] == "부평역 역세권 실수요 단지"
+    assert memory.pop("from_cache") is True and memory == first
+    assert stored.pop("from_cache") is True and stored == first
+    assert main.analyze_cache.peek(main.analyze_cache_key(main.AnalyzeRequest(**REQUEST))) == first
+    # 캐시 히트여도 요청한 사용자의 히스토리에는 남김
+    assert [item["field_name"] for item in history["items"]] == [REQUEST["field_name"]]
+
+
+if __name__ == "__main__":
+    test_cache_key_normalizes_inputs()
+    test_memory_then_db_tier_with_from_cache_flag()
+    print("OK")
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from crawler import AdaptiveBackoff, IsaleCrawler
+
+
+class MockIsale(BaseHTTPRequestHandler):
+    """isale searchList mock (동시 요청 수 집계, 처음 block_first 건은 302 차단)"""
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    delay = 0.1
+    block_first = 0
+    calls = 0
+    active = 0
+    max_active = 0
+
+    @classmethod
+    def reset(cls, delay=0.1, block_first=0):
+        cls.delay, cls.block_first = delay, block_first
+        cls.calls = cls.active = cls.max_active = 0
+
+    def do_GET(self):
+        cls = MockIsale
+        with cls.lock:
+            cls.calls += 1
+            blocked = cls.calls <= cls.block_first
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(cls.delay)
+        with cls.lock:
+            cls.active -= 1
+        if blocked:
+            self.send_response(302)
+            self.send_header("Location", "https://nid.naver.com/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        keyword = parse_qs(urlparse(self.path).query).get("keyword", [""])[0]
+        found = [{"complexNo": f"{keyword}-{i}", "complexName": f"{keyword} 단지 {i}"} for i in range(3)]
+        body = json.dumps({"result": {"list": found}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_mock():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockIsale)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/iSale/api/complex/searchList"
+
+
+def test_workers_share_queue_within_host_limit():
+    server, url = _start_mock()
+    try:
+        MockIsale.reset(delay=0.1)
+        keywords = [f"kw{i}" for i in range(12)] + ["kw0"]
+        seen = {}
+        crawler = IsaleCrawler(keywords, lambda kw, items: seen.__setitem__(kw, items),
+                               url=url, workers=6, per_host=3, rate=100, burst=10)
+        stats = asyncio.run(crawler.run())
+        assert len(seen) == 12 and all(len(items) == 3 for items in seen.values())
+        assert MockIsale.calls == 12
+        assert MockIsale.max_active <= 3, MockIsale.max_active
+        # 순차 처리(12 x 0.1s)보다 훨씬 빨라야 함
+        assert stats.elapsed < 0.8, stats.as_dict()
+        assert stats.as_dict()["items"] == 36
+    finally:
+        server.shutdown()
+
+
+def test_token_bucket_limits_request_rate():
+    server, url = _start_mock()
+    try:
+        MockIsale.reset(delay=0)
+        crawler = IsaleCrawler([f"r{i}" for i in range(6)], lambda kw, items: None,
+                               url=url, workers=6, per_host=6, rate=10, burst=1)
+        stats = asyncio.run(crawler.run())
+        # 첫 요청 이후 5건은 0.1s 간격
+        assert stats.elapsed >= 0.45, stats.as_dict()
+        assert MockIsale.calls == 6
+    finally:
+        server.shutdown()
+
+
+def test_blocked_responses_back_off_and_retry():
+    server, url = _start_mock()
+    try:
+        MockIsale.reset(delay=0.01, block_first=2)
+        backoff = AdaptiveBackoff(base=0.1, max_delay=1.0)
+
+        async def on_items(kw, items):
+            await asyncio.sleep(0)
+
+        crawler = IsaleCrawler(["a", "b", "c", "d"], on_items, url=url, workers=1, rate=100,
+                               burst=10, backoff=backoff)
+        stats = asyncio.run(crawler.run())
+        s = stats.as_dict()
+        assert s["blocked"] == 2 and s["failed"] == 0 and s["done"] == 4, s
+        # 두 번 연속 차단 → 0.1 + 0.2 초 가량 대기
+        assert stats.elapsed >= 0.2, s
+        # 정상 응답이 이어지면서 backoff 가 줄어듦
+        assert backoff.delay < 0.2
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_workers_share_queue_within_host_limit()
+    test_token_bucket_limits_request_rate()
+    test_blocked_responses_back_off_and_retry()
+    print("OK")
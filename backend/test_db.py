@@ -0,0 +1,92 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+# 실제 database.db 대신 임시 DB (db import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "db_test.db"))
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from db import DB_BUSY_TIMEOUT_MS, db_read, db_write, make_engine, write_engine
+
+
+def _pragma(conn, name: str):
+    return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_pragmas_and_read_only_split():
+    path = os.path.join(tempfile.mkdtemp(), "pragmas.db")
+    writer, reader = make_engine(path), make_engine(path, read_only=True, pool_size=2)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)"))
+        conn.execute(text("INSERT INTO t (v) VALUES ('a')"))
+        assert _pragma(conn, "journal_mode") == "wal"
+        assert _pragma(conn, "synchronous") == 1 and _pragma(conn, "temp_store") == 2
+        assert _pragma(conn, "busy_timeout") == DB_BUSY_TIMEOUT_MS and _pragma(conn, "query_only") == 0
+
+    with reader.connect() as conn:
+        assert _pragma(conn, "query_only") == 1 and _pragma(conn, "journal_mode") == "wal"
+        # 읽기 엔진으로는 쓰기가 바로 실패
+        with pytest.raises(OperationalError, match="readonly"):
+            conn.execute(text("INSERT INTO t (v) VALUES ('b')"))
+
+    # WAL: 쓰기 트랜잭션이 열려 있어도 읽기는 막히지 않고 커밋된 값만 봄
+    with writer.begin() as conn:
+        conn.execute(text("INSERT INTO t (v) VALUES ('pending')"))
+        with reader.connect() as read_conn:
+            assert read_conn.execute(text("SELECT v FROM t ORDER BY id")).scalars().all() == ["a"]
+    writer.dispose()
+    reader.dispose()
+
+
+def test_db_read_write_run_on_their_own_pools():
+    with write_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS executor_test (id INTEGER PRIMARY KEY, v TEXT)"))
+
+    def slow_insert(session, value):
+        time.sleep(0.3)
+        session.exec(text("INSERT INTO executor_test (v) VALUES (:v)").bindparams(v=value))
+        return threading.current_thread().name
+
+    def read_values(session):
+        return threading.current_thread().name, session.exec(text("SELECT v FROM executor_test")).scalars().all()
+
+    def write_through_read_engine(session):
+        session.exec(text("INSERT INTO executor_test (v) VALUES ('x')"))
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick_task = asyncio.ensure_future(ticker())
+        write = asyncio.ensure_future(db_write(slow_insert, "written"))
+        # 느린 쓰기가 도는 동안에도 읽기는 read 풀에서 바로 처리되고 이벤트 루프도 계속 돎
+        started = time.perf_counter()
+        read_thread, before = await db_read(read_values)
+        read_elapsed = time.perf_counter() - started
+        write_thread = await write
+        _, after = await db_read(read_values)
+        tick_task.cancel()
+        with pytest.raises(OperationalError, match="readonly"):
+            await db_read(write_through_read_engine)
+        return read_thread, write_thread, read_elapsed, before, after, ticks
+
+    read_thread, write_thread, read_elapsed, before, after, ticks = asyncio.run(scenario())
+    assert read_thread.startswith("db-read") and write_thread.startswith("db-write")
+    assert read_elapsed < 0.2 and "written" not in before and "written" in after
+    assert ticks >= 10
+
+
+if __name__ == "__main__":
+    test_pragmas_and_read_only_split()
+    test_db_read_write_run_on_their_own_pools()
+    print("OK")
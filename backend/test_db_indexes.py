@@ -0,0 +1,87 @@
+import datetime
+import os
+import tempfile
+
+# 실제 database.db 대신 임시 DB 에 스키마/인덱스 생성 (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "index_test.db"))
+
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+from sqlmodel import col, or_, select
+
+import main
+from main import AnalysisHistory, Lead, Site
+
+
+def _seed():
+    now = datetime.datetime.now()
+    with main.engine.begin() as conn:
+        conn.execute(text("DELETE FROM analysishistory"))
+        conn.execute(text("DELETE FROM lead"))
+        conn.execute(
+            text("INSERT INTO analysishistory (user_email, field_name, address, score, response_json, request_hash, created_at) "
+                 "VALUES (:e, 'f', 'a', 80, '{}', :h, :t)"),
+            [{"e": f"u{i % 20}@x", "h": f"h{i % 50}", "t": now - datetime.timedelta(minutes=i)} for i in range(500)],
+        )
+        conn.execute(
+            text("INSERT INTO lead (name, phone, rank, site, source, created_at) VALUES ('n', '010', 'r', :s, 's', :t)"),
+            [{"s": f"site{i % 10}", "t": now - datetime.timedelta(minutes=i)} for i in range(200)],
+        )
+        conn.execute(text("ANALYZE"))
+
+
+def _plan(statement) -> str:
+    if not isinstance(statement, str):
+        statement = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    with main.read_engine.connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {statement}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def _assert_uses(plan: str, index: str):
+    assert f"INDEX {index}" in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
+
+
+def test_hot_queries_use_secondary_indexes():
+    main.create_db_and_tables()
+    _seed()
+    cutoff = datetime.datetime.now() - datetime.timedelta(hours=24)
+
+    # /history?email=, /history (첫 페이지와 cursor 이후 페이지)
+    after = (datetime.datetime.now() - datetime.timedelta(minutes=30), 100)
+    _assert_uses(_plan(main.history_query("u1@x")), "ix_analysishistory_user_recent")
+    _assert_uses(_plan(main.history_query("u1@x", after=after)), "ix_analysishistory_user_recent")
+    _assert_uses(_plan(main.history_query()), "ix_analysishistory_recent")
+    _assert_uses(_plan(main.history_query(after=after)), "ix_analysishistory_recent")
+
+    # /analyze 캐시 조회 (_lookup_cached_analysis)
+    cached = (select(AnalysisHistory)
+              .where(AnalysisHistory.request_hash == "h1", AnalysisHistory.created_at >= cutoff)
+              .order_by(AnalysisHistory.created_at.desc()).limit(1))
+    _assert_uses(_plan(cached), "ix_analysishistory_request_created")
+
+    # 색인 미준비 시 ILIKE 검색 (_db_search_sites) 와 색인 갱신 감지
+    search = (select(Site).where(or_(col(Site.name).ilike("%힐스%"), col(Site.address).ilike("%힐스%")))
+              .order_by(col(Site.last_updated).desc()).limit(100))
+    _assert_uses(_plan(search), "ix_site_last_updated")
+    _assert_uses(_plan("SELECT max(last_updated) FROM site"), "ix_site_last_updated")
+
+    # 현장별 최근 리드
+    leads = select(Lead).where(Lead.site == "site1").order_by(Lead.created_at.desc()).limit(20)
+    _assert_uses(_plan(leads), "ix_lead_site_created")
+
+
+def test_replaced_single_column_index_is_dropped():
+    main.create_db_and_tables()
+    with main.read_engine.connect() as conn:
+        names = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert "ix_analysishistory_request_hash" not in names
+    assert set(main.OBSOLETE_INDEXES).isdisjoint(names)
+    assert {"ix_site_last_updated", "ix_lead_site_created", "ix_analysishistory_request_created"} <= names
+
+
+if __name__ == "__main__":
+    test_hot_queries_use_secondary_indexes()
+    test_replaced_single_column_index_is_dropped()
+    print("OK")
@@ -0,0 +1,102 @@
+import asyncio
+import base64
+import datetime
+import os
+import tempfile
+
+# 실제 database.db 대신 임시 DB (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "history_cursor_test.db"))
+
+import httpx
+from sqlalchemy import text
+
+import main
+
+
+def _seed(prefix: str) -> datetime.datetime:
+    """created_at 이 같은 행을 여러 개 넣어 id 로만 순서가 갈리게 함 ({prefix}-a 7건, {prefix}-b 4건)"""
+    same = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    a, b = f"{prefix}-a@test", f"{prefix}-b@test"
+    rows = [(a, same)] * 6 + [(b, same)] * 3 + \
+           [(a, same - datetime.timedelta(seconds=1)), (b, same + datetime.timedelta(seconds=1))]
+    # 앱과 같은 DateTime 직렬화로 저장되도록 모델 테이블로 insert
+    with main.engine.begin() as conn:
+        conn.execute(main.AnalysisHistory.__table__.insert(), [
+            {"user_email": e, "field_name": "f", "address": "a", "score": 80, "response_json": "{}", "created_at": t}
+            for e, t in rows
+        ])
+    return same
+
+
+def _expected_ids(email: str = None) -> list:
+    where = "WHERE user_email = :e" if email else ""
+    with main.engine.connect() as conn:
+        return list(conn.execute(text(f"SELECT id FROM analysishistory {where} ORDER BY created_at DESC, id DESC"),
+                                 {"e": email}).scalars())
+
+
+def _get(params_list: list) -> list:
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get("/history", params=params) for params in params_list]
+    return asyncio.run(scenario())
+
+
+def _walk(limit: int, email: str = None) -> tuple:
+    """next_cursor 를 따라 끝까지 읽고 (id 목록, 페이지별 next_cursor) 반환"""
+    ids, cursors, cursor = [], [], None
+    while True:
+        params = {"limit": limit, **({"email": email} if email else {}), **({"cursor": cursor} if cursor else {})}
+        (res,) = _get([params])
+        page = res.raise_for_status().json()
+        page_ids = [item["id"] for item in page["items"]]
+        # 중복이 나오면 cursor 가 앞으로 가지 않는 것이므로 무한 반복 대신 바로 실패
+        assert len(page_ids) <= limit and not set(page_ids) & set(ids), (ids, page_ids)
+        ids += page_ids
+        cursor = page["next_cursor"]
+        cursors.append(cursor)
+        if cursor is None:
+            return ids, cursors
+
+
+def test_pages_tie_break_on_id_without_gaps():
+    main.create_db_and_tables()
+    _seed("page")
+    for limit in (1, 2, 3, 4):
+        ids, _ = _walk(limit)
+        assert ids == _expected_ids(), limit
+
+    # 이메일 필터 + cursor: 7건을 3건씩 → 3페이지, 마지막 페이지만 next_cursor 없음
+    ids, cursors = _walk(3, "page-a@test")
+    assert ids == _expected_ids("page-a@test") and len(ids) == 7
+    assert [c is None for c in cursors] == [False, False, True]
+    # 딱 나누어떨어지면 빈 페이지 없이 끝남
+    ids, cursors = _walk(2, "page-b@test")
+    assert len(ids) == 4 and len(cursors) == 2 and cursors[-1] is None
+
+
+def test_email_filter_with_cursor_from_middle_of_tie():
+    main.create_db_and_tables()
+    same = _seed("tie")
+    a_ids = _expected_ids("tie-a@test")
+    # 같은 created_at 묶음 중간 (id 기준 3번째) 이후부터
+    cursor = main._encode_history_cursor(same, a_ids[2])
+    (res,) = _get([{"email": "tie-a@test", "cursor": cursor, "limit": 100}])
+    page = res.raise_for_status().json()
+    assert [item["id"] for item in page["items"]] == a_ids[3:] and page["next_cursor"] is None
+
+
+def test_malformed_cursor_is_rejected():
+    main.create_db_and_tables()
+    bad = ["not a cursor", base64.urlsafe_b64encode(b"2026-01-01T00:00:00").decode(),
+           base64.urlsafe_b64encode(b"yesterday|12").decode(), base64.urlsafe_b64encode(b"2026-01-01T00:00:00|x").decode()]
+    responses = _get([{"cursor": c} for c in bad])
+    assert [r.status_code for r in responses] == [400] * len(bad)
+
+
+if __name__ == "__main__":
+    test_pages_tie_break_on_id_without_gaps()
+    test_email_filter_with_cursor_from_middle_of_tie()
+    test_malformed_cursor_is_rejected()
+    print("OK")
@@ -0,0 +1,85 @@
+import asyncio
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from http_clients import HttpClientPool
+
+UPSTREAMS = {
+    "fast": {"timeout": 2.0, "connect": 1.0, "follow_redirects": False},
+    "down": {"timeout": 1.0, "connect": 0.5, "follow_redirects": False},
+}
+
+
+class KeepAliveStub(BaseHTTPRequestHandler):
+    """keep-alive 로 짧은 JSON 을 돌려주는 로컬 업스트림"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_per_upstream_metrics_and_connection_reuse():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    pool = HttpClientPool(UPSTREAMS)
+
+    async def scenario():
+        for _ in range(3):
+            res = await pool.request("fast", "GET", url)
+            assert res.json() == {"ok": True}
+        assert pool.get("fast") is pool.get("fast")
+        with pytest.raises(httpx.ConnectError):
+            await pool.request("down", "GET", f"http://127.0.0.1:{_closed_port()}/")
+        await pool.aclose()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    upstreams = pool.metrics()["upstreams"]
+    fast, down = upstreams["fast"], upstreams["down"]
+    # 같은 루프 안의 순차 요청은 keep-alive 커넥션 하나를 재사용
+    assert (fast["requests"], fast["new_connections"], fast["reused_connections"]) == (3, 1, 2)
+    assert fast["reuse_ratio"] == round(2 / 3, 3) and fast["errors"] == 0 and fast["in_flight"] == 0
+    assert fast["pool_wait_avg_ms"] is not None
+    # 실패는 해당 업스트림에만 집계
+    assert (down["requests"], down["errors"], down["in_flight"]) == (1, 1, 0)
+
+
+def test_new_event_loop_gets_new_client():
+    pool = HttpClientPool(UPSTREAMS)
+
+    async def client_for_loop():
+        return pool.get("fast")
+
+    first = asyncio.run(client_for_loop())
+    second = asyncio.run(client_for_loop())
+    # asyncio.run 마다 루프가 다르므로 이전 루프의 클라이언트를 쓰지 않음
+    assert first is not second and not second.is_closed
+    asyncio.run(pool.aclose())
+
+
+if __name__ == "__main__":
+    test_per_upstream_metrics_and_connection_reuse()
+    test_new_event_loop_gets_new_client()
+    print("OK")
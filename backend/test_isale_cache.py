@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 실제 database.db 대신 임시 DB 사용 (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "isale_cache_test.db"))
+
+import httpx
+import pytest
+
+import main
+
+SITES = [
+    {"complexNo": 1, "complexName": "힐스테이트 스테이션", "address": "경기도 의정부시", "salesStatusName": "분양중", "h_name": "힐스테이트"},
+    {"complexNo": 2, "complexName": "힐스 파크뷰", "address": "서울특별시 강동구", "salesStatusName": "분양예정", "h_name": "기타"},
+    {"complexNo": 3, "complexName": "더샵 센트럴", "address": "부산광역시 해운대구", "salesStatusName": "분양중", "h_name": "더샵"},
+]
+
+
+class StubIsale(BaseHTTPRequestHandler):
+    """isale searchList 흉내를 내는 로컬 stub (요청 수 집계, 응답 지연)"""
+    protocol_version = "HTTP/1.1"
+    calls = []
+    delay = 0.2
+
+    def do_GET(self):
+        keyword = parse_qs(urlparse(self.path).query).get("keyword", [""])[0]
+        StubIsale.calls.append(keyword)
+        time.sleep(StubIsale.delay)
+        found = [s for s in SITES if keyword in s["complexName"].lower() or keyword in s["address"]]
+        body = json.dumps({"result": {"list": found}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubIsale)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    main.ISALE_SEARCH_URL = f"http://127.0.0.1:{server.server_port}/iSale/api/complex/searchList"
+    return server
+
+
+def test_isale_cache():
+    server = _start_stub()
+    try:
+        async def scenario():
+            StubIsale.calls.clear()
+            main.isale_cache.invalidate()
+
+            # 1. 동시에 들어온 같은 검색어는 upstream 1회로 공유 (single-flight)
+            results = await asyncio.gather(*[main.search_isale("힐스") for _ in range(5)])
+            assert StubIsale.calls == ["힐스"], StubIsale.calls
+            assert all(len(r) == 2 for r in results)
+
+            # 2. TTL 이내 재요청은 캐시 히트
+            await main.search_isale("  힐스 ")
+            assert len(StubIsale.calls) == 1
+
+            # 3. 접두어 결과를 로컬에서 좁혀 재사용
+            narrowed = await main.search_isale("힐스테이")
+            assert [r["id"] for r in narrowed] == ["extern_isale_1"]
+            assert len(StubIsale.calls) == 1
+
+            # 4. TTL 만료 후에는 오래된 값을 즉시 반환하고 백그라운드 갱신
+            ttl = main.isale_cache.ttl
+            main.isale_cache.ttl = 0
+            try:
+                stale = await main.search_isale("더샵")
+                assert len(StubIsale.calls) == 2 and len(stale) == 1
+                started = time.perf_counter()
+                stale_again = await main.search_isale("더샵")
+                assert time.perf_counter() - started < StubIsale.delay
+                assert stale_again == stale
+                await asyncio.sleep(StubIsale.delay * 2)
+                assert StubIsale.calls.count("더샵") == 2
+            finally:
+                # 실패해도 줄인 TTL 이 다음 테스트로 새지 않도록
+                main.isale_cache.ttl = ttl
+
+            print("cache stats:", main.isale_cache.snapshot())
+
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+
+def _get_all(requests: list) -> list:
+    """[(path, params, headers)] 를 ASGI 클라이언트로 차례로 요청"""
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(path, params=params, headers=headers) for path, params, headers in requests]
+    return asyncio.run(scenario())
+
+
+def test_failed_isale_search_is_not_cacheable():
+    main.create_db_and_tables()
+
+    async def failing(q):
+        raise RuntimeError("isale down")
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "search_isale", failing)
+        (res,) = _get_all([("/search-sites", {"q": "자이"}, {})])
+    # 실패한 호출도 done() 이지만 DB 결과뿐이므로 max-age 없이
+    assert res.status_code == 200 and res.headers["cache-control"] == "no-cache"
+
+
+def test_search_and_site_details_etags():
+    main.create_db_and_tables()
+
+    async def no_external(q):
+        return []
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "search_isale", no_external)
+        (search, details) = _get_all([("/search-sites", {"q": "메이플"}, {}), ("/site-details/seoul_seocho_1", {}, {})])
+        assert search.status_code == 200 and [r["id"] for r in search.json()] == ["seoul_seocho_1"]
+        assert search.headers["cache-control"] == f"public, max-age={main.SEARCH_MAX_AGE}"
+        assert details.status_code == 200 and details.json()["name"] == "메이플자이"
+        assert details.headers["cache-control"] == f"public, max-age={main.SITE_DETAILS_MAX_AGE}"
+
+        search_etag, details_etag = search.headers["etag"], details.headers["etag"]
+        assert search_etag.startswith('"') and details_etag.startswith('"')
+        # 같은 ETag 면 본문 없이 304 (weak 비교, 목록 형식도 허용), 다르면 200
+        not_modified = _get_all([
+            ("/search-sites", {"q": "메이플"}, {"If-None-Match": search_etag}),
+            ("/site-details/seoul_seocho_1", {}, {"If-None-Match": f'"other", W/{details_etag}'}),
+            ("/site-details/seoul_seocho_1", {}, {"If-None-Match": '"other"'}),
+        ])
+    assert [r.status_code for r in not_modified] == [304, 304, 200]
+    assert not_modified[0].content == b"" and not_modified[0].headers["etag"] == search_etag
+    assert not_modified[1].headers["cache-control"] == details.headers["cache-control"]
+    assert not_modified[2].content == details.content
+
+
+def test_slow_isale_is_merged_progressively():
+    main.create_db_and_tables()
+    external = [{"id": "extern_isale_77", "name": "메이플 리버뷰", "address": "서울특별시 서초구", "status": "분양예정"}]
+    gate = {}
+
+    async def slow_isale(q):
+        await gate["release"].wait()
+        return external
+
+    async def scenario():
+        gate["release"] = asyncio.Event()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # 예산을 넘기면 기다리지 않고 DB 결과만, 재사용하지 않도록 no-cache
+            started = time.perf_counter()
+            budgeted = await client.get("/search-sites", params={"q": "메이플"})
+            elapsed = time.perf_counter() - started
+            # 스트림은 local 단계를 먼저 보내고 isale 결과가 오면 합친 final 을 보냄
+            asyncio.get_running_loop().call_later(0.05, gate["release"].set)
+            streamed = await client.get("/search-sites/stream", params={"q": "메이플"})
+        return budgeted, elapsed, streamed
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "search_isale", slow_isale)
+        mp.setattr(main, "SEARCH_UPSTREAM_BUDGET", 0.05)
+        budgeted, elapsed, streamed = asyncio.run(scenario())
+
+    assert elapsed < 1 and budgeted.headers["cache-control"] == "no-cache"
+    assert [r["id"] for r in budgeted.json()] == ["seoul_seocho_1"]
+    local, final = [json.loads(line) for line in streamed.text.splitlines()]
+    assert local["stage"] == "local" and [r["id"] for r in local["results"]] == ["seoul_seocho_1"]
+    # 둘 다 현장명이 검색어로 시작해 site_sort_key 가 같으므로 DB 결과가 앞 (안정 정렬)
+    assert final["stage"] == "final" and [r["id"] for r in final["results"]] == ["seoul_seocho_1", "extern_isale_77"]
+
+
+if __name__ == "__main__":
+    test_isale_cache()
+    test_failed_isale_search_is_not_cacheable()
+    test_search_and_site_details_etags()
+    test_slow_isale_is_merged_progressively()
+    print("OK")
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 실제 database.db 대신 임시 DB 사용 (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "outbox_test.db"))
+
+import httpx
+import pytest
+from sqlmodel import Session, select
+
+import main
+from main import Lead, LeadOutbox
+from lead_outbox import OUTBOX_DEAD, OUTBOX_SENT, LeadOutboxDispatcher
+
+
+class StubWebhook(BaseHTTPRequestHandler):
+    """Apps Script 웹훅 stub (처음 fail_first 건은 500, 요청별로 받은 리드 기록)"""
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    delay = 0.0
+    fail_first = 0
+    calls = 0
+    received = []
+    posts = []
+    failed_posts = []
+    arrays = 0
+
+    @classmethod
+    def reset(cls, delay=0.0, fail_first=0):
+        cls.delay, cls.fail_first = delay, fail_first
+        cls.calls = 0
+        cls.received = []
+        cls.posts = []
+        cls.failed_posts = []
+        cls.arrays = 0
+
+    def do_POST(self):
+        cls = StubWebhook
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with cls.lock:
+            cls.calls += 1
+            failed = cls.calls <= cls.fail_first
+        time.sleep(cls.delay)
+        payload = json.loads(body)
+        leads = payload if isinstance(payload, list) else [payload]
+        with cls.lock:
+            cls.arrays += isinstance(payload, list)
+            if failed:
+                cls.failed_posts.append(leads)
+            else:
+                cls.received.extend(leads)
+                cls.posts.append(leads)
+        self.send_response(500 if failed else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWebhook)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/exec"
+
+
+def _reset_tables():
+    main.create_db_and_tables()
+    with Session(main.engine) as session:
+        for row in session.exec(select(LeadOutbox)).all():
+            session.delete(row)
+        for row in session.exec(select(Lead)).all():
+            session.delete(row)
+        session.commit()
+
+
+def _outbox_rows():
+    with Session(main.engine) as session:
+        return session.exec(select(LeadOutbox).order_by(LeadOutbox.id)).all()
+
+
+def _dispatcher(url: str, **options) -> LeadOutboxDispatcher:
+    async def send(payload):
+        async with httpx.AsyncClient() as client:
+            (await client.post(url, json=payload)).raise_for_status()
+
+    return LeadOutboxDispatcher(main.engine, LeadOutbox, send, **options)
+
+
+async def _drain_until_idle(dispatcher: LeadOutboxDispatcher, rounds: int = 20):
+    for _ in range(rounds):
+        await dispatcher.drain_once()
+        if all(r.status != "pending" for r in _outbox_rows()):
+            return
+        await asyncio.sleep(0.05)
+
+
+def test_failed_deliveries_are_retried_with_backoff():
+    server, url = _start_stub()
+    try:
+        _reset_tables()
+        StubWebhook.reset(fail_first=2)
+        dispatcher = _dispatcher(url, batch_size=10, max_batch=1, base_delay=0.05, max_delay=0.2)
+        with Session(main.engine) as session:
+            for i in range(5):
+                dispatcher.enqueue(session, {"name": f"lead{i}"}, lead_id=i)
+            session.commit()
+
+        asyncio.run(_drain_until_idle(dispatcher))
+        rows = _outbox_rows()
+        assert all(r.status == OUTBOX_SENT and r.sent_at for r in rows), [(r.status, r.last_error) for r in rows]
+        assert sorted(p["name"] for p in StubWebhook.received) == [f"lead{i}" for i in range(5)]
+        assert sum(r.attempts for r in rows) == 7
+        assert dispatcher.metrics()["sent"] == 5 and dispatcher.metrics()["failed_attempts"] == 2
+    finally:
+        server.shutdown()
+
+
+def test_rows_are_marked_dead_after_max_attempts():
+    server, url = _start_stub()
+    try:
+        _reset_tables()
+        StubWebhook.reset(fail_first=100)
+        dispatcher = _dispatcher(url, base_delay=0.01, max_delay=0.02, max_attempts=3)
+        with Session(main.engine) as session:
+            dispatcher.enqueue(session, {"name": "never"})
+            session.commit()
+
+        asyncio.run(_drain_until_idle(dispatcher))
+        (row,) = _outbox_rows()
+        assert row.status == OUTBOX_DEAD and row.attempts == 3 and "500" in row.last_error
+        assert StubWebhook.calls == 3 and dispatcher.metrics()["dead"] == 1
+    finally:
+        server.shutdown()
+
+
+def test_leads_are_coalesced_into_ordered_batches():
+    server, url = _start_stub()
+    try:
+        _reset_tables()
+        StubWebhook.reset(delay=0.05, fail_first=1)
+        dispatcher = _dispatcher(url, batch_size=200, max_batch=50, concurrency=2, base_delay=0.01, max_delay=0.02)
+        with Session(main.engine) as session:
+            for i in range(120):
+                dispatcher.enqueue(session, {"name": f"lead{i}"})
+            session.commit()
+
+        started = time.perf_counter()
+        asyncio.run(_drain_until_idle(dispatcher))
+        elapsed = time.perf_counter() - started
+        rows = _outbox_rows()
+        assert all(r.status == OUTBOX_SENT for r in rows)
+        # 50 + 50 + 20 건씩 배열로 전송, 배열 안은 outbox 순서
+        assert sorted(len(post) for post in StubWebhook.posts) == [20, 50, 50]
+        assert all([p["seq"] for p in post] == sorted(p["seq"] for p in post) for post in StubWebhook.posts)
+        keys = [p["idempotency_key"] for p in StubWebhook.received]
+        assert len(keys) == len(set(keys)) == 120
+        # 실패한 배치는 같은 idempotency_key 로 다시 전송됨
+        (failed_post,) = StubWebhook.failed_posts
+        assert {p["idempotency_key"] for p in failed_post} <= set(keys)
+        m = dispatcher.metrics()
+        assert m["posts"] == 4 and m["max_post_size"] == 50 and m["sent"] == 120
+        # 리드당 요청(0.05s x 120)이었다면 수 초가 걸림
+        assert elapsed < 1.5, elapsed
+    finally:
+        server.shutdown()
+
+
+def test_submit_lead_returns_before_webhook():
+    server, url = _start_stub()
+    try:
+        _reset_tables()
+        StubWebhook.reset(delay=1.0)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                started = time.perf_counter()
+                res = await client.post("/submit-lead", json={"name": "홍길동", "phone": "010", "rank": "1", "site": "s1"})
+                elapsed = time.perf_counter() - started
+            # 느린 웹훅을 기다리지 않고 응답, 리드와 outbox 행은 이미 커밋됨
+            assert res.status_code == 200 and elapsed < 0.5, elapsed
+            (row,) = _outbox_rows()
+            assert row.status == "pending" and row.lead_id is not None
+            await main.lead_outbox.drain_once()
+            await main.http_pool.get("sheet_webhook").aclose()
+
+        # 다른 테스트에 웹훅 주소가 남지 않도록 끝나면 원래 값으로 되돌림
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(main, "GOOGLE_SHEET_WEBHOOK_URL", url)
+            asyncio.run(scenario())
+        assert [p["name"] for p in StubWebhook.received] == ["홍길동"]
+        # 기본 설정은 지금의 Apps Script 형식 그대로 리드 객체 하나를 전송
+        assert StubWebhook.arrays == 0
+        assert _outbox_rows()[0].status == OUTBOX_SENT
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_failed_deliveries_are_retried_with_backoff()
+    test_rows_are_marked_dead_after_max_attempts()
+    test_leads_are_coalesced_into_ordered_batches()
+    test_submit_lead_returns_before_webhook()
+    print("OK")
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from llm import GeminiRunner
+
+
+def fake_backend(behaviour):
+    """모델명 → (지연 초, 응답 텍스트 또는 예외)"""
+    calls = []
+
+    def backend(model_name, prompt, generation_config, timeout):
+        calls.append(model_name)
+        delay, outcome = behaviour[model_name]
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return backend, calls
+
+
+def test_slow_primary_is_hedged():
+    backend, calls = fake_backend({
+        "slow": (1.0, json.dumps({"from": "slow"})),
+        "fast": (0.05, json.dumps({"from": "fast"})),
+    })
+    runner = GeminiRunner(max_concurrency=4, backend=backend)
+    started = time.perf_counter()
+    model, data = asyncio.run(runner.hedged_generate(["slow", "fast"], "p", parse=json.loads, hedge_delay=0.1))
+    elapsed = time.perf_counter() - started
+    assert (model, data) == ("fast", {"from": "fast"})
+    assert elapsed < 0.5, elapsed
+    assert calls == ["slow", "fast"]
+    assert runner.hedges == 1
+
+
+def test_failure_launches_next_immediately():
+    backend, calls = fake_backend({
+        "broken": (0.01, RuntimeError("quota")),
+        "garbage": (0.01, "not json"),
+        "ok": (0.01, json.dumps({"ok": True})),
+    })
+    runner = GeminiRunner(max_concurrency=4, backend=backend)
+
+    def parse(text):
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+
+    model, data = asyncio.run(runner.hedged_generate(["broken", "garbage", "ok"], "p", parse=parse, hedge_delay=5))
+    assert model == "ok" and data == {"ok": True}
+    assert calls == ["broken", "garbage", "ok"]
+    assert runner.hedges == 0
+    assert runner.model_stats["broken"].failures == 1
+    assert runner.model_stats["garbage"].failures == 1
+    assert runner.model_stats["ok"].successes == 1
+
+
+def test_non_object_response_does_not_win():
+    # 먼저 끝난 모델이 JSON 배열을 돌려줘도 다음 후보의 객체 응답을 사용
+    backend, calls = fake_backend({
+        "array": (0.01, json.dumps([{"market_diagnosis": "배열"}])),
+        "text": (0.01, json.dumps("문자열")),
+        "object": (0.05, json.dumps({"market_diagnosis": "객체"})),
+    })
+    runner = GeminiRunner(max_concurrency=4, backend=backend)
+    model, data = asyncio.run(runner.hedged_generate(["array", "text", "object"], "p", parse=json.loads, hedge_delay=5))
+    assert (model, data) == ("object", {"market_diagnosis": "객체"})
+    assert calls == ["array", "text", "object"]
+    assert runner.model_stats["array"].failures == 1 and runner.model_stats["text"].failures == 1
+
+
+def test_deadline_and_full_pool_raise_instead_of_hanging():
+    release = threading.Event()
+
+    def backend(model_name, prompt, generation_config, timeout):
+        release.wait(5)
+        return json.dumps({"model": model_name})
+
+    def stream_backend(model_name, prompt, generation_config, timeout):
+        yield '{"a": 1,'
+        release.wait(5)
+        yield '"b": 2}'
+
+    runner = GeminiRunner(max_concurrency=1, deadline=5, backend=backend, stream_backend=stream_backend)
+
+    async def scenario():
+        # 실행 중 호출이 deadline 을 넘기면 TimeoutError, 슬롯은 스레드가 끝날 때까지 유지
+        started = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await runner.generate("slow", "p", deadline=0.2)
+        assert time.perf_counter() - started < 1 and runner.in_flight == 1
+
+        # 슬롯이 꽉 찬 동안 들어온 호출은 대기열에서 deadline 초과
+        started = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await runner.generate("queued", "p", deadline=0.1)
+        assert time.perf_counter() - started < 1 and runner.max_queued == 1 and runner.queued == 0
+
+        # 기다릴 수 있는 호출은 슬롯이 풀리면 실행
+        waiting = asyncio.ensure_future(runner.generate("next", "p", deadline=5))
+        await asyncio.sleep(0.05)
+        assert runner.queued == 1
+        release.set()
+        assert json.loads(await waiting) == {"model": "next"}
+
+        # 스트림도 deadline 이 전체에 적용됨 (첫 조각 이후 멈춘 스트림)
+        release.clear()
+        chunks = []
+        with pytest.raises(asyncio.TimeoutError):
+            async for chunk in runner.stream("stalled", "p", deadline=0.2):
+                chunks.append(chunk)
+        assert chunks == ['{"a": 1,']
+        release.set()
+        # 멈춰 있던 스레드가 끝나면 슬롯 반환
+        for _ in range(100):
+            if runner.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert runner.in_flight == 0
+
+    asyncio.run(scenario())
+    assert runner.timeouts == 3 and runner.completed == 1
+
+
+def test_all_candidates_fail():
+    backend, _ = fake_backend({"a": (0.01, RuntimeError("x")), "b": (0.01, RuntimeError("y"))})
+    runner = GeminiRunner(max_concurrency=2, backend=backend)
+    assert asyncio.run(runner.hedged_generate(["a", "b"], "p", parse=json.loads)) == (None, None)
+
+
+def test_order_adapts_to_observed_latency():
+    backend, calls = fake_backend({
+        "first": (0.15, json.dumps({"m": 1})),
+        "second": (0.01, json.dumps({"m": 2})),
+    })
+    runner = GeminiRunner(max_concurrency=4, backend=backend)
+
+    async def warm_up():
+        for _ in range(5):
+            await runner._attempt("first", "p", None, json.loads, None)
+            await runner._attempt("second", "p", None, json.loads, None)
+
+    asyncio.run(warm_up())
+    assert runner.ordered_candidates(["first", "second"]) == ["second", "first"]
+    calls.clear()
+    model, _ = asyncio.run(runner.hedged_generate(["first", "second"], "p", parse=json.loads, hedge_delay=1))
+    assert model == "second" and calls == ["second"]
+
+
+if __name__ == "__main__":
+    test_slow_primary_is_hedged()
+    test_failure_launches_next_immediately()
+    test_non_object_response_does_not_win()
+    test_deadline_and_full_pool_raise_instead_of_hanging()
+    test_all_candidates_fail()
+    test_order_adapts_to_observed_latency()
+    print("OK")
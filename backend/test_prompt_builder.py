@@ -0,0 +1,146 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 실제 database.db 대신 임시 DB (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "prompt_builder_test.db"))
+
+import httpx
+import pytest
+
+import main
+from llm import GeminiRunner
+from prompt_builder import (DATASET, OUTPUT, PROMPT_FIELD_TOKENS, REQUEST, ROLE, SEARCH, SECTION_BUDGETS,
+                            AnalysisPromptBuilder, estimate_tokens, html_to_text, search_snippets)
+
+INPUTS = {
+    "field_name": "힐스테이트 평택역 센트럴", "address": "경기도 평택시 평택동", "product_category": "아파트",
+    "sales_price": 2000.0, "target_price": 2300.0, "supply_volume": 1200,
+    "dp": "10%", "ib": "중도금 무이자", "fkp": "역세권 초품아", "main_concern": "고분양가",
+}
+
+RESULT = ('<li class="bx"><div class="title_area"><a class="title_link" href="https://blog.naver.com/a/{i}">'
+          '힐스테이트 평택역 센트럴 모델하우스 방문 후기 {i} &amp; 분양가 정리</a></div>'
+          '<div class="dsc_area"><a class="dsc_link">84타입 분양가 5억 {i}천만원, 계약금 10% 중도금 무이자 조건. '
+          '역세권이라 청약 경쟁률이 높을 것 같아요.</a></div><span class="sub">2026.03.0{d}.</span></li>')
+NOISE = '<li><a class="link">오늘의 맛집 추천 리스트와 주말 날씨 {i}</a><span class="ad">광고</span></li>'
+
+
+def naver_like_html(results: int = 30) -> str:
+    """search.naver.com 결과 페이지와 비슷한 구조 (head/script/style 이 본문보다 훨씬 김)"""
+    body = "".join((RESULT if i % 3 == 0 else NOISE).format(i=i, d=i % 9 + 1) for i in range(results))
+    return ("<!doctype html><html><head><title>검색</title>"
+            "<script>window.__STATE__ = {\"query\": \"<div>분양가</div>\"};" + "var x=1;" * 3000 + "</script>"
+            "<style>.bx{margin:0}" + ".a{color:red}" * 2000 + "</style></head>"
+            f"<body><!-- 광고 영역 <div>분양가</div> --><ul class=\"lst_total\">{body}</ul></body></html>")
+
+
+def test_html_to_text_keeps_visible_text_only():
+    text = html_to_text(naver_like_html(3))
+    assert "window.__STATE__" not in text and "color:red" not in text and "광고 영역" not in text
+    assert "힐스테이트 평택역 센트럴 모델하우스 방문 후기 0 & 분양가 정리" in text.split("\n")
+
+
+def test_snippets_are_relevant_and_within_budget():
+    snippets = search_snippets(naver_like_html(), INPUTS["field_name"], 120)
+    assert snippets and all("맛집" not in s for s in snippets)
+    assert sum(estimate_tokens(s) + 1 for s in snippets) <= 120
+    assert search_snippets("", INPUTS["field_name"], 120) == []
+
+
+def test_prompt_sections_and_budgets():
+    builder = AnalysisPromptBuilder()
+    for section in (ROLE, REQUEST, DATASET, SEARCH, OUTPUT):
+        assert section.fields <= set(builder.values(INPUTS)) | {"snippets"}
+        assert section.static_tokens <= section.budget
+
+    plain = builder.build(INPUTS)
+    assert "[실시간 검색 발췌]" not in plain
+    assert "[힐스테이트 평택역 센트럴]" in plain and '"price": 2300.0' in plain and '"price": 2415.0' in plain
+    assert not any(line.startswith(" ") for line in plain.split("\n"))
+
+    with_search = builder.build(INPUTS, naver_like_html())
+    assert "[실시간 검색 발췌]" in with_search and "분양가" in with_search.split("[실시간 검색 발췌]")[1]
+    assert builder.last_snippets > 0
+    for name, tokens in builder.last_section_tokens.items():
+        assert tokens <= SECTION_BUDGETS[name] + 1, (name, tokens)
+    assert builder.metrics()["calls"] == 2
+
+
+def test_free_text_inputs_are_capped():
+    builder = AnalysisPromptBuilder()
+    long_input = {**INPUTS, "fkp": "역세권 초품아 대단지 " * 400, "main_concern": "고분양가 " * 400}
+    assert estimate_tokens(builder.values(long_input)["fkp"]) <= PROMPT_FIELD_TOKENS + 1
+    builder.build(long_input)
+    assert all(tokens <= SECTION_BUDGETS[name] + 1 for name, tokens in builder.last_section_tokens.items())
+
+
+def test_stream_prompt_is_built_within_budgets():
+    main.create_db_and_tables()
+    prompts = []
+
+    def stream_backend(model_name, prompt, generation_config, timeout):
+        prompts.append(prompt)
+        return iter(())
+
+    async def huge_context(field_name):
+        return naver_like_html(2000)
+
+    async def no_cache(key):
+        return None
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = {"field_name": INPUTS["field_name"], "address": INPUTS["address"], "sales_price": 2000,
+                    "field_keypoints": "역세권 초품아 대단지 " * 400, "main_concern": "고분양가 " * 400}
+            return await client.post("/analyze/stream", json=body)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "gemini", GeminiRunner(max_concurrency=2, stream_backend=stream_backend))
+        mp.setattr(main, "_live_search_context", huge_context)
+        mp.setattr(main, "_lookup_cached_analysis", no_cache)
+        res = asyncio.run(scenario())
+
+    assert res.status_code == 200 and res.text.splitlines()[-1].startswith('{"section": "done"')
+    assert prompts and len(set(prompts)) == 1
+    prompt = prompts[0]
+    # 검색 페이지 / 자유 입력이 아무리 커도 각 섹션은 예산 안에서 잘림
+    assert "[실시간 검색 발췌]" in prompt and "window.__STATE__" not in prompt and "맛집" not in prompt
+    assert set(main.analysis_prompt.last_section_tokens) == set(SECTION_BUDGETS)
+    assert all(tokens <= SECTION_BUDGETS[name] + 1 for name, tokens in main.analysis_prompt.last_section_tokens.items())
+    assert estimate_tokens(prompt) <= sum(SECTION_BUDGETS.values()) + len(SECTION_BUDGETS)
+
+
+def benchmark(rounds: int = 200):
+    builder = AnalysisPromptBuilder()
+    page = naver_like_html(60)
+    raw_tail = page[:3000]
+    base = builder.build(INPUTS)
+    prompt = builder.build(INPUTS, page)
+    print(f"search page: {len(page)} chars")
+    print(f"raw html[:3000] as context: {estimate_tokens(raw_tail)} tokens (site text included: {'힐스테이트' in html_to_text(raw_tail)})")
+    print(f"prompt without search: {estimate_tokens(base)} tokens")
+    print(f"prompt with snippets:  {estimate_tokens(prompt)} tokens, {builder.last_snippets} snippets "
+          f"{builder.last_section_tokens}")
+    started = time.perf_counter()
+    for _ in range(rounds):
+        builder.build(INPUTS, page)
+    print(f"build with search: {(time.perf_counter() - started) / rounds * 1000:.2f} ms")
+    started = time.perf_counter()
+    for _ in range(rounds * 10):
+        builder.build(INPUTS)
+    print(f"build without search: {(time.perf_counter() - started) / (rounds * 10) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    test_html_to_text_keeps_visible_text_only()
+    test_snippets_are_relevant_and_within_budget()
+    test_prompt_sections_and_budgets()
+    test_free_text_inputs_are_capped()
+    test_stream_prompt_is_built_within_budgets()
+    if "--bench" in sys.argv:
+        benchmark()
+    print("OK")
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import tempfile
+
+# 실제 database.db 대신 임시 DB (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "report_codec_test.db"))
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+import main
+from report_codec import REPORT_DICT_VERSION, compress_history_rows, decode_report, encode_report, report_text
+
+
+def _report(field_name: str) -> dict:
+    return main._fallback_analysis(main._analysis_inputs(main.AnalyzeRequest(field_name=field_name, address="경기도 평택시")))
+
+
+def test_round_trip_each_codec_version():
+    text = json.dumps(_report("힐스테이트 평택역"), ensure_ascii=False)
+    for version in (0, REPORT_DICT_VERSION):
+        blob = encode_report(text, version)
+        assert blob[:3] == b"RZ" + bytes([version])
+        assert decode_report(blob) == text
+    # 사전을 쓰는 쪽이 더 작게 저장
+    assert len(encode_report(text, REPORT_DICT_VERSION)) < len(encode_report(text, 0))
+    assert report_text(text, None) == text
+    assert report_text("", encode_report(text)) == text
+    assert report_text(None, None) == ""
+    with pytest.raises(ValueError):
+        decode_report(b"\x78\x9c not a report blob")
+
+
+def _history_entries(ids: list) -> list:
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(f"/history/{i}") for i in ids]
+    return [json.loads(res.raise_for_status().json()["response_json"]) for res in asyncio.run(scenario())]
+
+
+def test_migration_reads_mixed_rows_and_is_idempotent():
+    main.create_db_and_tables()
+    # 같은 임시 DB 를 쓰는 다른 테스트가 남긴 평문 행은 먼저 옮겨 두고 이 테스트의 행만 셈
+    compress_history_rows(main.engine, main.AnalysisHistory)
+    reports = [_report(f"이전 현장 {i}") for i in range(3)]
+    table = main.AnalysisHistory.__table__
+    with main.engine.begin() as conn:
+        # 코덱 도입 전 평문 행 2개 (json.dumps 기본값 = \uXXXX 이스케이프) + 이미 압축된 행 1개
+        ids = [conn.execute(table.insert().values(
+            user_email="codec@test", field_name=f"이전 현장 {i}", address="경기도 평택시", score=r["score"],
+            response_json=json.dumps(r) if i < 2 else "",
+            response_blob=None if i < 2 else encode_report(json.dumps(r, ensure_ascii=False)),
+        )).inserted_primary_key[0] for i, r in enumerate(reports)]
+    assert _history_entries(ids) == reports
+
+    first = compress_history_rows(main.engine, main.AnalysisHistory, batch_size=1)
+    assert first["rows"] == 2 and first["packed_bytes"] < first["plain_bytes"]
+    with main.engine.connect() as conn:
+        rows = conn.execute(select(table.c.response_json, table.c.response_blob).where(table.c.id.in_(ids))).all()
+    assert all(response_json == "" and blob[:2] == b"RZ" for response_json, blob in rows)
+    assert [json.loads(report_text(*row)) for row in rows] == reports
+    assert _history_entries(ids) == reports
+
+    # 다시 실행해도 옮길 행이 없음
+    assert compress_history_rows(main.engine, main.AnalysisHistory)["rows"] == 0
+
+
+if __name__ == "__main__":
+    test_round_trip_each_codec_version()
+    test_migration_reads_mixed_rows_and_is_idempotent()
+    print("OK")
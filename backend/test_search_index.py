@@ -0,0 +1,220 @@
+import csv
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 실제 database.db 대신 임시 DB (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "search_index_test.db"))
+
+from sqlalchemy import Column, MetaData, Table, or_
+from sqlmodel import Session, col, create_engine, select
+
+import main
+from main import Site, site_sort_key
+from search_index import SiteSearchIndex
+from site_store import CSV_SITE_COLUMNS, csv_unchanged, import_sites_csv, rebuild_sites_csv, upsert_sites
+
+BRANDS = ["힐스테이트", "자이", "래미안", "푸르지오", "더샵", "e편한세상", "롯데캐슬", "아이파크"]
+AREAS = ["경기도 평택시", "경기도 의정부시", "서울특별시 강동구", "부산광역시 해운대구", "인천광역시 연수구", "대구광역시 수성구"]
+SUFFIXES = ["센트럴", "파크뷰", "리버시티", "스테이션", "더퍼스트", "레이크", "에듀포레"]
+QUERIES = ["힐스", "힐스테이트 평택", "자이 더퍼스트", "스테이", "해운대", "강동구 래미안", "파크", "없는현장"]
+
+
+def _rows(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    rows = []
+    for i in range(n):
+        brand, area = rng.choice(BRANDS), rng.choice(AREAS)
+        rows.append({
+            "id": f"s{i}", "name": f"{brand} {area.split()[-1][:-1]} {rng.choice(SUFFIXES)} {i}", "address": area,
+            "brand": brand, "category": "아파트", "price": 2000.0, "target_price": 2100.0, "supply": 500,
+            "status": rng.choice(["분양중", "분양예정", "분양완료"]), "last_updated": now - datetime.timedelta(minutes=i),
+        })
+    return rows
+
+
+def _engine(rows: list):
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'sites.db')}")
+    Site.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(Site.__table__.insert(), rows)
+    return engine
+
+
+def _scan(engine, q_parts: list) -> list:
+    """비교 기준: 예전 ILIKE 스캔"""
+    with Session(engine) as session:
+        stmt = select(Site)
+        for part in q_parts:
+            stmt = stmt.where(or_(*(col(getattr(Site, f)).ilike(f"%{part}%")
+                                    for f in ("name", "address", "brand", "category", "status"))))
+        return session.exec(stmt).all()
+
+
+def _ids(engine, index, q: str) -> tuple:
+    parts = q.lower().split()
+    return {s.id for s in index.search(parts, limit=10 ** 6)}, {s.id for s in _scan(engine, parts)}
+
+
+def test_index_matches_like_scan():
+    engine = _engine(_rows(3000))
+    index = SiteSearchIndex()
+    index.rebuild(engine, Site)
+    for q in QUERIES:
+        found, expected = _ids(engine, index, q)
+        assert found == expected, q
+    ranked = index.search(["힐스테이트"], limit=5, rank=lambda x: site_sort_key(x, "힐스테이트"))
+    assert len(ranked) == 5 and all("힐스테이트" in s.name for s in ranked)
+
+
+def _write_csv(path: str, rows: list):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_SITE_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_incremental_import_refreshes_changed_ids_only():
+    rows = _rows(200)
+    engine = _engine(rows)
+    path = os.path.join(tempfile.mkdtemp(), "sites.csv")
+    _write_csv(path, rows)
+    import_sites_csv(engine, Site, path)  # content_hash 기록
+    index = SiteSearchIndex(check_interval=0)
+    index.rebuild(engine, Site)
+
+    # s0 이름 변경, s1 삭제(CSV 에서 빠짐), n1 신규
+    csv_rows = [{**r, "name": "새이름 리버뷰"} if r["id"] == "s0" else r for r in rows if r["id"] != "s1"]
+    csv_rows.append({**rows[2], "id": "n1", "name": "신규 단지 에듀파크"})
+    _write_csv(path, csv_rows)
+    touched = []
+    result = import_sites_csv(engine, Site, path, delete_missing=True, after_commit=touched.extend)
+    assert (result["imported"], result["updated"], result["deleted"]) == (1, 1, 1)
+    assert sorted(touched) == ["n1", "s0", "s1"]
+
+    index.refresh_ids(engine, Site, touched)
+    assert len(index) == 200
+    for q in ("새이름", "에듀파크", rows[0]["name"], rows[1]["name"], "힐스"):
+        found, expected = _ids(engine, index, q)
+        assert found == expected, q
+    # 시그니처가 맞춰졌으므로 같은 변경으로 백그라운드 재빌드를 다시 돌리지 않음
+    index.refresh_if_stale(engine, Site)
+    assert not index._refreshing
+
+
+def test_full_rebuild_then_index_rebuild():
+    rows = _rows(100)
+    engine = _engine(rows)
+    path = os.path.join(tempfile.mkdtemp(), "sites.csv")
+    _write_csv(path, [{**r, "name": f"교체된 단지 {r['id']}"} for r in rows[:50]])
+    result = rebuild_sites_csv(engine, Site, path, keep_ids=["s99"])
+    assert result["imported"] == 50
+    index = SiteSearchIndex()
+    index.rebuild(engine, Site)
+    assert len(index) == 51
+    for q in ("교체된", rows[99]["name"], rows[10]["name"]):
+        found, expected = _ids(engine, index, q)
+        assert found == expected, q
+
+
+def test_import_without_hash_column_does_not_trust_stale_hashes():
+    rows = _rows(20)
+    engine = _engine(rows)
+    path = os.path.join(tempfile.mkdtemp(), "sites.csv")
+    _write_csv(path, rows)
+    import_sites_csv(engine, Site, path)
+    assert csv_unchanged(engine, path)
+
+    # content_hash 가 없는 스크립트용 모델로 CSV 변경분 import
+    hashless = Table("site", MetaData(), 
+                     *(Column(c.name, c.type, primary_key=c.primary_key) for c in Site.__table__.c if c.name != "content_hash"))
+    _write_csv(path, [{**r, "name": f"스크립트 수정 {r['id']}"} for r in rows])
+    import_sites_csv(engine, hashless, path)
+    with Session(engine) as session:
+        assert all(s.content_hash is None for s in session.exec(select(Site)).all())
+    assert not csv_unchanged(engine, path)
+
+    # 원래 CSV 로 되돌린 증분 import 는 오래된 해시와 같아도 다시 반영
+    _write_csv(path, rows)
+    result = import_sites_csv(engine, Site, path)
+    assert result["updated"] == 20 and csv_unchanged(engine, path)
+    with Session(engine) as session:
+        assert session.get(Site, "s0").name == rows[0]["name"]
+
+
+def test_invalid_csv_rows_are_not_deleted():
+    rows = _rows(10)
+    engine = _engine(rows)
+    path = os.path.join(tempfile.mkdtemp(), "sites.csv")
+    # s3 는 가격이 깨진 행, s9 는 CSV 에서 정말 빠진 행
+    _write_csv(path, [{**r, "price": "문의"} if r["id"] == "s3" else r for r in rows[:9]])
+    result = import_sites_csv(engine, Site, path, delete_missing=True)
+    assert (result["skipped"], result["deleted"]) == (1, 1)
+    with Session(engine) as session:
+        assert session.get(Site, "s3").price == 2000.0 and session.get(Site, "s9") is None
+
+    result = rebuild_sites_csv(engine, Site, path)
+    assert result["skipped"] == 1
+    with Session(engine) as session:
+        assert sorted(s.id for s in session.exec(select(Site)).all()) == [f"s{i}" for i in range(9)]
+
+
+def test_fts_matches_like_backend_and_sort_key():
+    main.create_db_and_tables()
+    assert main.site_fts_ready
+    rows = [{**r, "id": f"fts_{r['id']}"} for r in _rows(500, seed=11)]
+    # 정확히 일치 / 접두어 / 브랜드 일치 순위가 갈리도록 몇 개 추가
+    rows += [{**rows[0], "id": "fts_exact", "name": "힐스테이트", "brand": "기타"},
+             {**rows[0], "id": "fts_prefix", "name": "자이 더퍼스트 평택", "brand": "자이"}]
+    upsert_sites(main.engine, Site, rows)
+    # 3글자 이상은 trigram MATCH, 2글자 이하는 instr 조건으로 섞어서
+    for q in ("힐스테이트", "자이", "자이 더퍼스트", "평택 힐스", "강동구 래미안", "E편한세상 수성", "구 스테이", "센트럴 1", "없는현장"):
+        q_lower = q.lower()
+        parts = q_lower.split()
+        fts = main._fts_search_sites(q_lower, parts, limit=10 ** 6)
+        like = main._db_search_sites(parts, limit=10 ** 6)
+        assert {r.id for r in fts} == {s.id for s in like}, q
+        keys = [site_sort_key(r, q_lower) for r in fts]
+        assert keys == sorted(site_sort_key(s, q_lower) for s in like), q
+    top = main._fts_search_sites("힐스테이트", ["힐스테이트"], limit=3)
+    assert top[0].id == "fts_exact"
+    assert main._fts_search_sites("자이", ["자이"], limit=1)[0].brand == "자이"
+
+
+def benchmark(n: int = 20000, rounds: int = 200):
+    rows = _rows(n)
+    engine = _engine(rows)
+    index = SiteSearchIndex()
+    started = time.perf_counter()
+    index.rebuild(engine, Site)
+    print(f"{n} sites, build {(time.perf_counter() - started) * 1000:.0f} ms")
+    for q in QUERIES:
+        parts = q.lower().split()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            found = index.search(parts, limit=100, rank=lambda x: site_sort_key(x, q.lower()))
+        indexed = (time.perf_counter() - started) / rounds * 1000
+        started = time.perf_counter()
+        for _ in range(max(1, rounds // 20)):
+            _scan(engine, parts)
+        scanned = (time.perf_counter() - started) / max(1, rounds // 20) * 1000
+        print(f"{q:<16} index {indexed:7.3f} ms  ilike scan {scanned:7.2f} ms  ({len(found)} results)")
+    started = time.perf_counter()
+    index.refresh_ids(engine, Site, [r["id"] for r in rows[:50]])
+    print(f"refresh_ids(50) {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    test_index_matches_like_scan()
+    test_incremental_import_refreshes_changed_ids_only()
+    test_full_rebuild_then_index_rebuild()
+    test_import_without_hash_column_does_not_trust_stale_hashes()
+    test_invalid_csv_rows_are_not_deleted()
+    test_fts_matches_like_backend_and_sort_key()
+    if "--bench" in sys.argv:
+        benchmark()
+    print("OK")
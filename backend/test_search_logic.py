@@ -1,31 +1,42 @@
-from main import search_sites
 import asyncio
-import json
+
+import httpx
+
+from main import app
+
+
+async def _search(client: httpx.AsyncClient, q: str) -> list:
+    # /search-sites 는 ETag/Cache-Control 이 붙은 JSON 응답이므로 엔드포인트를 통해 호출
+    res = await client.get("/search-sites", params={"q": q})
+    res.raise_for_status()
+    return res.json()
 
 async def test_search():
-    print("Testing search for '이안'...")
-    results = await search_sites("이안")
-    print(f"Results count: {len(results)}")
-    for r in results:
-        print(f" - {r.name} (Brand: {r.brand})")
-
-    print("\nTesting search for '엘리움'...")
-    results = await search_sites("엘리움")
-    print(f"Results count: {len(results)}")
-    for r in results:
-        print(f" - {r.name} (Brand: {r.brand})")
-
-    print("\nTesting search for '서울'...")
-    results = await search_sites("서울")
-    print(f"Results count: {len(results)}")
-    for r in results:
-        print(f" - {r.name} (Address: {r.address})")
-
-    print("\nTesting search for '메이플'...")
-    results = await search_sites("메이플")
-    print(f"Results count: {len(results)}")
-    for r in results:
-        print(f" - {r.name}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        print("Testing search for '이안'...")
+        results = await _search(client, "이안")
+        print(f"Results count: {len(results)}")
+        for r in results:
+            print(f" - {r['name']} (Brand: {r['brand']})")
+
+        print("\nTesting search for '엘리움'...")
+        results = await _search(client, "엘리움")
+        print(f"Results count: {len(results)}")
+        for r in results:
+            print(f" - {r['name']} (Brand: {r['brand']})")
+
+        print("\nTesting search for '서울'...")
+        results = await _search(client, "서울")
+        print(f"Results count: {len(results)}")
+        for r in results:
+            print(f" - {r['name']} (Address: {r['address']})")
+
+        print("\nTesting search for '메이플'...")
+        results = await _search(client, "메이플")
+        print(f"Results count: {len(results)}")
+        for r in results:
+            print(f" - {r['name']}")
 
 if __name__ == "__main__":
     asyncio.run(test_search())
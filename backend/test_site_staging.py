@@ -0,0 +1,147 @@
+import datetime
+import os
+import tempfile
+
+# 실제 database.db 대신 임시 DB (main import 전에 지정)
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "site_staging_test.db"))
+
+from sqlalchemy import event, text
+from sqlmodel import create_engine
+
+import main
+from main import Site
+from site_store import SiteStaging, upsert_sites
+
+
+def _site(site_id: str, name: str) -> dict:
+    return {"id": site_id, "name": name, "address": "경기도 평택시", "brand": "자이", "category": "아파트",
+            "price": 2000.0, "target_price": 2100.0, "supply": 500, "status": "분양중",
+            "last_updated": datetime.datetime.now()}
+
+
+def _engine():
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'sites.db')}")
+    Site.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(Site.__table__.insert(), [_site(f"s{i}", f"기존 단지 {i}") for i in range(10)])
+        conn.execute(text("CREATE INDEX ix_site_last_updated ON site (last_updated DESC)"))
+        conn.execute(text("CREATE TABLE site_audit (id TEXT)"))
+        conn.execute(text("CREATE TRIGGER site_audit_ai AFTER INSERT ON site BEGIN INSERT INTO site_audit VALUES (NEW.id); END"))
+    return engine
+
+
+def _names(engine) -> dict:
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT id, name FROM site")).all())
+
+
+def _schema_names(engine) -> set:
+    with engine.connect() as conn:
+        return set(conn.execute(text("SELECT name FROM sqlite_master")).scalars())
+
+
+def test_writes_during_staging_survive_swap():
+    engine = _engine()
+    staging = SiteStaging(engine, Site)
+    staging.create(copy_existing=True)
+    # 크롤링 결과: 신규만 추가
+    staging.upsert([_site("n1", "크롤링 단지"), _site("s2", "크롤링이 덮으면 안 됨")], update_columns=[])
+
+    # 크롤링 도중 다른 쓰기 (CSV 증분 import, bulk_sync, 관리자 수정/삭제)
+    upsert_sites(engine, Site, [_site("s0", "수정된 단지"), _site("live1", "라이브 신규"), _site("n1", "라이브가 먼저")])
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM site WHERE id = 's1'"))
+
+    staging.swap()
+    names = _names(engine)
+    assert names["s0"] == "수정된 단지" and names["live1"] == "라이브 신규" and names["n1"] == "라이브가 먼저"
+    assert "s1" not in names and names["s2"] == "기존 단지 2"
+    assert len(names) == 11 and staging.replayed == 4
+    # 변경 기록용 트리거/테이블은 남지 않고, 원래 트리거는 다시 생성됨
+    schema = _schema_names(engine)
+    assert not any(name.startswith("site_staging") for name in schema)
+    assert "site_audit_ai" in schema
+
+
+def _trace(engine) -> list:
+    """드라이버 커넥션에서 실행되는 SQL 기록 (swap 은 raw 커서를 쓰므로 SQLAlchemy 이벤트로는 안 보임)"""
+    statements = []
+    engine.dispose()
+    event.listen(engine, "connect", lambda dbapi_conn, _: dbapi_conn.set_trace_callback(statements.append))
+    return statements
+
+
+def _locked(statements: list) -> list:
+    """BEGIN IMMEDIATE ~ COMMIT 사이 (교체 트랜잭션) 에 실행된 문장"""
+    start = statements.index("BEGIN IMMEDIATE")
+    return statements[start:statements.index("COMMIT", start)]
+
+
+def test_indexes_are_built_before_the_swap_lock():
+    engine = _engine()
+    with engine.connect() as conn:
+        index_sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'ix_site_last_updated'")).scalar()
+    staging = SiteStaging(engine, Site)
+    staging.create(copy_existing=True)
+    staging.upsert([_site(f"n{i}", f"신규 단지 {i}") for i in range(100)])
+    statements = _trace(engine)
+    staging.swap()
+
+    locked = _locked(statements)
+    assert not any("CREATE INDEX" in sql.upper() for sql in locked), locked
+    assert any("RENAME" in sql.upper() for sql in locked)
+    with engine.connect() as conn:
+        index = conn.execute(text("SELECT tbl_name, sql FROM sqlite_master WHERE name = 'ix_site_last_updated'")).one()
+        plan = " ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN SELECT max(last_updated) FROM site")))
+    # RENAME 이 테이블 이름을 따옴표로 바꿔 쓰는 것 외에는 같은 정의
+    assert index.tbl_name == "site" and index.sql.replace('"', "") == index_sql
+    assert "ix_site_last_updated" in plan
+
+
+def test_discard_removes_change_capture():
+    engine = _engine()
+    staging = SiteStaging(engine, Site)
+    staging.create(copy_existing=True)
+    staging._move_indexes()  # swap 이 잠금 전에 실패한 경우처럼 인덱스를 옮긴 뒤 포기
+    staging.discard()
+    schema = _schema_names(engine)
+    assert not any(name.startswith("site_staging") for name in schema)
+    assert "ix_site_last_updated" in schema
+    upsert_sites(engine, Site, [_site("s0", "수정")])
+    assert _names(engine)["s0"] == "수정"
+
+
+def _fts_ids(q: str) -> set:
+    return {row.id for row in main._fts_search_sites(q, q.split(), limit=10 ** 6)}
+
+
+def test_fts_is_prepared_outside_the_swap_lock():
+    main.create_db_and_tables()
+    assert main.site_fts_ready
+    staging = SiteStaging(main.engine, Site)
+    staging.create(copy_existing=True)
+    staging.upsert([_site(f"fts_stage{i}", f"스테이징 솔밭마을 {i}") for i in range(50)])
+    # 미리 채운 뒤 교체 전까지 들어온 라이브 쓰기도 색인에 반영되어야 함
+    upsert_sites(main.engine, Site, [_site("fts_live", "라이브 레이크뷰")])
+    statements = _trace(main.engine)
+    staging.swap(after_swap=main.rebuild_site_fts_after_swap, before_swap=main.prepare_site_fts_for_swap)
+
+    locked = _locked(statements)
+    assert not any("'rebuild'" in sql or "INSERT INTO site_fts_next" in sql for sql in locked), locked
+    assert _fts_ids("솔밭마을") == {f"fts_stage{i}" for i in range(50)}
+    assert _fts_ids("레이크뷰") == {"fts_live"} and "seoul_seocho_1" in _fts_ids("메이플자이")
+    schema = _schema_names(main.engine)
+    assert not any(name.startswith(main.SITE_FTS_NEXT) for name in schema)
+    assert {"site_fts_ai", "site_fts_ad", "site_fts_au"} <= schema
+
+    # 교체 후 트리거가 새 site_fts 를 갱신
+    upsert_sites(main.engine, Site, [_site("fts_after", "교체후 센트럴힐")])
+    assert _fts_ids("센트럴힐") == {"fts_after"}
+
+
+if __name__ == "__main__":
+    test_writes_during_staging_survive_swap()
+    test_indexes_are_built_before_the_swap_lock()
+    test_discard_removes_change_capture()
+    test_fts_is_prepared_outside_the_swap_lock()
+    print("OK")
@@ -83,7 +83,11 @@ interface AnalysisHistoryEntry {
   address: string;
   score: number;
   created_at: string;
-  response_json: string;
+}
+
+interface AnalysisHistoryPage {
+  items: AnalysisHistoryEntry[];
+  next_cursor: string | null;
 }
 
 // --- Components ---
@@ -190,6 +194,8 @@ export default function BunyangAlphaGo() {
   const [history, setHistory] = useState<AnalysisHistoryEntry[]>([]);
   const [showHistoryModal, setShowHistoryModal] = useState(false);
   const [isFetchingHistory, setIsFetchingHistory] = useState(false);
+  const [historyCursor, setHistoryCursor] = useState<string | null>(null);
+  const [isLoadingMoreHistory, setIsLoadingMoreHistory] = useState(false);
 
   const reportRef = useRef<HTMLDivElement>(null);
   const [isDownloading, setIsDownloading] = useState(false);
@@ -642,23 +648,41 @@ export default function BunyangAlphaGo() {
     }
   };
 
-  const fetchHistory = async () => {
-    setIsFetchingHistory(true);
+  const fetchHistory = async (cursor: string | null = null) => {
+    if (cursor) setIsLoadingMoreHistory(true);
+    else setIsFetchingHistory(true);
     try {
-      const res = await fetch(`${API_BASE_URL}/history${user?.email ? `?email=${user.email}` : ''}`);
+      const params = new URLSearchParams();
+      if (user?.email) params.set('email', user.email);
+      if (cursor) params.set('cursor', cursor);
+      const query = params.toString();
+      const res = await fetch(`${API_BASE_URL}/history${query ? `?${query}` : ''}`);
       if (res.ok) {
-        const data = await res.json();
-        setHistory(data);
+        const data: AnalysisHistoryPage = await res.json();
+        setHistory(prev => cursor ? [...prev, ...data.items] : data.items);
+        setHistoryCursor(data.next_cursor);
       }
     } catch (err) {
       console.error("Failed to fetch history:", err);
     } finally {
       setIsFetchingHistory(false);
+      setIsLoadingMoreHistory(false);
     }
   };
 
-  const handleLoadHistory = (entry: AnalysisHistoryEntry) => {
-    const data = JSON.parse(entry.response_json);
+  const handleLoadHistory = async (entry: AnalysisHistoryEntry) => {
+    // 목록에는 요약만 오므로 선택한 리포트 본문을 따로 불러옴
+    let data;
+    try {
+      const res = await fetch(`${API_BASE_URL}/history/${entry.id}`);
+      if (!res.ok) throw new Error(`${res.status}`);
+      const full = await res.json();
+      data = JSON.parse(full.response_json);
+    } catch (err) {
+      console.error("Failed to load history report:", err);
+      alert("리포트를 불러오지 못했습니다. 잠시 후 다시 시도해 주세요.");
+      return;
+    }
     setResult(data);
     setFieldName(entry.field_name);
     setAddressValue(entry.address);
@@ -2265,6 +2289,16 @@ export default function BunyangAlphaGo() {
                         <ChevronRight className="text-slate-700 group-hover:text-blue-500 translate-x-0 group-hover:translate-x-1 transition-all" size={20} />
                       </button>
                     ))}
+                    {historyCursor && (
+                      <button
+                        onClick={() => fetchHistory(historyCursor)}
+                        disabled={isLoadingMoreHistory}
+                        className="w-full py-4 rounded-2xl border border-slate-800 text-slate-400 font-bold text-sm hover:border-blue-500/50 hover:text-blue-400 transition-all disabled:opacity-50 flex items-center justify-center gap-2"
+                      >
+                        {isLoadingMoreHistory && <RefreshCw className="animate-spin" size={14} />}
+                        {isLoadingMoreHistory ? '불러오는 중...' : '이전 리포트 더 보기'}
+                      </button>
+                    )}
                   </div>
                 )}
               </div>